@@ -0,0 +1,105 @@
+# File: api/py_tilt/columnar.py
+"""
+Columnar request bodies for /api/py_tilt: one array per game field the
+features read (tilt_features.INPUT_FIELDS) instead of whole Firestore game
+documents, most of which (moves, players, opening, ...) is never used.
+
+Two encodings, chosen by Content-Type:
+
+- application/json with {"columns": {"createdAt": [...], "my_acpl": [...], ...},
+  "personal_model": ...}. null = missing.
+- MEDIA_TYPE (application/x-tilt-columns), little-endian:
+      magic      4 bytes   b"TCOL"
+      version    u16       COLUMNS_VERSION
+      reserved   u16
+      n_rows     u32
+      meta_len   u32
+      meta       JSON      {"columns": [field, ...], "personal_model": ...,
+                            "history": true for a backfill (index.score_history)}
+                           space-padded so the data starts on an 8-byte boundary
+      data       float64[len(columns)][n_rows], NaN = missing
+  decode() returns NumPy views into the request body (no copy, no parse).
+
+Missing columns and missing values take the same defaults as a missing key
+in a game dict (tilt_features.read_columns). Whole game documents in JSON stay
+supported; batch and incremental requests only take game documents. A
+backfill takes either: {"history": [games] | {"columns": {...}}}.
+"""
+import json
+import struct
+
+import numpy as np
+
+from tilt_features import INPUT_FIELDS
+
+MEDIA_TYPE = 'application/x-tilt-columns'
+MAGIC = b"TCOL"
+COLUMNS_VERSION = 1
+_PREAMBLE = struct.Struct('<4sHHII')
+
+
+class ColumnsError(ValueError):
+    """Malformed columnar body."""
+
+
+def _check_fields(names):
+    unknown = [n for n in names if n not in INPUT_FIELDS]
+    if unknown:
+        raise ColumnsError(f"Unknown columns {unknown}. Expected a subset of {INPUT_FIELDS}")
+
+
+def from_json(columns):
+    """{"createdAt": [...], ...} from a JSON body -> {field: float64 array}."""
+    if not isinstance(columns, dict):
+        raise ColumnsError("Expected \"columns\" to be an object of arrays")
+    _check_fields(columns)
+    try:
+        return {name: np.array(values, dtype=np.float64) for name, values in columns.items()}
+    except (TypeError, ValueError) as e:
+        raise ColumnsError(f"Columns must be arrays of numbers or null: {e}")
+
+
+def encode(columns, meta=None):
+    """{field: sequence} (+ meta such as personal_model) -> binary body. For clients and benches."""
+    names = list(columns)
+    _check_fields(names)
+    data = [np.asarray(columns[n], dtype='<f8') for n in names]
+    n_rows = len(data[0]) if data else 0
+    if any(len(d) != n_rows for d in data):
+        raise ColumnsError("Columns differ in length")
+
+    header = json.dumps({**(meta or {}), 'columns': names}, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(_PREAMBLE.size + len(header)) % 8)
+    out = bytearray(_PREAMBLE.pack(MAGIC, COLUMNS_VERSION, 0, n_rows, len(header)))
+    out += header
+    for d in data:
+        out += d.tobytes()
+    return bytes(out)
+
+
+def decode(body):
+    """Binary body -> ({field: float64 view}, meta). Raises ColumnsError."""
+    if len(body) < _PREAMBLE.size:
+        raise ColumnsError("Columnar body too short")
+    magic, version, _, n_rows, meta_len = _PREAMBLE.unpack_from(body)
+    if magic != MAGIC:
+        raise ColumnsError("Not a columnar body (bad magic)")
+    if version > COLUMNS_VERSION:
+        raise ColumnsError(f"Columnar version {version} is newer than supported ({COLUMNS_VERSION})")
+
+    start = _PREAMBLE.size + meta_len
+    try:
+        meta = json.loads(bytes(body[_PREAMBLE.size:start]))
+    except ValueError as e:
+        raise ColumnsError(f"Corrupt columnar header: {e}")
+    names = meta.pop('columns', [])
+    _check_fields(names)
+    if len(body) != start + 8 * n_rows * len(names):
+        raise ColumnsError(f"Expected {len(names)} columns x {n_rows} rows of float64 after the header")
+
+    # Views into the body itself; read_columns copies when it sorts
+    columns = {
+        name: np.frombuffer(body, dtype='<f8', count=n_rows, offset=start + 8 * n_rows * i)
+        for i, name in enumerate(names)
+    }
+    return columns, meta
@@ -2,117 +2,595 @@ from http.server import BaseHTTPRequestHandler
 import json
 import os
 import sys
+import time
+
 import numpy as np
-import onnxruntime as ort
-import pandas as pd
 
 # Path setup for imports if needed
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
-# --- LOAD ONNX MODEL (Lightweight) ---
-model_file = 'model.onnx'
-model_path = os.path.join(os.path.dirname(__file__), model_file)
+# --- STARTUP BUDGET ---
+# Cold start dominates our p99, so heavy imports (onnxruntime) only happen for
+# the backend actually in use and every model is built once per process.
+# STARTUP_MS records where the time went; scripts/check_import_budget.py guards it.
+STARTUP_MS = {}
 
-onnx_session = None
+def _record(stage, t0):
+    STARTUP_MS[stage] = round((time.perf_counter() - t0) * 1000, 2)
 
-try:
-    if os.path.exists(model_path):
-        onnx_session = ort.InferenceSession(model_path)
-        print(f"✅ [Init] ONNX model loaded. Inputs: {onnx_session.get_inputs()[0].name}")
-    else:
-        print(f"⚠️ [Init] Model not found at {model_path}")
-except Exception as e:
-    print(f"❌ [Init] Failed to load ONNX: {e}")
+_t0 = time.perf_counter()
+# --- FEATURE ENGINEERING ---
+# NumPy-only builder (tilt_features.py) so pandas stays out of the serverless bundle.
+# It mirrors TiltModel._enrich_json value for value.
+from tilt_features import (FEATURE_COLS, SessionState, build_features, build_features_grouped, featurize,
+                           read_columns, read_games, session_bounds)
+_record('import_features', _t0)
 
-# --- FEATURE ENGINEERING (Re-implement simple logic or import from SDK if clean) ---
-# To keep dependencies light, we re-implement the feature extraction wrapper here
-# or ensure tilt_model_sdk.py doesn't import xgboost at the top level.
+# One versioned file (model_bundle.py) carries the graph, feature order and threshold
+from model_bundle import SECTION_XGB_JSON, ModelBundle
 
-def preprocess_and_predict(games):
-    if not onnx_session:
-        raise Exception("Model not initialized")
+# Session options, pre-optimized graph and IOBinding for one vCPU (TILT_ORT_* overrides)
+from ort_profile import InferenceProfile, load_runner
+ORT_PROFILE = InferenceProfile.from_env()
 
-    from tilt_model_sdk import TiltModel
-    
-    helper = TiltModel() 
-    df = helper._enrich_json(games)
-    
-    if df.empty:
-        return 0.0
+# Columnar request bodies (only the fields the features read), JSON or binary
+import columnar
 
-    # ... logging code (optional) ...
+# Decoded personal models live in a bounded LRU keyed by payload hash
+import personal_models
 
-    X = df[helper.feature_cols].values.astype(np.float32)
-    
-    input_name = onnx_session.get_inputs()[0].name
-    inputs = {input_name: X}
-    
-    res = onnx_session.run(None, inputs)
-    
-    # res[0] is usually labels
-    # res[1] is probabilities
-    probs = res[1] 
-    
+# Responses for unchanged windows, keyed on (model hash, backend, window fingerprint)
+import prediction_cache
+
+# Coalesces concurrent shared-model calls into one stacked run (TILT_MICROBATCH=1)
+import micro_batch
+
+# Per-stage timers + histograms (GET -> Prometheus text, one JSON log line per request)
+import metrics
+from metrics import NULL_TIMER, StageTimer
+
+# --- INFERENCE BACKEND ---
+# 'onnx' (default) runs the bundle's ONNX graph; 'trees' walks its XGBoost JSON
+# with NumPy (tree_ensemble.py) and never imports onnxruntime.
+DEFAULT_BACKEND = os.environ.get('TILT_BACKEND', 'onnx')
+BACKENDS = ('onnx', 'trees')
+
+model_file = 'model.bundle'
+model_path = os.environ.get('TILT_MODEL_BUNDLE', os.path.join(os.path.dirname(__file__), model_file))
+
+# should_stop cut-off for models that carry no threshold (raw personal payloads)
+DEFAULT_THRESHOLD = 0.5
+
+# Module singletons, built on first use (or by warm())
+bundle = None
+onnx_runner = None
+tree_model = None
+
+def get_bundle():
+    global bundle
+    if bundle is None:
+        if not os.path.exists(model_path):
+            print(f"⚠️ [Init] Model bundle not found at {model_path}")
+            raise Exception("Model not initialized")
+
+        t0 = time.perf_counter()
+        loaded = ModelBundle.open(model_path)
+        if loaded.features != FEATURE_COLS:
+            raise ValueError(f"Bundle feature order {loaded.features} does not match tilt_features.FEATURE_COLS")
+        bundle = loaded
+        _record('bundle', t0)
+        print(f"✅ [Init] Model bundle {bundle.content_hash[:12]}: sections {bundle.sections}, "
+              f"threshold {bundle.threshold:.2f}")
+    return bundle
+
+def get_onnx_runner():
+    global onnx_runner
+    if onnx_runner is None:
+        loaded = get_bundle()
+
+        t0 = time.perf_counter()
+        import onnxruntime
+        _record('import_onnxruntime', t0)
+
+        t0 = time.perf_counter()
+        onnx_runner = load_runner(loaded, ORT_PROFILE)
+        _record('onnx_session', t0)
+        print(f"✅ [Init] ONNX model loaded ({'pre-optimized' if onnx_runner.preoptimized else 'optimized online'}). "
+              f"Inputs: {onnx_runner.input_name}, output: {onnx_runner.output_name}")
+    return onnx_runner
+
+def get_tree_model():
+    global tree_model
+    if tree_model is None:
+        t0 = time.perf_counter()
+        from tree_ensemble import TreeEnsemble
+        tree_model = TreeEnsemble.from_dict(json.loads(bytes(get_bundle().section(SECTION_XGB_JSON))))
+        _record('tree_model', t0)
+        print(f"✅ [Init] Tree ensemble compiled: {tree_model.n_trees} trees, depth {tree_model.max_depth}")
+    return tree_model
+
+def _class1_probs(probs):
+    """Normalizes the ONNX probability output to a list/array of P(class 1) per row."""
     # --- ROBUST PROBABILITY EXTRACTION ---
+    # Case 1: NumPy Array (Standard for XGBoost -> ONNX without ZipMap)
+    # Shape is usually (N_rows, 2_classes). We want the 2nd column (Class 1)
+    if hasattr(probs, 'shape'):
+        return probs[:, 1]
+
+    # Case 2: List of Dictionaries (Standard for sklearn-onnx with ZipMap)
+    # Structure: [{0: 0.9, 1: 0.1}, ...]
+    if isinstance(probs, list):
+        return [p[1] for p in probs]
+
+    # Case 3: Single Dictionary (Edge case)
+    if isinstance(probs, dict):
+        return [probs[1]]
+
+    raise TypeError(f"Unknown probability format: {type(probs)}")
+
+def run_model(X, backend=None, personal_model=None):
+    """
+    Feature matrix (n, 15) -> raw probability output for every row.
+    `personal_model` (base64 payload) overrides the shared global model.
+    """
+    if personal_model:
+        return personal_models.cache.get(personal_model).predict_proba(X)
+
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of {BACKENDS}")
+    if micro_batch.ENABLED:
+        return get_batcher(backend).submit(X)
+    return run_shared_model(X, backend)
+
+def run_shared_model(X, backend):
+    if backend == 'trees':
+        return get_tree_model().predict_proba(X)
+    # Probabilities output only (the labels output is never fetched)
+    return get_onnx_runner().run(X)
+
+batchers = {}
+
+def get_batcher(backend):
+    batcher = batchers.get(backend)
+    if batcher is None:
+        # Models are looked up per batch, so reload_models() needs no new batcher
+        batcher = batchers[backend] = micro_batch.MicroBatcher(lambda X: run_shared_model(X, backend), name=backend)
+    return batcher
+
+def model_key(personal_model=None):
+    """Identity of the scoring model for prediction_cache: bundle hash or payload hash."""
+    if personal_model:
+        return personal_models.payload_key(personal_model)
+    return get_bundle().content_hash
+
+def model_threshold(personal_model=None):
+    """should_stop threshold of the model that scores: the bundle's, or a personal bundle's."""
+    if personal_model:
+        return personal_models.cache.threshold(personal_model, DEFAULT_THRESHOLD)
+    return get_bundle().threshold
+
+def _last_prob(X, backend=None, personal_model=None, timer=NULL_TIMER):
+    # Rows are scored independently: only the newest one is needed
+    probs = run_model(X[-1:], backend, personal_model)
+    timer.mark('inference')
+
     try:
-        # Case 1: NumPy Array (Standard for XGBoost -> ONNX without ZipMap)
-        # Shape is usually (N_rows, 2_classes). We want last row, 2nd column (Class 1)
-        if hasattr(probs, 'shape'):
-            last_game_prob = probs[-1, 1]
-            
-        # Case 2: List of Dictionaries (Standard for sklearn-onnx with ZipMap)
-        # Structure: [{0: 0.9, 1: 0.1}, ...]
-        elif isinstance(probs, list):
-            last_game_prob = probs[-1][1]
-            
-        # Case 3: Single Dictionary (Edge case)
-        elif isinstance(probs, dict):
-            last_game_prob = probs[1]
-            
+        return float(_class1_probs(probs)[-1])
+    except Exception as e:
+        print(f"Error parsing probability: {e}. Raw data: {probs}")
+        return 0.0
+    finally:
+        timer.mark('extract')
+
+def preprocess_and_predict(games, backend=None, personal_model=None, timer=NULL_TIMER):
+    X = build_features(games)
+    timer.mark('features')
+    
+    if X.shape[0] == 0:
+        return 0.0
+
+    return _last_prob(X, backend, personal_model, timer)
+
+def predict_incremental(state, new_games, backend=None, personal_model=None, timer=NULL_TIMER):
+    """
+    Scores the newest game from a saved SessionState plus the games played since.
+    Only the new rows are featurized; returns (score, updated state).
+    """
+    session = SessionState.from_dict(state)
+    rows = [session.update(g) for g in new_games]
+    timer.mark('features')
+
+    if not rows:
+        return 0.0, session
+
+    return _last_prob(rows[-1][None, :], backend, personal_model, timer), session
+
+def _score_fields(score, threshold):
+    return {
+        "tilt_score": score,        # <--- The frontend needs this!
+        "stop_probability": score,  # Keep this for clarity
+        "should_stop": score > threshold,
+        "threshold": threshold,
+    }
+
+def _user_models(users):
+    """Each user's personal_model as a Payload, one per distinct payload (hashed at most once)."""
+    seen, models = {}, []
+    for u in users:
+        raw = u.get("personal_model") if isinstance(u, dict) else None
+        if isinstance(raw, str) and raw:
+            models.append(seen.setdefault(raw, personal_models.as_payload(raw)))
         else:
-            print(f"Unknown probability format: {type(probs)}")
-            last_game_prob = 0.0
+            models.append(personal_models.as_payload(raw))
+    return models
+
+def predict_batch(users, backend=None, timer=NULL_TIMER, models=None):
+    """
+    Scores many users with a single ONNX run over their last rows
+    (one extra run per distinct personal_model, if any).
+    Returns one entry per user, in order: {id, tilt_score, ...} or {id, error}.
+    A malformed user or personal model never fails the rest of the batch.
+    `models` (see _user_models) is computed from users when not given.
+    """
+    models = _user_models(users) if models is None else models
+    windows = []
+    for u in users:
+        games = u.get("games") if isinstance(u, dict) else None
+        windows.append(games if isinstance(games, list) else None)
+
+    X, offsets, errors = build_features_grouped([w or [] for w in windows])
+    timer.mark('features')
 
+    # Only the newest game of each user is scored, grouped by model
+    has_rows = offsets[1:] > offsets[:-1]
+    last_row = offsets[1:] - 1
+    groups = {}
+    for i, u in enumerate(users):
+        if windows[i] is not None and i not in errors and has_rows[i]:
+            groups.setdefault(models[i], []).append(i)
+
+    probs, thresholds = {}, {}
+    for model, idx in groups.items():
+        try:
+            thresholds[model] = model_threshold(model)
+            raw = run_model(X[last_row[idx]], backend, model)
+            timer.mark('inference')
+            probs.update(zip(idx, _class1_probs(raw)))
+            timer.mark('extract')
+        except Exception as e:
+            if model is None:
+                raise
+            for i in idx:
+                errors[i] = f"Personal model failed: {e}"
+
+    results = []
+    for i, u in enumerate(users):
+        user_id = u.get("id") if isinstance(u, dict) else None
+        if windows[i] is None:
+            results.append({"id": user_id, "error": "Expected {id, games: [...]}"})
+        elif i in errors:
+            results.append({"id": user_id, "error": errors[i]})
+        elif not has_rows[i]:
+            try:
+                results.append({"id": user_id, **_score_fields(0.0, model_threshold(models[i]))})
+            except Exception as e:
+                if models[i] is None:
+                    raise
+                results.append({"id": user_id, "error": f"Personal model failed: {e}"})
+        else:
+            model = models[i]
+            results.append({"id": user_id, **_score_fields(float(probs[i]), thresholds[model])})
+    return results
+
+# --- BACKFILL ---
+# Games per NDJSON line of a history response (TILT_HISTORY_CHUNK_GAMES)
+HISTORY_CHUNK_GAMES = int(os.environ.get('TILT_HISTORY_CHUNK_GAMES', 1000))
+
+def score_history(cols, backend=None, personal_model=None, timer=NULL_TIMER):
+    """
+    A user's whole history (read_games / read_columns output) -> (bounds, X, scores).
+    Sessions are cut with training's SESSION_GAP_MINUTES rule, and every game is
+    scored as window mode scores its session so far: one featurize pass and one
+    model run instead of a request per game. The live window (/api/tilt sends the
+    last 30 games as one sequence) gives the same score only while it holds
+    exactly that session.
+    """
+    bounds = session_bounds(cols['created_at'])
+    X = featurize(cols, bounds)
+    timer.mark('features')
+    if len(X) == 0:
+        return bounds, X, np.empty(0)
+
+    scores = np.asarray(_class1_probs(run_model(X, backend, personal_model)), dtype=np.float64)
+    timer.mark('inference')
+    return bounds, X, scores
+
+def history_chunks(cols, bounds, X, scores, threshold, chunk_size=HISTORY_CHUNK_GAMES):
+    """
+    Yields one dict per `chunk_size` games (parallel arrays, oldest first), then
+    a summary line {done, games, sessions, threshold}.
+    """
+    n = len(scores)
+    session = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    games_played = X[:, FEATURE_COLS.index('games_played')].astype(np.int64)
+    for start in range(0, n, max(chunk_size, 1)):
+        end = min(start + chunk_size, n)
+        yield {
+            "offset": start,
+            "createdAt": [None if t != t else int(t) for t in cols['created_at'][start:end].tolist()],
+            "session": session[start:end].tolist(),
+            "games_played": games_played[start:end].tolist(),
+            "tilt_score": scores[start:end].tolist(),
+            "should_stop": (scores[start:end] > threshold).tolist(),
+        }
+    yield {"done": True, "games": n, "sessions": len(bounds) - 1, "threshold": threshold}
+
+def _ort_gauges():
+    values = {k: int(v) for k, v in ORT_PROFILE.as_dict().items() if not isinstance(v, str)}
+    if onnx_runner is not None:
+        values['preoptimized_loaded'] = int(onnx_runner.preoptimized)
+    return values
+
+def predict_batch_cached(users, backend=None, timer=NULL_TIMER):
+    """
+    predict_batch() that only scores users whose (model, window) is not cached.
+    Entries are stored without the id, so users sharing a window share an entry.
+    """
+    backend = backend or DEFAULT_BACKEND
+    models = _user_models(users)
+    keys = []
+    for u, model in zip(users, models):
+        games = u.get("games") if isinstance(u, dict) else None
+        if not isinstance(games, list) or not games:
+            keys.append(None)
+            continue
+        keys.append(prediction_cache.prediction_key(model_key(model), backend,
+                                                   prediction_cache.window_fingerprint(games), mode='batch'))
+
+    results = [None] * len(users)
+    misses = []
+    for i, key in enumerate(keys):
+        cached = prediction_cache.cache.get(key)
+        if cached is None:
+            misses.append(i)
+        else:
+            results[i] = {"id": users[i].get("id"), **cached}
+    timer.info['cache_hits'] = len(users) - len(misses)
+    timer.mark('cache')
+
+    if misses:
+        for i, res in zip(misses, predict_batch([users[i] for i in misses], backend, timer,
+                                                [models[i] for i in misses])):
+            results[i] = res
+            if "error" not in res:
+                prediction_cache.cache.set(keys[i], {k: v for k, v in res.items() if k != "id"})
+    return results
+
+# --- WARM PATH ---
+_WARM_GAME = {'createdAt': 0, 'lastMoveAt': 60000}
+
+def warm(backend=None):
+    """
+    Builds the backend's model and pushes one dummy game through features +
+    inference, so lazy imports, tz tables and first-call allocations are paid
+    once at init instead of inside the first request.
+    """
+    t0 = time.perf_counter()
+    run_shared_model(build_features([_WARM_GAME]), backend or DEFAULT_BACKEND)
+    _record('warm', t0)
+
+def reload_models(backend=None):
+    """
+    Re-reads model_path and warms the backend (server.py, when a new bundle
+    lands). On failure the previous models stay loaded and False is returned.
+    """
+    global bundle, onnx_runner, tree_model
+    previous = (bundle, onnx_runner, tree_model)
+    bundle = onnx_runner = tree_model = None
+    try:
+        warm(backend)
     except Exception as e:
-        print(f"Error parsing probability: {e}. Raw data: {probs}")
-        last_game_prob = 0.0
+        bundle, onnx_runner, tree_model = previous
+        print(f"❌ [Reload] Keeping model {bundle.content_hash[:12] if bundle else None}: {e}")
+        return False
+    print(f"✅ [Reload] Model bundle {bundle.content_hash[:12]} loaded: {STARTUP_MS}")
+    return True
 
-    return float(last_game_prob)
+# Eager by default: on Vercel the init phase runs before the first request is
+# timed. Set TILT_EAGER_INIT=0 to defer everything to first use.
+if os.environ.get('TILT_EAGER_INIT', '1') != '0':
+    try:
+        warm()
+        print(f"✅ [Init] Warm start ({DEFAULT_BACKEND}): {STARTUP_MS}")
+    except Exception as e:
+        print(f"❌ [Init] Warm-up failed: {e}")
 
 class handler(BaseHTTPRequestHandler):
-    def _set_headers(self, status=200):
+    def _set_headers(self, status=200, length=0):
         self.send_response(status)
         self.send_header('Content-type', 'application/json')
+        # Always sent, so keep-alive connections (server.py) know where a response ends
+        self.send_header('Content-Length', str(length))
         self.send_header('Access-Control-Allow-Origin', '*') 
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.end_headers()
 
     def do_OPTIONS(self):
         self._set_headers(200)
 
+    def do_GET(self):
+        # Prometheus scrape: request/stage histograms + startup and cache gauges
+        body = metrics.render(
+            metrics.render_gauges('tilt_startup_ms', 'Cold-start time per init stage', 'stage', STARTUP_MS)
+            + metrics.render_gauges('tilt_model_bundle', 'Loaded model bundle (value = stop threshold)',
+                                    'content_hash', {bundle.content_hash: bundle.threshold} if bundle else {})
+            + metrics.render_gauges('tilt_ort_profile', 'ONNX Runtime profile (threads, flags as 0/1)', 'setting',
+                                    _ort_gauges())
+            + metrics.render_gauges('tilt_prediction_cache', 'Prediction cache stats', 'stat',
+                                    prediction_cache.cache.stats())
+            + metrics.render_gauges('tilt_microbatch', 'Micro-batcher settings and totals', 'stat',
+                                    {f'{b}_{k}': v for b, m in batchers.items() for k, v in m.stats().items()})
+            + metrics.render_gauges('tilt_personal_model_cache', 'Personal model LRU stats', 'stat',
+                                    personal_models.cache.stats())
+        ).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_json(self, obj, status=200):
+        body = json.dumps(obj).encode('utf-8')
+        self._set_headers(status, len(body))
+        self.wfile.write(body)
+
+    def _write_score(self, score, threshold, **extra):
+        # FIX: Add "tilt_score" to match what page.tsx expects
+        response = _score_fields(score, threshold)
+        response.update(extra)
+        self._write_json(response)
+        return response
+
     def do_POST(self):
+        timer = StageTimer()
+        status = 200
         try:
-            content_len = int(self.headers.get('content-length', 0))
-            body = self.rfile.read(content_len)
-            payload = json.loads(body)
-            games = payload.get("games", [])
-
-            if not games:
-                self._set_headers(200)
-                self.wfile.write(json.dumps({"stop_probability": 0.0, "tilt_score": 0.0}).encode('utf-8'))
-                return
-
-            score = preprocess_and_predict(games)
-            
-            self._set_headers(200)
-            # FIX: Add "tilt_score" to match what page.tsx expects
-            self.wfile.write(json.dumps({
-                "tilt_score": score,        # <--- The frontend needs this!
-                "stop_probability": score,  # Keep this for clarity
-                "should_stop": score > 0.5
-            }).encode('utf-8'))
-            
+            self._handle_post(timer)
         except Exception as e:
+            status = 500
             print(f"Runtime Error: {e}")
-            self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode('utf-8'))
\ No newline at end of file
+            self._write_json({"error": str(e)}, 500)
+        finally:
+            timer.mark('respond')
+            timer.finish(timer.info.pop('mode', 'unknown'), status)
+
+    def _handle_post(self, timer):
+        content_len = int(self.headers.get('content-length', 0))
+        body = self.rfile.read(content_len)
+
+        # --- COLUMNAR MODE (binary): Content-Type negotiated, see columnar.py ---
+        content_type = (self.headers.get('content-type') or '').split(';')[0].strip().lower()
+        if content_type == columnar.MEDIA_TYPE:
+            columns, meta = columnar.decode(body)
+            timer.mark('parse')
+            if meta.get("history"):
+                self._predict_history(read_columns(columns), personal_models.as_payload(meta.get("personal_model")),
+                                      timer)
+                return
+            self._predict_columns(columns, personal_models.as_payload(meta.get("personal_model")), timer)
+            return
+
+        payload = json.loads(body)
+        games = payload.get("games", [])
+        personal_model = personal_models.as_payload(payload.get("personal_model"))
+        timer.mark('parse')
+
+        # --- COLUMNAR MODE (JSON): {columns: {createdAt: [...], ...}} ---
+        if "columns" in payload:
+            self._predict_columns(columnar.from_json(payload["columns"]), personal_model, timer)
+            return
+
+        # --- HISTORY MODE: {history: [games] | {columns}} -> NDJSON, every game scored ---
+        if "history" in payload:
+            history = payload["history"] or []
+            cols = read_columns(columnar.from_json(history["columns"])) if isinstance(history, dict) \
+                else read_games(history)
+            self._predict_history(cols, personal_model, timer)
+            return
+
+        # --- BATCH MODE: {users: [{id, games}, ...]} ---
+        if "users" in payload:
+            users = payload["users"] or []
+            timer.info.update(mode='batch', users=len(users))
+            results = predict_batch_cached(users, timer=timer)
+            self._write_json({"results": results})
+            return
+
+        # --- INCREMENTAL MODE: {state, new_game | new_games} ---
+        # Request size and CPU no longer grow with the window length.
+        if "new_game" in payload or "new_games" in payload:
+            new_games = payload.get("new_games")
+            if new_games is None:
+                new_games = [payload["new_game"]]
+            timer.info.update(mode='incremental', games=len(new_games))
+            score, session = predict_incremental(payload.get("state"), new_games,
+                                                 personal_model=personal_model, timer=timer)
+            self._write_score(score, model_threshold(personal_model), state=session.to_dict())
+            return
+
+        timer.info.update(mode='window', games=len(games))
+        if not games:
+            self._write_json({"stop_probability": 0.0, "tilt_score": 0.0})
+            return
+
+        # Unchanged window (same model, same games): replay the last response
+        key = prediction_cache.prediction_key(model_key(personal_model), DEFAULT_BACKEND,
+                                              prediction_cache.window_fingerprint(games))
+        cached = prediction_cache.cache.get(key)
+        timer.info['cache'] = 'miss' if cached is None else 'hit'
+        timer.mark('cache')
+        if cached is not None:
+            self._write_json(cached)
+            return
+
+        score = preprocess_and_predict(games, personal_model=personal_model, timer=timer)
+        
+        # Seed state so the caller can switch to incremental mode next time
+        state = SessionState.from_games(games).to_dict()
+        timer.mark('state')
+        prediction_cache.cache.set(key, self._write_score(score, model_threshold(personal_model), state=state))
+
+    def _predict_history(self, cols, personal_model, timer):
+        """Backfill: scores the whole history first, then streams it in chunks."""
+        timer.info.update(mode='history', games=len(cols['created_at']))
+        bounds, X, scores = score_history(cols, personal_model=personal_model, timer=timer)
+        self._stream_ndjson(history_chunks(cols, bounds, X, scores, model_threshold(personal_model),
+                                           HISTORY_CHUNK_GAMES))
+
+    def _stream_ndjson(self, lines):
+        """
+        One JSON object per line, written as it is produced. Chunked transfer on
+        HTTP/1.1 (server.py keeps the connection); otherwise the end of the
+        response is the connection closing.
+        """
+        chunked = self.protocol_version == 'HTTP/1.1' and getattr(self, 'request_version', None) == 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.close_connection = True
+        self.end_headers()
+        for obj in lines:
+            data = (json.dumps(obj) + '\n').encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data) if chunked else data)
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+
+    def _predict_columns(self, columns, personal_model, timer):
+        """Window mode over columns: same response (score + seeded state) as {games: [...]}."""
+        cols = read_columns(columns)
+        n = len(cols['created_at'])
+        timer.info.update(mode='columns', games=n)
+        if n == 0:
+            self._write_json({"stop_probability": 0.0, "tilt_score": 0.0})
+            return
+
+        key = prediction_cache.prediction_key(model_key(personal_model), DEFAULT_BACKEND,
+                                              prediction_cache.columns_fingerprint(columns))
+        cached = prediction_cache.cache.get(key)
+        timer.info['cache'] = 'miss' if cached is None else 'hit'
+        timer.mark('cache')
+        if cached is not None:
+            self._write_json(cached)
+            return
+
+        X = featurize(cols, [0, n])
+        timer.mark('features')
+        score = _last_prob(X, personal_model=personal_model, timer=timer)
+
+        state = SessionState.from_columns(columns).to_dict()
+        timer.mark('state')
+        prediction_cache.cache.set(key, self._write_score(score, model_threshold(personal_model), state=state))
\ No newline at end of file
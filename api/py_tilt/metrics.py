@@ -0,0 +1,176 @@
+# File: api/py_tilt/metrics.py
+"""
+Per-stage request timing for /api/py_tilt, exposed as Prometheus text and
+as one structured (JSON) log line per request.
+
+Standard library only, and cheap enough to leave on: a stage mark is one
+perf_counter() call, and a histogram observation is a bisect plus a few
+adds under an uncontended lock. Metrics are per process (per warm instance).
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds: 50us .. ~6.5s, x2 per bucket
+LATENCY_BUCKETS = tuple(50e-6 * 2 ** i for i in range(18))
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+WINDOW_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 100, 200, 500, 1000)
+FILL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+LOG_TIMINGS = os.environ.get('TILT_TIMING_LOGS', '1') != '0'
+
+
+def _labels_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+def _fmt(v):
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labels, s in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), s[:-1]):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else _fmt(bound)
+                lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, labels, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, labels)} {s[-1]!r}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, v in sorted(values.items()):
+            lines.append(f"{self.name}{_labels_text(self.labelnames, labels)} {v}")
+        return lines
+
+
+def render_gauges(name, help_text, labelname, values):
+    """Gauge family from a {label: value} dict (e.g. STARTUP_MS, cache stats)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for label, v in sorted(values.items()):
+        lines.append(f'{name}{{{labelname}="{label}"}} {v}')
+    return lines
+
+
+# --- Process-wide metrics ---
+stage_seconds = Histogram('tilt_stage_seconds', 'Time spent per request stage', LATENCY_BUCKETS, ('stage',))
+request_seconds = Histogram('tilt_request_seconds', 'End-to-end handler time', LATENCY_BUCKETS, ('mode',))
+batch_size = Histogram('tilt_batch_users', 'Users per batch request', BATCH_BUCKETS)
+window_games = Histogram('tilt_window_games', 'Games per scored window', WINDOW_BUCKETS, ('mode',))
+requests_total = Counter('tilt_requests_total', 'Requests by mode and HTTP status', ('mode', 'status'))
+# Micro-batching (micro_batch.py)
+microbatch_rows = Histogram('tilt_microbatch_rows', 'Rows per stacked inference', BATCH_BUCKETS, ('backend',))
+microbatch_requests = Histogram('tilt_microbatch_requests', 'Requests coalesced per stacked inference',
+                                BATCH_BUCKETS, ('backend',))
+microbatch_fill = Histogram('tilt_microbatch_fill', 'Rows per stacked inference / max rows', FILL_BUCKETS,
+                            ('backend',))
+microbatch_queue_seconds = Histogram('tilt_microbatch_queue_seconds', 'Wait from submit to dispatch',
+                                     LATENCY_BUCKETS, ('backend',))
+
+
+class StageTimer:
+    """
+    Marks consecutive stages of one request: mark('features') records the time
+    since the previous mark under that stage (repeated stages accumulate).
+    """
+    __slots__ = ('start', 'last', 'stages', 'info')
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.stages = {}
+        self.info = {}
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self.last)
+        self.last = now
+
+    def finish(self, mode, status):
+        """Publishes stage/total histograms + counters and the structured log line."""
+        total = time.perf_counter() - self.start
+        for stage, seconds in self.stages.items():
+            stage_seconds.observe(seconds, stage)
+        request_seconds.observe(total, mode)
+        requests_total.inc(mode, str(status))
+        if 'users' in self.info:
+            batch_size.observe(self.info['users'])
+        if 'games' in self.info:
+            window_games.observe(self.info['games'], mode)
+
+        if LOG_TIMINGS:
+            print(json.dumps({
+                'event': 'tilt_request',
+                'mode': mode,
+                'status': status,
+                'total_ms': round(total * 1000, 3),
+                'stages_ms': {k: round(v * 1000, 3) for k, v in self.stages.items()},
+                **self.info,
+            }))
+        return total
+
+
+class _NullTimer:
+    """Stand-in when a caller does not time stages (library use, warm-up)."""
+
+    @property
+    def info(self):
+        # Fresh per access: NULL_TIMER is shared, so writes must go nowhere
+        return {}
+
+    def mark(self, stage):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def render(extra_lines=()):
+    lines = []
+    for metric in (requests_total, request_seconds, stage_seconds, batch_size, window_games,
+                   microbatch_rows, microbatch_requests, microbatch_fill, microbatch_queue_seconds):
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,143 @@
+# File: api/py_tilt/micro_batch.py
+"""
+Dynamic micro-batching for the shared model.
+
+Under concurrent load (server.py runs one thread per connection), every
+request would otherwise call the model on its own 1-row matrix and pay the
+fixed per-call overhead each time. A MicroBatcher queues the rows; the
+oldest waiting request is the leader: it waits until `max_rows` rows are
+queued or it has waited `max_wait_us`, runs one stacked inference on its own
+thread and hands each caller its slice, then passes leadership to the oldest
+request left in the queue. No dispatcher thread: a hand-off to one costs more
+than a 1-row model call (scripts/bench_microbatch.py), and nothing has to be
+restarted after server.py forks.
+
+- A submit() that alone fills a batch skips the queue.
+- An inference error is raised in every caller of that batch.
+- Metrics: rows / requests / fill per batch and the queueing delay
+  (tilt_microbatch_* in metrics.py).
+
+Off by default (TILT_MICROBATCH=1): a lone request would only wait. Personal
+models are never batched (one model per request).
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import metrics
+
+ENABLED = os.environ.get('TILT_MICROBATCH', '0') != '0'
+MAX_ROWS = int(os.environ.get('TILT_MICROBATCH_MAX_ROWS', 64))
+MAX_WAIT_US = float(os.environ.get('TILT_MICROBATCH_WAIT_US', 200))
+
+
+class _Pending:
+    __slots__ = ('X', 'submitted', 'done', 'lead', 'result', 'error')
+
+    def __init__(self, X):
+        self.X = X
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.lead = False        # promoted to leader instead of being answered
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent run_fn(X) calls into one run_fn(np.vstack(...))."""
+
+    def __init__(self, run_fn, max_rows=MAX_ROWS, max_wait_us=MAX_WAIT_US, name='onnx'):
+        self.run_fn = run_fn
+        self.max_rows = max_rows
+        self.max_wait = max_wait_us / 1e6
+        self.name = name
+        self._queue = deque()
+        self._queued_rows = 0
+        self._leader = False     # invariant: no leader => empty queue
+        self._cond = threading.Condition()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, X):
+        """Probability rows for X, computed in a shared batch. Blocks until done."""
+        if len(X) >= self.max_rows:
+            return self.run_fn(X)
+
+        item = _Pending(X)
+        with self._cond:
+            self._queue.append(item)
+            self._queued_rows += len(X)
+            lead = not self._leader
+            if lead:
+                self._leader = True
+            else:
+                self._cond.notify()
+
+        if not lead:
+            item.done.wait()
+            if item.lead:
+                item.done.clear()
+                lead = True
+        if lead:
+            self._lead()   # our own item is at the head of the queue
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _lead(self):
+        """Collects a batch (full, or the oldest item's deadline), runs it, answers it."""
+        with self._cond:
+            deadline = self._queue[0].submitted + self.max_wait
+            while self._queued_rows < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, rows = [], 0
+            while self._queue and rows + len(self._queue[0].X) <= self.max_rows:
+                item = self._queue.popleft()
+                batch.append(item)
+                rows += len(item.X)
+            self._queued_rows -= rows
+
+        start = time.perf_counter()
+        for item in batch:
+            metrics.microbatch_queue_seconds.observe(start - item.submitted, self.name)
+        metrics.microbatch_rows.observe(rows, self.name)
+        metrics.microbatch_requests.observe(len(batch), self.name)
+        metrics.microbatch_fill.observe(rows / self.max_rows, self.name)
+
+        try:
+            probs = self.run_fn(batch[0].X if len(batch) == 1 else np.vstack([item.X for item in batch]))
+            offset = 0
+            for item in batch:
+                n = len(item.X)
+                item.result = probs[offset:offset + n]
+                offset += n
+        except Exception as e:
+            for item in batch:
+                item.error = e
+
+        with self._cond:
+            self.batches += 1
+            self.requests += len(batch)
+            # Hand leadership to the oldest request left behind, if any
+            if self._queue:
+                self._queue[0].lead = True
+                self._queue[0].done.set()
+            else:
+                self._leader = False
+        for item in batch[1:]:
+            item.done.set()
+
+    def stats(self):
+        return {
+            'max_rows': self.max_rows,
+            'max_wait_us': self.max_wait * 1e6,
+            'batches': self.batches,
+            'requests': self.requests,
+        }
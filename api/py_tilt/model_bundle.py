@@ -0,0 +1,181 @@
+# File: api/py_tilt/model_bundle.py
+"""
+Single-file, versioned model bundle: everything needed to serve a tilt model.
+
+Replaces the model.onnx + model.json + tilt_config.joblib trio (which could
+drift apart, and needed joblib/pickle to load). Standard library only.
+
+Layout (little-endian):
+    magic      8 bytes   b"TILTMDL\\0"
+    version    u16       BUNDLE_VERSION
+    reserved   u16
+    header_len u32
+    header     JSON      features, threshold, meta, sections, content_hash
+    sections   raw bytes, each starting on a SECTION_ALIGN boundary
+
+Sections are opaque blobs keyed by name ('onnx' = serialized ONNX graph,
+'onnx_optimized' = the same graph pre-optimized by onnxruntime, 'xgb_json' =
+XGBoost JSON booster). Opening a bundle is one mmap plus a JSON parse of the
+header; sections are handed out as zero-copy memoryviews.
+`content_hash` (sha256 over the header fields and every section) identifies
+the model for caching and is verified on open.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+MAGIC = b"TILTMDL\0"
+BUNDLE_VERSION = 1
+SECTION_ALIGN = 64
+_PREAMBLE = struct.Struct('<8sHHI')
+
+SECTION_ONNX = 'onnx'
+SECTION_ONNX_OPTIMIZED = 'onnx_optimized'   # graph after ORT optimizations (see ort_profile.py)
+SECTION_XGB_JSON = 'xgb_json'
+
+
+class BundleError(ValueError):
+    """Not a bundle, an unsupported version, or corrupt contents."""
+
+
+def is_bundle(data):
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def _json_default(o):
+    # NumPy scalars/arrays (thresholds, CV results) without importing NumPy here
+    if hasattr(o, 'tolist'):
+        return o.tolist()
+    return str(o)
+
+
+def _content_hash(features, threshold, meta, sections):
+    h = hashlib.sha256()
+    h.update(json.dumps({'features': features, 'threshold': threshold, 'meta': meta},
+                        sort_keys=True, default=_json_default).encode('utf-8'))
+    for name in sorted(sections):
+        data = sections[name]
+        h.update(struct.pack('<I', len(name)) + name.encode('utf-8'))
+        h.update(struct.pack('<Q', len(data)))
+        h.update(data)
+    return h.hexdigest()
+
+
+def _align(n):
+    return -n % SECTION_ALIGN
+
+
+def build_bundle(sections, features, threshold, meta=None):
+    """Serializes a bundle: `sections` = {name: bytes}. Returns bytes."""
+    features = list(features)
+    threshold = float(threshold)
+    # Round-trip meta through JSON so the hash covers exactly what is stored
+    meta = json.loads(json.dumps(meta or {}, default=_json_default))
+    sections = {name: bytes(data) for name, data in sections.items()}
+
+    names = sorted(sections)
+    # Offsets depend on the header length, which depends on the offsets:
+    # re-render the header until the layout stops moving
+    layout = {name: [0, len(sections[name])] for name in names}
+    header = {
+        'features': features,
+        'threshold': threshold,
+        'meta': meta,
+        'sections': layout,
+        'content_hash': _content_hash(features, threshold, meta, sections),
+    }
+    while True:   # converges: offsets only grow, and only by a few digits
+        header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+        pos = _PREAMBLE.size + len(header_bytes)
+        changed = False
+        for name in names:
+            pos += _align(pos)
+            if layout[name][0] != pos:
+                layout[name][0], changed = pos, True
+            pos += layout[name][1]
+        if not changed:
+            break
+
+    out = bytearray(_PREAMBLE.pack(MAGIC, BUNDLE_VERSION, 0, len(header_bytes)))
+    out += header_bytes
+    for name in names:
+        out += b'\0' * (layout[name][0] - len(out))
+        out += sections[name]
+    return bytes(out)
+
+
+def write_bundle(path, sections, features, threshold, meta=None):
+    """build_bundle() written atomically to `path`. Returns the content hash."""
+    data = build_bundle(sections, features, threshold, meta)
+    path = os.fspath(path)
+    fd, tmp = tempfile.mkstemp(prefix='.bundle.', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return ModelBundle.from_bytes(data, verify=False).content_hash
+
+
+class ModelBundle:
+    """Parsed bundle over an mmap (from open()) or an in-memory buffer (from_bytes())."""
+
+    def __init__(self, buffer, verify=True):
+        self._buffer = memoryview(buffer)
+        if len(self._buffer) < _PREAMBLE.size or not is_bundle(self._buffer):
+            raise BundleError("Not a tilt model bundle (bad magic)")
+        _, version, _, header_len = _PREAMBLE.unpack_from(self._buffer)
+        if version > BUNDLE_VERSION:
+            raise BundleError(f"Bundle version {version} is newer than supported ({BUNDLE_VERSION})")
+        end = _PREAMBLE.size + header_len
+        try:
+            header = json.loads(bytes(self._buffer[_PREAMBLE.size:end]))
+        except ValueError as e:
+            raise BundleError(f"Corrupt bundle header: {e}")
+
+        self.version = version
+        self.features = header['features']
+        self.threshold = float(header['threshold'])
+        self.meta = header.get('meta', {})
+        self.content_hash = header['content_hash']
+        self._sections = {}
+        for name, (offset, length) in header['sections'].items():
+            if offset < end or offset + length > len(self._buffer):
+                raise BundleError(f"Section {name!r} lies outside the bundle")
+            self._sections[name] = (offset, length)
+
+        if verify:
+            actual = _content_hash(self.features, self.threshold, self.meta,
+                                   {name: self.section(name) for name in self._sections})
+            if actual != self.content_hash:
+                raise BundleError(f"Content hash mismatch ({actual[:12]} != {self.content_hash[:12]})")
+
+    @classmethod
+    def open(cls, path, verify=True):
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm, verify=verify)
+
+    @classmethod
+    def from_bytes(cls, data, verify=True):
+        return cls(data, verify=verify)
+
+    @property
+    def sections(self):
+        return sorted(self._sections)
+
+    def __contains__(self, name):
+        return name in self._sections
+
+    def section(self, name):
+        """Zero-copy view of a section's bytes."""
+        if name not in self._sections:
+            raise BundleError(f"Bundle has no {name!r} section (has {self.sections})")
+        offset, length = self._sections[name]
+        return self._buffer[offset:offset + length]
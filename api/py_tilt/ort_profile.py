@@ -0,0 +1,153 @@
+# File: api/py_tilt/ort_profile.py
+"""
+ONNX Runtime inference profile for /api/py_tilt, tuned for a single-vCPU
+serverless instance, plus the conversion-time graph optimization it loads.
+
+- Threads: one intra-op and one inter-op thread, sequential execution and no
+  spin-waiting (spinning only burns the one vCPU the request needs).
+- Pre-optimized graph: scripts/convert_to_onnx.py stores an already optimized
+  copy of the graph in the bundle ('onnx_optimized'); sessions built from it
+  skip graph optimization at cold start. It is only used when the runtime
+  version matches the one that produced it, otherwise the plain graph is
+  optimized online as before.
+- Run: input/output names are resolved once and only the probability output
+  is fetched (the labels output is never copied out). IOBinding is available
+  (TILT_ORT_IO_BINDING=1) but off: the output has to be re-bound every call
+  because the batch size varies, which makes it slower for one-row requests
+  (scripts/bench_ort_profile.py).
+
+onnxruntime is imported lazily, so the 'trees' backend never pays for it.
+Every knob can be overridden with TILT_ORT_* environment variables.
+"""
+import os
+import threading
+
+from model_bundle import SECTION_ONNX, SECTION_ONNX_OPTIMIZED
+
+# 'all' adds layout rewrites (NCHWc) that are tied to the converting machine's
+# CPU; 'extended' graphs are portable across CPU hosts
+OFFLINE_LEVEL = 'extended'
+
+_LEVELS = {
+    'disabled': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+
+
+def _env_flag(name, default):
+    return os.environ.get(name, '1' if default else '0') != '0'
+
+
+class InferenceProfile:
+    """Session + run settings. from_env() is what the handler uses."""
+
+    def __init__(self, intra_op_threads=1, inter_op_threads=1, allow_spinning=False,
+                 optimization='all', use_preoptimized=True, io_binding=False):
+        if optimization not in _LEVELS:
+            raise ValueError(f"Unknown optimization level '{optimization}'. Expected one of {tuple(_LEVELS)}")
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.allow_spinning = allow_spinning
+        self.optimization = optimization
+        self.use_preoptimized = use_preoptimized
+        self.io_binding = io_binding
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            intra_op_threads=int(os.environ.get('TILT_ORT_INTRA_THREADS', 1)),
+            inter_op_threads=int(os.environ.get('TILT_ORT_INTER_THREADS', 1)),
+            allow_spinning=_env_flag('TILT_ORT_SPINNING', False),
+            optimization=os.environ.get('TILT_ORT_OPTIMIZATION', 'all'),
+            use_preoptimized=_env_flag('TILT_ORT_PREOPTIMIZED', True),
+            io_binding=_env_flag('TILT_ORT_IO_BINDING', False),
+        )
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def session_options(self, ort, preoptimized=False):
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = self.intra_op_threads
+        so.inter_op_num_threads = self.inter_op_threads
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.add_session_config_entry('session.intra_op.allow_spinning', '1' if self.allow_spinning else '0')
+        so.add_session_config_entry('session.inter_op.allow_spinning', '1' if self.allow_spinning else '0')
+        level = 'disabled' if preoptimized else self.optimization
+        so.graph_optimization_level = getattr(ort.GraphOptimizationLevel, _LEVELS[level])
+        return so
+
+
+def optimize_graph(model_bytes, level=OFFLINE_LEVEL):
+    """Conversion time: serialized ONNX -> the same graph after ORT's optimizations. Returns (bytes, info)."""
+    import tempfile
+    import onnxruntime as ort
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'optimized.onnx')
+        so = ort.SessionOptions()
+        so.graph_optimization_level = getattr(ort.GraphOptimizationLevel, _LEVELS[level])
+        so.optimized_model_filepath = out
+        ort.InferenceSession(model_bytes, so, providers=['CPUExecutionProvider'])
+        with open(out, 'rb') as f:
+            optimized = f.read()
+    return optimized, {'ort_version': ort.__version__, 'level': level}
+
+
+class OrtRunner:
+    """
+    One InferenceSession run the profile's way. run(X) returns the
+    probability output only (same value as session.run(None, ...)[1]).
+    """
+
+    def __init__(self, model_bytes, profile=None, preoptimized=False):
+        import onnxruntime as ort
+
+        self.profile = profile or InferenceProfile()
+        self.preoptimized = preoptimized
+        self.session = ort.InferenceSession(model_bytes, self.profile.session_options(ort, preoptimized),
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        outputs = self.session.get_outputs()
+        prob = outputs[1] if len(outputs) > 1 else outputs[0]
+        self.output_name = prob.name
+        # ZipMap outputs (sequence of maps) cannot be bound: plain run() for those
+        self.binding = self.profile.io_binding and prob.type.startswith('tensor')
+        self._local = threading.local()
+
+    def _io_binding(self):
+        io = getattr(self._local, 'io', None)
+        if io is None:
+            io = self._local.io = self.session.io_binding()
+        return io
+
+    def run(self, X):
+        if not self.binding:
+            return self.session.run([self.output_name], {self.input_name: X})[0]
+        io = self._io_binding()
+        io.bind_cpu_input(self.input_name, X)
+        # Re-bound unallocated every call: a filled output keeps its shape,
+        # and the batch size changes between calls
+        io.bind_output(self.output_name)
+        self.session.run_with_iobinding(io)
+        return io.copy_outputs_to_cpu()[0]
+
+    # Same surface as TreeEnsemble, for personal models
+    predict_proba = run
+
+
+def load_runner(bundle, profile=None):
+    """
+    Runner for a model bundle: the pre-optimized graph when the profile allows it
+    and this onnxruntime produced it, else the plain graph optimized online.
+    """
+    import onnxruntime as ort
+
+    profile = profile or InferenceProfile()
+    info = bundle.meta.get('ort_optimized') or {}
+    if (profile.use_preoptimized and SECTION_ONNX_OPTIMIZED in bundle
+            and info.get('ort_version') == ort.__version__):
+        return OrtRunner(bytes(bundle.section(SECTION_ONNX_OPTIMIZED)), profile, preoptimized=True)
+    return OrtRunner(bytes(bundle.section(SECTION_ONNX)), profile)
@@ -0,0 +1,152 @@
+# File: api/py_tilt/personal_models.py
+"""
+Personal model decoding + a bounded LRU of ready-to-run predictors.
+
+`personal_model` arrives base64-encoded with every /api/py_tilt request. It is
+a model bundle (what TiltModel.to_base64 produces; carries its own threshold),
+a bare XGBoost JSON booster or a serialized ONNX model. Entries are keyed by a
+hash of the payload itself, so a repeat request for the same user skips base64
+decoding and deserialization. Request handlers wrap the payload in Payload
+first, so that hash is computed once per request.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from model_bundle import SECTION_ONNX, SECTION_XGB_JSON, ModelBundle, is_bundle
+from ort_profile import InferenceProfile, OrtRunner
+from tilt_features import FEATURE_COLS
+
+MAX_ENTRIES = int(os.environ.get('PERSONAL_MODEL_CACHE_ENTRIES', 64))
+MAX_BYTES = int(os.environ.get('PERSONAL_MODEL_CACHE_MB', 64)) * 1024 * 1024
+
+# Personal ONNX models run with the same session profile as the shared model
+# (OrtRunner.predict_proba has the same surface as TreeEnsemble)
+ORT_PROFILE = InferenceProfile.from_env()
+
+
+def decode_personal_model(payload):
+    """base64 string -> (predictor, decoded size in bytes)."""
+    raw = base64.b64decode(payload)
+    if is_bundle(raw):
+        return _from_bundle(ModelBundle.from_bytes(raw)), len(raw)
+    if raw.lstrip()[:1] == b'{':
+        from tree_ensemble import TreeEnsemble
+        return TreeEnsemble.from_dict(json.loads(raw)), len(raw)
+    return OrtRunner(raw, ORT_PROFILE), len(raw)
+
+
+def _from_bundle(bundle):
+    if bundle.features != FEATURE_COLS:
+        raise ValueError(f"Personal model expects features {bundle.features}, not tilt_features.FEATURE_COLS")
+    if SECTION_ONNX in bundle:
+        predictor = OrtRunner(bytes(bundle.section(SECTION_ONNX)), ORT_PROFILE)
+    else:
+        from tree_ensemble import TreeEnsemble
+        predictor = TreeEnsemble.from_dict(json.loads(bytes(bundle.section(SECTION_XGB_JSON))))
+    predictor.stop_threshold = bundle.threshold
+    return predictor
+
+
+def _sha256(payload):
+    return hashlib.sha256(payload.encode('ascii') if isinstance(payload, str) else payload).hexdigest()
+
+
+class Payload(str):
+    """A base64 personal_model string that remembers its payload_key."""
+    _key = None
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = _sha256(self)
+        return self._key
+
+
+def as_payload(value):
+    """Request field -> Payload (str) or the value unchanged; empty -> None."""
+    if not value:
+        return None
+    return Payload(value) if isinstance(value, str) and not isinstance(value, Payload) else value
+
+
+def payload_key(payload):
+    return payload.key if isinstance(payload, Payload) else _sha256(payload)
+
+
+class PersonalModelCache:
+    """
+    LRU of decoded personal models, capped by entry count and decoded bytes.
+    Thread-safe (server.py workers); decoding happens outside the lock.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (predictor, nbytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, payload):
+        """Returns the predictor for a base64 payload, decoding it only on a miss."""
+        key = payload_key(payload)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        predictor, nbytes = decode_personal_model(payload)
+        with self._lock:
+            if key in self._entries:   # decoded concurrently by another thread
+                return self._entries[key][0]
+            self._entries[key] = (predictor, nbytes)
+            self.bytes += nbytes
+            self._evict()
+        return predictor
+
+    def threshold(self, payload, default):
+        """Stop threshold carried by the payload's model (bundles only), else `default`."""
+        with self._lock:
+            entry = self._entries.get(payload_key(payload))
+        predictor = entry[0] if entry is not None else self.get(payload)
+        return getattr(predictor, 'stop_threshold', default)
+
+    def _evict(self):
+        # Never evict the entry just inserted, even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            key, (_, nbytes) = self._entries.popitem(last=False)
+            self.bytes -= nbytes
+            self.evictions += 1
+            print(f"♻️ [PersonalModels] Evicted {key[:12]} ({nbytes} bytes)")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+# Process-wide cache shared by all requests
+cache = PersonalModelCache()
@@ -0,0 +1,268 @@
+# File: api/py_tilt/prediction_cache.py
+"""
+Memoized predictions for unchanged game windows.
+
+The dashboard and useAnalysisQueue re-trigger /api/tilt with the same 30
+games again and again. A prediction is a pure function of (model, window), so
+responses are cached under:
+
+    model key   bundle content_hash, or the personal payload's hash
+    backend     'onnx' / 'trees' (equal to ~1e-7, but not bit-identical)
+    window      fingerprint of every game's id + INPUT_FIELDS (columnar
+                requests: of the column data itself)
+
+Timestamps alone are not enough: the analysis queue fills in my_acpl and
+my_blunder_count after a game is synced, with the same id and createdAt.
+
+Entries live in a bounded TTL + LRU dict. An optional backing store is
+consulted on a memory miss, so workers and restarted instances on the same disk
+share results. A store is any object with
+    get(key, now) -> (value, expires_at) or None
+    set(key, value, expires_at)
+    clear()
+FileStore is the local-disk one (PREDICTION_CACHE_DIR, at most
+PREDICTION_CACHE_DIR_ENTRIES files). Store failures are counted and logged,
+never raised into a request.
+
+Incremental requests are not cached: their saved state changes every call.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from tilt_features import INPUT_FIELDS
+
+MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_ENTRIES', 4096))   # 0 disables caching
+TTL_SECS = float(os.environ.get('PREDICTION_CACHE_TTL_SECS', 600))
+STORE_DIR = os.environ.get('PREDICTION_CACHE_DIR') or None
+STORE_MAX_FILES = int(os.environ.get('PREDICTION_CACHE_DIR_ENTRIES', 16384))
+STORE_SWEEP_SECS = 60
+
+FINGERPRINT_FIELDS = ('id',) + INPUT_FIELDS
+
+
+def window_fingerprint(games):
+    """
+    Digest of the fields a prediction depends on, in request order (the same
+    games reordered simply miss). None when a game is not a dict.
+    """
+    rows = []
+    for g in games:
+        if not isinstance(g, dict):
+            return None
+        rows.append([g.get(f) for f in FINGERPRINT_FIELDS])
+    data = json.dumps(rows, separators=(',', ':'), default=str).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def columns_fingerprint(cols):
+    """
+    Digest of a columnar window as sent ({game key: float64 array}, NaN =
+    missing): the seeded state tells missing values from defaults.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(cols):
+        h.update(name.encode('utf-8'))
+        h.update(cols[name].tobytes())
+    return 'c' + h.hexdigest()
+
+
+def prediction_key(model_key, backend, fingerprint, mode='window'):
+    """Cache key, or None without a fingerprint. `mode` keeps response shapes apart."""
+    if fingerprint is None:
+        return None
+    return f"{mode}:{model_key}:{backend}:{fingerprint}"
+
+
+class FileStore:
+    """
+    One JSON file per key under `directory` ({key, expires_at, value}), written
+    atomically, with expires_at as its mtime. Expired files are dropped when
+    read, and set() sweeps the directory at most every `sweep_secs`: expired
+    files first, then the soonest-expiring beyond `max_files` (windows change
+    all the time, so most keys are never read again). clear() removes them all.
+    """
+
+    def __init__(self, directory, max_files=STORE_MAX_FILES, sweep_secs=STORE_SWEEP_SECS):
+        self.directory = directory
+        self.max_files = max_files
+        self.sweep_secs = sweep_secs
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        # Keys contain ':'; hash them to a portable file name
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest()[:40] + '.json')
+
+    def get(self, key, now=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != key:
+            return None
+        if entry['expires_at'] <= (now if now is not None else time.time()):
+            self._unlink(path)
+            return None
+        return entry['value'], entry['expires_at']
+
+    def set(self, key, value, expires_at):
+        fd, tmp = tempfile.mkstemp(prefix='.entry.', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'key': key, 'expires_at': expires_at, 'value': value}, f)
+            os.utime(tmp, (expires_at, expires_at))
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        now = time.time()
+        with self._sweep_lock:
+            due = now >= self._next_sweep
+            if due:
+                self._next_sweep = now + self.sweep_secs
+        if due:
+            self.sweep(now)
+
+    def sweep(self, now=None):
+        """Removes expired entry files, then the soonest-expiring beyond max_files. Returns the count."""
+        now = now if now is not None else time.time()
+        live, removed = [], 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    expires_at = entry.stat().st_mtime
+                except OSError:
+                    continue
+                if expires_at <= now:
+                    removed += self._unlink(entry.path)
+                else:
+                    live.append((expires_at, entry.path))
+        if len(live) > self.max_files:
+            live.sort()
+            for _, path in live[:len(live) - self.max_files]:
+                removed += self._unlink(path)
+        return removed
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+            return 1
+        except OSError:
+            return 0
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                self._unlink(os.path.join(self.directory, name))
+
+
+class PredictionCache:
+    """TTL + LRU of JSON-ready responses, optionally backed by a store. Thread-safe."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECS, store=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._entries = OrderedDict()   # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.store_errors = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Cached value for `key`, or None. Values must be treated as read-only."""
+        if not self.enabled or key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self.expirations += 1
+
+        if self.store is not None:
+            try:
+                found = self.store.get(key, now)
+            except Exception as e:
+                found = None
+                self.store_errors += 1
+                print(f"⚠️ [PredictionCache] Store read failed: {e}")
+            if found is not None:
+                with self._lock:
+                    self._insert(key, *found)
+                    self.store_hits += 1
+                return found[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        if not self.enabled or key is None:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._insert(key, value, expires_at)
+        if self.store is not None:
+            try:
+                self.store.set(key, value, expires_at)
+            except Exception as e:
+                self.store_errors += 1
+                print(f"⚠️ [PredictionCache] Store write failed: {e}")
+
+    def _insert(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_secs': self.ttl,
+            'hits': self.hits,
+            'store_hits': self.store_hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'evictions': self.evictions,
+            'store_errors': self.store_errors,
+        }
+
+
+# Process-wide cache shared by all requests
+cache = PredictionCache(store=FileStore(STORE_DIR) if STORE_DIR else None)
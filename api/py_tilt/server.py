@@ -0,0 +1,266 @@
+# File: api/py_tilt/server.py
+"""
+Standalone, long-lived server for self-hosted deployments (Vercel keeps using
+index.handler directly).
+
+    python api/py_tilt/server.py [--port 8000] [--workers N] [--backend onnx|trees]
+
+- Pre-fork: the master imports index (bundle + warm-up) once, freezes the GC
+  and forks the workers, so every worker shares the loaded model pages
+  copy-on-write and starts without paying the model-load cost again. All
+  workers accept() on the one listening socket; the kernel spreads connections.
+- Keep-alive: HTTP/1.1, one thread per connection inside a worker. Idle
+  connections are closed after --keepalive seconds.
+- Graceful reload: when the bundle file changes (or on SIGHUP) the master
+  loads and warms the new model, forks a fresh set of workers and SIGTERMs the
+  old ones. Those stop accepting, finish in-flight requests and exit (SIGKILL
+  after --grace seconds). A bundle that fails to load is logged and the
+  running workers are kept. Write new bundles atomically (write_bundle does).
+- Workers that die are replaced. SIGTERM/SIGINT stop everything gracefully.
+- --microbatch coalesces each worker's concurrent requests (micro_batch.py).
+
+Metrics and caches are per worker: a GET scrape reports the worker that
+answered it.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+DEFAULT_PORT = int(os.environ.get('PORT', 8000))
+DEFAULT_WORKERS = int(os.environ.get('TILT_WORKERS', os.cpu_count() or 1))
+KEEPALIVE_SECS = float(os.environ.get('TILT_KEEPALIVE_SECS', 5))
+GRACE_SECS = float(os.environ.get('TILT_GRACE_SECS', 30))
+RELOAD_POLL_SECS = float(os.environ.get('TILT_RELOAD_POLL_SECS', 2))
+
+
+def _bundle_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+# --- WORKER ---
+class WorkerServer(ThreadingHTTPServer):
+    # Non-daemon threads: server_close() waits for in-flight requests
+    daemon_threads = False
+
+    def __init__(self, listener, handler_class):
+        super().__init__(listener.getsockname(), handler_class, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listener
+
+
+def _handler_class(index, stopping, keepalive):
+    class KeepAliveHandler(index.handler):
+        protocol_version = 'HTTP/1.1'
+        timeout = keepalive   # idle keep-alive connections time out here
+        # Headers and body go out as separate writes; with Nagle on, the body
+        # waits for the client's delayed ACK (~40 ms) on a kept-alive connection
+        disable_nagle_algorithm = True
+
+        def handle_one_request(self):
+            super().handle_one_request()
+            # Draining: answer the current request, then close the connection
+            if stopping.is_set():
+                self.close_connection = True
+
+        def log_message(self, format, *args):
+            # The per-request tilt_request log line (metrics.py) replaces the access log
+            pass
+
+    return KeepAliveHandler
+
+
+def run_worker(listener, index, keepalive):
+    stopping = threading.Event()
+    server = WorkerServer(listener, _handler_class(index, stopping, keepalive))
+
+    def stop(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            # shutdown() blocks until serve_forever returns: not from this thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server.serve_forever(poll_interval=0.5)
+    server.server_close()
+
+
+# --- MASTER ---
+class Master:
+    def __init__(self, listener, n_workers, backend, keepalive=KEEPALIVE_SECS,
+                 grace=GRACE_SECS, reload_poll=RELOAD_POLL_SECS):
+        self.listener = listener
+        self.n_workers = n_workers
+        self.backend = backend
+        self.keepalive = keepalive
+        self.grace = grace
+        self.reload_poll = reload_poll
+        self.workers = set()
+        self.retiring = {}   # pid -> SIGKILL deadline
+        self.stopping = False
+        self.reload_requested = False
+
+        import index
+        if index.bundle is None:
+            raise SystemExit(f"❌ [Server] Could not load the model bundle at {index.model_path}")
+        self.index = index
+        self.signature = _bundle_signature(index.model_path)
+
+    def spawn(self):
+        sys.stdout.flush()   # or the child inherits (and re-prints) buffered lines
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                run_worker(self.listener, self.index, self.keepalive)
+                code = 0
+            except BaseException as e:
+                print(f"❌ [Worker {os.getpid()}] {e}")
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        self.workers.add(pid)
+        return pid
+
+    def spawn_all(self):
+        # Objects that exist now are never touched by the cyclic GC again, so
+        # collections in the workers do not copy the shared model pages
+        gc.collect()
+        gc.freeze()
+        for _ in range(self.n_workers - len(self.workers)):
+            self.spawn()
+
+    def retire(self, pids):
+        deadline = time.monotonic() + self.grace
+        for pid in pids:
+            self.workers.discard(pid)
+            self.retiring[pid] = deadline
+            self._kill(pid, signal.SIGTERM)
+
+    def _kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def reload(self):
+        # Taken before loading: a broken bundle is tried once, not on every poll
+        self.signature = _bundle_signature(self.index.model_path)
+        gc.unfreeze()   # lets the previous model be collected once no worker needs it
+        if not self.index.reload_models(self.backend):
+            gc.freeze()
+            return
+        old = set(self.workers)
+        self.workers.clear()
+        self.spawn_all()
+        self.retire(old)
+        print(f"🔁 [Server] Reloaded: {len(self.workers)} new workers, {len(old)} draining")
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if not self.stopping:
+                    print(f"⚠️ [Server] Worker {pid} exited ({status}); replacing it")
+                    self.spawn()
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, 'reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, 'stopping', True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, 'stopping', True))
+
+        self.spawn_all()
+        host, port = self.listener.getsockname()[:2]
+        print(f"🚀 [Server] {len(self.workers)} workers on http://{host}:{port} "
+              f"(backend {self.backend or self.index.DEFAULT_BACKEND}, master pid {os.getpid()})")
+
+        while not self.stopping:
+            time.sleep(self.reload_poll)
+            self.reap()
+            if self.reload_requested or _bundle_signature(self.index.model_path) != self.signature:
+                self.reload_requested = False
+                self.reload()
+            now = time.monotonic()
+            for pid, deadline in list(self.retiring.items()):
+                if now > deadline:
+                    self._kill(pid, signal.SIGKILL)
+
+        print("🛑 [Server] Stopping: draining workers")
+        self.retire(set(self.workers))
+        while self.retiring:
+            self.reap()
+            now = time.monotonic()
+            for pid, deadline in list(self.retiring.items()):
+                if now > deadline:
+                    self._kill(pid, signal.SIGKILL)
+            time.sleep(0.1)
+        self.listener.close()
+
+
+def make_listener(host, port, backlog=1024):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    return listener
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-forked tilt model server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--backend', choices=('onnx', 'trees'), default=None,
+                        help="Defaults to TILT_BACKEND / index.DEFAULT_BACKEND")
+    parser.add_argument('--keepalive', type=float, default=KEEPALIVE_SECS, help="Idle keep-alive timeout (s)")
+    parser.add_argument('--grace', type=float, default=GRACE_SECS, help="Drain time before SIGKILL (s)")
+    parser.add_argument('--reload-poll', type=float, default=RELOAD_POLL_SECS,
+                        help="How often the bundle file is checked for changes (s)")
+    parser.add_argument('--microbatch', action='store_true',
+                        help="Coalesce concurrent requests per worker (micro_batch.py)")
+    parser.add_argument('--microbatch-rows', type=int, default=None)
+    parser.add_argument('--microbatch-wait-us', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    # One log line per request from several processes: never hold them in a buffer
+    sys.stdout.reconfigure(line_buffering=True)
+
+    if args.backend:
+        os.environ['TILT_BACKEND'] = args.backend
+    if args.microbatch:
+        os.environ['TILT_MICROBATCH'] = '1'
+    if args.microbatch_rows is not None:
+        os.environ['TILT_MICROBATCH_MAX_ROWS'] = str(args.microbatch_rows)
+    if args.microbatch_wait_us is not None:
+        os.environ['TILT_MICROBATCH_WAIT_US'] = str(args.microbatch_wait_us)
+    # The master warms the model once; workers inherit it
+    os.environ['TILT_EAGER_INIT'] = '1'
+
+    listener = make_listener(args.host, args.port)
+    Master(listener, max(args.workers, 1), args.backend, args.keepalive, args.grace, args.reload_poll).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,591 @@
+# File: api/py_tilt/tilt_features.py
+"""
+Shared feature core for training and serving (NumPy only, so the serverless
+function never has to import pandas).
+
+Games become typed float64 columns (GAME_COLUMNS; read_games / read_columns
+for processed game dicts, lichess_columns for raw exports), sessions are
+offsets into them (session_bounds), and session_features() turns both into
+FEATURE_COLS. Everything that builds features calls it: featurize() for
+window, batch and history requests, TiltModel._engineer_features for training
+(streamed in chunks), both SDKs' _enrich_json and process_raw_data.
+SessionState is its one-game-at-a-time twin for incremental requests.
+
+Training and serving have always treated history differently (rolling windows,
+loss streaks across sessions); FeatureSpec names those differences instead of
+keeping two implementations. scripts/check_feature_parity.py pins every path to
+golden outputs.
+"""
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+LOCAL_TZ = 'Europe/Warsaw'
+SESSION_GAP_MINUTES = 30
+ROLL_WINDOW = 5
+# Games in a live window request (pages/api/tilt.ts TILT_WINDOW)
+WINDOW_GAMES = 30
+
+# Column order expected by model.onnx / model.json
+FEATURE_COLS = [
+    'my_acpl', 'my_blunder_count', 'my_avg_secs_per_move', 'result',
+    'games_played', 'speed_vs_start', 'session_pl', 'loss_streak',
+    'roll_5_acpl_mean', 'roll_5_time_per_move',
+    'log_break_time',
+    'tod_morning', 'tod_midday', 'tod_evening', 'tod_night'
+]
+N_FEATURES = len(FEATURE_COLS)
+COL = {name: i for i, name in enumerate(FEATURE_COLS)}
+
+# Hour buckets of the original pandas ETL (morning/midday/evening/night), as a lookup table.
+# 0 = morning [5, 9), 1 = midday [9, 18), 2 = evening [18, 23), 3 = night
+TOD_LABELS = ('morning', 'midday', 'evening', 'night')
+TOD_BY_HOUR = np.array([3] * 5 + [0] * 4 + [1] * 9 + [2] * 5 + [3], dtype=np.int8)
+
+# Defaults used when a game document is missing a field
+DEFAULT_ACPL = 50.0
+DEFAULT_BLUNDERS = 0.0
+DEFAULT_SECS_PER_MOVE = 10.0
+DEFAULT_RESULT = 0.5
+DEFAULT_RATING_DIFF = 0.0
+
+# Typed per-game input columns (float64, NaN = missing), in read_games order
+GAME_COLUMNS = ('created_at', 'last_move_at', 'my_acpl', 'my_blunder_count',
+                'my_avg_secs_per_move', 'result', 'rating_diff')
+
+# Every game key the features read (read_games / SessionState.update)
+INPUT_FIELDS = ('createdAt', 'lastMoveAt', 'my_acpl', 'my_blunder_count',
+                'my_avg_secs_per_move', 'result', 'rating_diff')
+# read_games column -> game key
+COLUMN_FIELDS = dict(zip(GAME_COLUMNS, INPUT_FIELDS))
+# Timestamps have no default: missing stays NaN
+FIELD_DEFAULTS = {
+    'my_acpl': DEFAULT_ACPL, 'my_blunder_count': DEFAULT_BLUNDERS,
+    'my_avg_secs_per_move': DEFAULT_SECS_PER_MOVE, 'result': DEFAULT_RESULT,
+    'rating_diff': DEFAULT_RATING_DIFF,
+}
+
+
+class FeatureSpec:
+    """
+    How session_features() treats history outside the current session and
+    rolling windows with fewer than ROLL_WINDOW games.
+
+    - min_periods: games a rolling mean needs, else it is undefined
+    - history_wide: the loss streak and the acpl window run across sessions,
+      with missing acpl counted as 0 (training's ETL has always done this)
+    - roll_fill: value of an undefined rolling mean, per feature
+    """
+
+    def __init__(self, name, min_periods, history_wide, roll_fill):
+        self.name = name
+        self.min_periods = min_periods
+        self.history_wide = history_wide
+        self.roll_fill = roll_fill
+
+    def __repr__(self):
+        return f"FeatureSpec({self.name!r})"
+
+
+# Real-time requests: every window is scored on its own, defaults fill in
+SERVING = FeatureSpec('serving', min_periods=1, history_wide=False,
+                      roll_fill={'roll_5_acpl_mean': DEFAULT_ACPL, 'roll_5_time_per_move': DEFAULT_SECS_PER_MOVE})
+# The training ETL (the values the model was fit on)
+TRAINING = FeatureSpec('training', min_periods=ROLL_WINDOW, history_wide=True,
+                       roll_fill={'roll_5_acpl_mean': 0.0, 'roll_5_time_per_move': 0.0})
+
+MS_PER_HOUR = 3600 * 1000
+_EPOCH = datetime(1970, 1, 1)
+_TZ_TABLES = {}
+
+
+def _tz_table(local_tz):
+    """
+    Returns (transition_ms, offset_ms) for a timezone so UTC -> local can be
+    done with one searchsorted. Uses the same pytz data pandas' tz_convert uses.
+    Returns None when the zone is unknown (caller falls back to UTC, like the SDK).
+    """
+    if local_tz in _TZ_TABLES:
+        return _TZ_TABLES[local_tz]
+    import pytz  # deferred: only needed once per zone
+    try:
+        tz = pytz.timezone(local_tz)
+    except Exception:
+        table = None
+    else:
+        if hasattr(tz, '_utc_transition_times'):
+            trans = np.array([(t - _EPOCH).total_seconds() * 1000.0 for t in tz._utc_transition_times])
+            offsets = np.array([info[0].total_seconds() * 1000.0 for info in tz._transition_info])
+        else:
+            # Static zones (UTC, Etc/GMT+3, ...) have a single offset
+            trans = np.array([-np.inf])
+            offsets = np.array([tz.utcoffset(_EPOCH).total_seconds() * 1000.0])
+        table = (trans, offsets)
+    _TZ_TABLES[local_tz] = table
+    return table
+
+
+def time_of_day_slots(ts_ms, local_tz=LOCAL_TZ):
+    """UTC epoch-ms array -> int8 time-of-day slot (index into TOD_LABELS). NaN -> night."""
+    ts_ms = np.asarray(ts_ms, dtype=np.float64)
+    table = _tz_table(local_tz)
+    local_ms = ts_ms
+    if table is not None:
+        trans, offsets = table
+        idx = np.searchsorted(trans, ts_ms, side='right') - 1
+        local_ms = ts_ms + offsets[np.clip(idx, 0, len(offsets) - 1)]
+
+    valid = ~np.isnan(local_ms)
+    hours = np.zeros(len(local_ms), dtype=np.int64)
+    hours[valid] = np.floor_divide(local_ms[valid], MS_PER_HOUR).astype(np.int64) % 24
+    slots = TOD_BY_HOUR[hours]
+    slots[~valid] = 3
+    return slots
+
+
+def segment_start_index(is_start):
+    """Bool mask of segment starts -> index of each row's segment start."""
+    idx = np.arange(len(is_start))
+    return np.maximum.accumulate(np.where(is_start, idx, 0))
+
+
+def rolling_mean(values, window=ROLL_WINDOW, seg_start=None, min_periods=1):
+    """
+    Trailing mean over up to `window` rows, skipping NaN (pandas rolling(window, min_periods)).
+    With `seg_start` (see segment_start_index) windows never reach into a previous segment.
+    """
+    n = len(values)
+    padded = np.concatenate([np.full(window - 1, np.nan), values])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    valid = ~np.isnan(windows)
+    if seg_start is not None:
+        positions = np.arange(n)[:, None] + np.arange(1 - window, 1)
+        valid &= positions >= seg_start[:, None]
+    counts = valid.sum(axis=1)
+    sums = np.where(valid, windows, 0.0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts >= max(min_periods, 1), sums / np.maximum(counts, 1), np.nan)
+
+
+def loss_streak(result, seg_start=None, carry=None):
+    """
+    Consecutive losses ending at each row (0 on non-losses), matching the SDK's groupby/cumcount.
+    `carry` = the streak at the end of a previous chunk: leading losses continue it.
+    """
+    idx = np.arange(len(result))
+    is_loss = result == 0.0
+    anchor = ~is_loss
+    if seg_start is not None:
+        anchor = anchor | (seg_start == idx)
+    base = 0 if carry is None else -(carry + 1)
+    run_start = np.maximum.accumulate(np.where(anchor, idx, base))
+    return np.where(is_loss, idx - run_start, 0)
+
+
+def segment_first_valid(values, is_start):
+    """First non-NaN value of each row's segment (pandas groupby transform('first'))."""
+    n = len(values)
+    starts = np.flatnonzero(is_start)
+    idx = np.where(np.isnan(values), n, np.arange(n))
+    first = np.minimum.reduceat(idx, starts)
+    return np.append(values, np.nan)[np.repeat(first, np.diff(np.append(starts, n)))]
+
+
+def segmented_cumsum(values, bounds):
+    """Cumulative sum restarting at each segment; bounds = segment offsets incl. 0 and n."""
+    out = np.empty_like(values)
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        out[a:b] = np.cumsum(values[a:b])
+    return out
+
+
+def _column(games, key, default):
+    return np.array([float(g.get(key, default)) for g in games], dtype=np.float64)
+
+
+def _timestamps(games, key):
+    out = np.empty(len(games), dtype=np.float64)
+    for i, g in enumerate(games):
+        v = g.get(key)
+        out[i] = np.nan if v is None else float(v)
+    return out
+
+
+def read_games(games_list):
+    """Game dicts -> dict of float64 columns sorted by createdAt (stable, missing last)."""
+    created = _timestamps(games_list, 'createdAt')
+    order = np.argsort(created, kind='stable')
+    return {
+        'created_at': created[order],
+        'last_move_at': _timestamps(games_list, 'lastMoveAt')[order],
+        'my_acpl': _column(games_list, 'my_acpl', DEFAULT_ACPL)[order],
+        'my_blunder_count': _column(games_list, 'my_blunder_count', DEFAULT_BLUNDERS)[order],
+        'my_avg_secs_per_move': _column(games_list, 'my_avg_secs_per_move', DEFAULT_SECS_PER_MOVE)[order],
+        'result': _column(games_list, 'result', DEFAULT_RESULT)[order],
+        'rating_diff': _column(games_list, 'rating_diff', DEFAULT_RATING_DIFF)[order],
+    }
+
+
+def read_columns(columns):
+    """
+    Columnar twin of read_games: {game key: numbers} (any subset of
+    INPUT_FIELDS, see columnar.py) -> the same sorted float64 columns. A missing
+    column or a NaN value is a key missing from that game: same default.
+    """
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Columns differ in length: {sorted(lengths)}")
+    n = lengths.pop() if lengths else 0
+
+    created = columns.get('createdAt')
+    order = np.argsort(np.asarray(created, dtype=np.float64), kind='stable') if created is not None else None
+    out = {}
+    for name, field in COLUMN_FIELDS.items():
+        default = FIELD_DEFAULTS.get(field, np.nan)
+        values = columns.get(field)
+        if values is None:
+            out[name] = np.full(n, default)
+            continue
+        col = np.asarray(values, dtype=np.float64)
+        col = col[order] if order is not None else col.copy()
+        col[np.isnan(col)] = default
+        out[name] = col
+    return out
+
+
+def session_features(cols, bounds, local_tz=LOCAL_TZ, spec=SERVING, acpl_tail=(), streak_carry=None):
+    """
+    The feature core. Typed game columns (GAME_COLUMNS, sorted by createdAt)
+    + session offsets (incl. 0 and n) -> {feature: column} in FEATURE_COLS
+    order: counts and one-hots as int64, the rest float64. Every segment is
+    its own session. For a history-wide spec, `acpl_tail` (the last acpl
+    values, missing as 0) and `streak_carry` continue a previous chunk.
+    """
+    n = len(cols['created_at'])
+    if n == 0:
+        return {name: np.empty(0) for name in FEATURE_COLS}
+    bounds = np.asarray(bounds, dtype=np.int64)
+    is_start = np.zeros(n, dtype=bool)
+    is_start[bounds[:-1][bounds[:-1] < n]] = True
+    seg_start = segment_start_index(is_start)
+
+    created, last_move = cols['created_at'], cols['last_move_at']
+    acpl, speed = cols['my_acpl'], cols['my_avg_secs_per_move']
+    result = cols['result']
+
+    out = {
+        'my_acpl': acpl,
+        'my_blunder_count': cols['my_blunder_count'],
+        'my_avg_secs_per_move': speed,
+        'result': result,
+    }
+
+    # Session context
+    out['games_played'] = np.arange(n) - seg_start + 1
+    first_speed = segment_first_valid(speed, is_start) if np.isnan(speed).any() else speed[seg_start]
+    out['speed_vs_start'] = speed / (first_speed + 0.001)
+    out['session_pl'] = segmented_cumsum(cols['rating_diff'], bounds)
+    if spec.history_wide:
+        out['loss_streak'] = loss_streak(result, carry=streak_carry)
+    else:
+        out['loss_streak'] = loss_streak(result, seg_start)
+
+    # Rolling
+    if spec.history_wide:
+        tail = np.asarray(acpl_tail, dtype=np.float64)
+        history = np.concatenate([tail, np.where(np.isnan(acpl), 0.0, acpl)])
+        roll_acpl = rolling_mean(history, min_periods=spec.min_periods)[len(tail):]
+    else:
+        roll_acpl = rolling_mean(acpl, seg_start=seg_start, min_periods=spec.min_periods)
+    roll_speed = rolling_mean(speed, seg_start=seg_start, min_periods=spec.min_periods)
+    for name, roll in (('roll_5_acpl_mean', roll_acpl), ('roll_5_time_per_move', roll_speed)):
+        out[name] = np.where(np.isnan(roll), spec.roll_fill[name], roll)
+
+    # Break since previous game ended (0 for the first game of a segment)
+    break_time = np.zeros(n, dtype=np.float64)
+    break_time[1:] = (created[1:] - last_move[:-1]) / 1000.0
+    break_time = np.where(np.isnan(break_time) | is_start, 0.0, np.maximum(break_time, 0.0))
+    out['log_break_time'] = np.log1p(break_time)
+
+    # Time of day (one-hot)
+    slots = time_of_day_slots(created, local_tz)
+    for i, label in enumerate(TOD_LABELS):
+        out[f'tod_{label}'] = (slots == i).astype(np.int64)
+
+    return {name: out[name] for name in FEATURE_COLS}
+
+
+def featurize(cols, bounds, local_tz=LOCAL_TZ, spec=SERVING):
+    """
+    Sorted column arrays (see read_games) + segment offsets -> float32 matrix
+    (n, N_FEATURES). Every segment is treated as its own session, so several
+    users/sessions can be featurized in one pass.
+    """
+    n = len(cols['created_at'])
+    X = np.empty((n, N_FEATURES), dtype=np.float32)
+    if n == 0:
+        return X
+    for j, column in enumerate(session_features(cols, bounds, local_tz, spec).values()):
+        X[:, j] = column
+    return X
+
+
+def build_features(games_list, local_tz=LOCAL_TZ):
+    """
+    Raw game dicts (one session, any order) -> float32 matrix (n_games, N_FEATURES)
+    in FEATURE_COLS order, rows sorted by createdAt. Empty input -> shape (0, N_FEATURES).
+    """
+    if not games_list:
+        return np.empty((0, N_FEATURES), dtype=np.float32)
+    return featurize(read_games(games_list), [0, len(games_list)], local_tz)
+
+
+def build_features_grouped(games_lists, local_tz=LOCAL_TZ):
+    """
+    Featurizes many windows (e.g. one per user) in a single pass.
+
+    Returns (X, offsets, errors): rows of window i are X[offsets[i]:offsets[i + 1]],
+    each identical to build_features(games_lists[i]). A window whose games cannot
+    be parsed gets zero rows and its message in errors[i]; the rest are unaffected.
+    """
+    parsed, errors = [], {}
+    offsets = np.zeros(len(games_lists) + 1, dtype=np.int64)
+    for i, games in enumerate(games_lists):
+        cols = None
+        if games:
+            try:
+                cols = read_games(games)
+            except Exception as e:
+                errors[i] = str(e)
+        if cols is not None:
+            parsed.append(cols)
+        offsets[i + 1] = offsets[i] + (len(cols['created_at']) if cols is not None else 0)
+
+    if not parsed:
+        return np.empty((0, N_FEATURES), dtype=np.float32), offsets, errors
+
+    merged = {k: np.concatenate([c[k] for c in parsed]) for k in parsed[0]}
+    bounds = np.unique(offsets)
+    return featurize(merged, bounds, local_tz), offsets, errors
+
+
+def session_bounds(created_at, session_gap_minutes=SESSION_GAP_MINUTES):
+    """
+    Sorted createdAt column -> session offsets (incl. 0 and n) for featurize().
+    Same rule as training: a session starts after a gap of more than
+    session_gap_minutes, or at a game with no timestamp.
+    """
+    n = len(created_at)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(~(np.diff(created_at) <= session_gap_minutes * 60_000)) + 1
+    return np.concatenate(([0], starts, [n])).astype(np.int64)
+
+
+# ----------------------------------------------------------------------
+# TRAINING INPUTS (raw Lichess exports)
+# ----------------------------------------------------------------------
+def _is_missing(values):
+    return np.fromiter((v is None or v != v for v in values), dtype=bool, count=len(values))
+
+
+def lichess_columns(flat, hero_user):
+    """
+    Raw export fields under pd.json_normalize names (a DataFrame or any
+    mapping of arrays) + a precomputed 'move_count' -> typed game columns in
+    the same row order. Missing analysis stays NaN (training drops those rows),
+    a missing rating diff is 0.
+    """
+    def field(name, fill=None):
+        values = flat.get(name)
+        if values is None:
+            return np.full(len(flat['createdAt']), np.nan if fill is None else fill)
+        values = np.asarray(values, dtype=np.float64)
+        return values if fill is None else np.where(np.isnan(values), fill, values)
+
+    hero_white = np.asarray(flat['players_white_user_name'], dtype=object) == hero_user
+    created, last_move = field('createdAt'), field('lastMoveAt')
+    move_count = np.asarray(flat['move_count'], dtype=np.float64)
+
+    winner = np.asarray(flat['winner'], dtype=object)
+    result = np.where(winner == np.where(hero_white, 'white', 'black'), 1.0,
+                      np.where(_is_missing(winner), 0.5, 0.0))
+
+    return {
+        'created_at': created,
+        'last_move_at': last_move,
+        'my_acpl': np.where(hero_white, field('players_white_analysis_acpl'), field('players_black_analysis_acpl')),
+        'my_blunder_count': np.where(hero_white, field('players_white_analysis_blunder'),
+                                     field('players_black_analysis_blunder')),
+        'my_avg_secs_per_move': (last_move - created) / 1000.0 / np.where(move_count == 0, 1, move_count),
+        'result': result,
+        'rating_diff': np.where(hero_white, field('players_white_ratingDiff', 0.0),
+                                field('players_black_ratingDiff', 0.0)),
+    }
+
+
+def stop_targets(session_id, session_pl):
+    """
+    Ideal-stop label over the rows kept for training: 1 on the first game at
+    which each session's P/L peaks, else 0.
+    """
+    n = len(session_id)
+    target = np.zeros(n, dtype=np.int64)
+    if n == 0:
+        return target
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(session_id)) + 1))
+    peak = np.repeat(np.maximum.reduceat(session_pl, starts), np.diff(np.append(starts, n)))
+    first_peak = np.minimum.reduceat(np.where(session_pl == peak, np.arange(n), n), starts)
+    target[first_peak[first_peak < n]] = 1
+    return target
+
+
+# ----------------------------------------------------------------------
+# INCREMENTAL SESSION STATE (one game in, one feature row out)
+# ----------------------------------------------------------------------
+# Fields with a default (FIELD_DEFAULTS), as positions in INPUT_FIELDS
+_DEFAULTED = tuple(i for i, f in enumerate(INPUT_FIELDS) if f in FIELD_DEFAULTS)
+_FILL = tuple(FIELD_DEFAULTS.get(f, np.nan) for f in INPUT_FIELDS)
+
+
+def _nan_to_none(v):
+    return None if v is None or v != v else float(v)
+
+
+class SessionState:
+    """
+    The live window (the last `max_games` games) so a new game is featurized
+    without resending the window.
+
+    update() appends a game, drops the oldest one past max_games and returns
+    the row build_features() gives the newest game of that window: a state
+    seeded from a window request and fed the games played since (in createdAt
+    order) scores them like the next window request would. max_games=None keeps
+    every game.
+
+    Inputs are kept as sent, None = missing. `settled` is False while a game in
+    the window lacks a field that has a default (e.g. it was not analysed yet);
+    only a window request re-reads such games.
+    """
+
+    def __init__(self, local_tz=LOCAL_TZ, max_games=WINDOW_GAMES):
+        self.local_tz = local_tz
+        self.max_games = max_games
+        self.games = deque(maxlen=max_games)    # INPUT_FIELDS tuples, oldest first
+
+    @property
+    def last_created_at(self):
+        return self.games[-1][0] if self.games else None
+
+    @property
+    def settled(self):
+        return all(g[i] is not None for g in self.games for i in _DEFAULTED)
+
+    def _push(self, game):
+        # Same rules as read_games: an absent key is missing, a present one must be a number
+        self.games.append(tuple(_nan_to_none(game.get(f)) if f not in FIELD_DEFAULTS
+                                else None if f not in game else _nan_to_none(float(game[f]))
+                                for f in INPUT_FIELDS))
+
+    def _filled(self, k):
+        return [_FILL[i] if v is None else v for i, v in enumerate(self.games[k])]
+
+    def update(self, game):
+        """Consumes one game dict and returns its float32 feature row (N_FEATURES,)."""
+        self._push(game)
+        n = len(self.games)
+        created, _, acpl, blunders, speed, result, _ = self._filled(-1)
+        rows = [self._filled(k) for k in range(n)]
+
+        # Sums run oldest -> newest, like the cumsum / rolling sum in session_features
+        session_pl = 0.0
+        for r in rows:
+            session_pl += r[6]
+        roll_acpl = roll_speed = 0.0
+        recent = rows[-ROLL_WINDOW:]
+        for r in recent:
+            roll_acpl += r[2]
+            roll_speed += r[4]
+
+        streak = 0
+        if result == 0.0:
+            run_start = 0
+            for k in range(n - 2, -1, -1):
+                if rows[k][5] != 0.0:
+                    run_start = k
+                    break
+            streak = n - 1 - run_start
+
+        break_time = 0.0
+        if n > 1:
+            break_time = (created - rows[-2][1]) / 1000.0
+            break_time = 0.0 if break_time != break_time else max(break_time, 0.0)
+
+        row = np.empty(N_FEATURES, dtype=np.float32)
+        row[COL['my_acpl']] = acpl
+        row[COL['my_blunder_count']] = blunders
+        row[COL['my_avg_secs_per_move']] = speed
+        row[COL['result']] = result
+        row[COL['games_played']] = n
+        row[COL['speed_vs_start']] = speed / (rows[0][4] + 0.001)
+        row[COL['session_pl']] = session_pl
+        row[COL['loss_streak']] = streak
+        row[COL['roll_5_acpl_mean']] = roll_acpl / len(recent)
+        row[COL['roll_5_time_per_move']] = roll_speed / len(recent)
+        row[COL['log_break_time']] = np.log1p(break_time)
+        slot = time_of_day_slots([created], self.local_tz)[0]
+        for i, label in enumerate(TOD_LABELS):
+            row[COL[f'tod_{label}']] = slot == i
+        return row
+
+    @classmethod
+    def from_games(cls, games_list, local_tz=LOCAL_TZ, max_games=WINDOW_GAMES):
+        """Seeds the state from a game window (any order)."""
+        state = cls(local_tz, max_games)
+        games_list = games_list or []
+        # read_games order (stable, missing createdAt last)
+        for i in np.argsort(_timestamps(games_list, 'createdAt'), kind='stable'):
+            state._push(games_list[i])
+        return state
+
+    @classmethod
+    def from_columns(cls, columns, local_tz=LOCAL_TZ, max_games=WINDOW_GAMES):
+        """from_games for a columnar window ({game key: numbers}, NaN = missing; see read_columns)."""
+        state = cls(local_tz, max_games)
+        fields = [f for f in INPUT_FIELDS if f in columns]
+        data = [np.asarray(columns[f], dtype=np.float64) for f in fields]
+        n = len(data[0]) if data else 0
+        created = columns.get('createdAt')
+        order = np.argsort(np.asarray(created, dtype=np.float64), kind='stable') if created is not None else range(n)
+        for i in order:
+            state._push({f: v[i] for f, v in zip(fields, data) if v[i] == v[i]})
+        return state
+
+    def to_dict(self):
+        """JSON-safe snapshot to hand back to the caller (one array per INPUT_FIELDS key)."""
+        return {
+            'max_games': self.max_games,
+            'games': {f: [g[i] for g in self.games] for i, f in enumerate(INPUT_FIELDS)},
+            'last_created_at': self.last_created_at,
+            'settled': self.settled,
+        }
+
+    @classmethod
+    def from_dict(cls, data, local_tz=LOCAL_TZ):
+        if not data:
+            return cls(local_tz)
+        games = data.get('games')
+        if not isinstance(games, dict):
+            raise ValueError("Invalid session state: no game window (send a window request to seed one)")
+        max_games = data.get('max_games', WINDOW_GAMES)
+        if max_games is not None and (not isinstance(max_games, int) or max_games < 1):
+            raise ValueError(f"Invalid session state: max_games must be a positive integer, got {max_games!r}")
+        state = cls(local_tz, max_games)
+        values = [games.get(f) or [] for f in INPUT_FIELDS]
+        n = max(len(v) for v in values)
+        if any(len(v) not in (0, n) for v in values):
+            raise ValueError("Invalid session state: game arrays differ in length")
+        for k in range(n):
+            state._push({f: v[k] for f, v in zip(INPUT_FIELDS, values) if v and v[k] is not None})
+        return state
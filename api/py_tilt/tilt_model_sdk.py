@@ -3,35 +3,32 @@ import pandas as pd
 import numpy as np
 import json
 import os
-import pytz
 from pathlib import Path
 
+from model_bundle import SECTION_XGB_JSON, ModelBundle, is_bundle, write_bundle
+from tilt_features import (FEATURE_COLS, LOCAL_TZ, SESSION_GAP_MINUTES, TRAINING, lichess_columns, read_games,
+                           session_bounds, session_features, stop_targets)
+
 # --- DEFAULT PATHS ---
 # Anchor to the current directory (api/py_tilt)
 BASE_DIR = Path(__file__).resolve().parent
-DEFAULT_MODEL = BASE_DIR / "model.json"
-DEFAULT_CONFIG = BASE_DIR / "tilt_config.joblib"
+DEFAULT_MODEL = BASE_DIR / "model.bundle"
 DEFAULT_RAW_JSON = BASE_DIR / "training_placeholder.json"
 DEFAULT_SUMMARY = BASE_DIR / "training_summary.txt"
 
 # Constants
 HERO_USER = "julio_amigo_dos"
-SESSION_GAP_MINUTES = 30
-LOCAL_TZ = 'Europe/Warsaw'
 
 class TiltModel:
     def __init__(self, local_tz=LOCAL_TZ):
         self.local_tz = local_tz
         self.model = None
         self.config = {}
+        self.bundle = None
+        
+        self.feature_cols = list(FEATURE_COLS)
         
-        self.feature_cols = [
-            'my_acpl', 'my_blunder_count', 'my_avg_secs_per_move', 'result',
-            'games_played', 'speed_vs_start', 'session_pl', 'loss_streak',
-            'roll_5_acpl_mean', 'roll_5_time_per_move',
-            'log_break_time',
-            'tod_morning', 'tod_midday', 'tod_evening', 'tod_night'
-        ]
+        self.threshold_grid = np.arange(0.30, 0.90, 0.02)
         
         self.params = {
             'objective': 'binary:logistic',
@@ -48,12 +45,6 @@ class TiltModel:
             'random_state': 42
         }
 
-    def _assign_time_of_day(self, hour):
-        if 5 <= hour < 9: return 'morning'
-        elif 9 <= hour < 18: return 'midday'
-        elif 18 <= hour < 23: return 'evening'
-        else: return 'night'
-
     def process_raw_data(self, json_path):
         print(f"--- Processing Raw Data from {json_path} ---")
         if not os.path.exists(json_path):
@@ -64,83 +55,22 @@ class TiltModel:
         
         df = pd.json_normalize(data, sep='_')
 
-        # Basic Extraction
-        df['user_color'] = np.where(df['players_white_user_name'] == HERO_USER, 'white', 'black')
-        df['my_acpl'] = np.where(df['user_color'] == 'white', 
-                                 df.get('players_white_analysis_acpl', np.nan), 
-                                 df.get('players_black_analysis_acpl', np.nan))
-        df['my_blunder_count'] = np.where(df['user_color'] == 'white', 
-                                          df.get('players_white_analysis_blunder', np.nan), 
-                                          df.get('players_black_analysis_blunder', np.nan))
-        
-        w_diff = df.get('players_white_ratingDiff', 0).fillna(0)
-        b_diff = df.get('players_black_ratingDiff', 0).fillna(0)
-        df['rating_diff'] = np.where(df['user_color'] == 'white', w_diff, b_diff)
-        
-        conditions = [ df['winner'] == df['user_color'], df['winner'].isna() ]
-        choices = [1.0, 0.5]
-        df['result'] = np.select(conditions, choices, default=0.0)
-        
-        df['created_at'] = pd.to_datetime(df['createdAt'], unit='ms', utc=True)
-        df['last_move_at'] = pd.to_datetime(df['lastMoveAt'], unit='ms', utc=True)
-        df['game_duration_sec'] = (df['last_move_at'] - df['created_at']).dt.total_seconds()
-        
-        df['moves_list'] = df['moves'].fillna("").apply(lambda x: x.split(" "))
-        df['move_count'] = df['moves_list'].apply(lambda x: len(x) // 2)
-        df['my_avg_secs_per_move'] = df['game_duration_sec'] / df['move_count'].replace(0, 1)
+        # Tokens = spaces + 1 (same as len(moves.split(" "))), without building lists
+        df['move_count'] = (df['moves'].fillna("").str.count(" ") + 1) // 2
+        df = df.sort_values('createdAt', kind='stable').reset_index(drop=True)
 
-        # Session & Advanced
-        df = df.sort_values('created_at').reset_index(drop=True)
-        df['time_diff'] = df['created_at'].diff()
-        df['is_new_session'] = (df['time_diff'] > pd.Timedelta(minutes=SESSION_GAP_MINUTES)) | (df['time_diff'].isna())
-        df['session_id'] = df['is_new_session'].cumsum()
-        
-        grp = df.groupby('session_id')
-        df['games_played'] = grp.cumcount() + 1
-        df['session_pl'] = grp['rating_diff'].cumsum()
-        df['session_cum_pl'] = df['session_pl']
-        
-        first_speed = grp['my_avg_secs_per_move'].transform('first')
-        df['speed_vs_start'] = df['my_avg_secs_per_move'] / (first_speed + 0.001)
-        
-        df['is_loss'] = (df['result'] == 0.0).astype(int)
-        streak_group = (df['is_loss'] == 0).cumsum()
-        df['loss_streak'] = df.groupby(streak_group).cumcount()
-        df.loc[df['is_loss'] == 0, 'loss_streak'] = 0
-        
-        acpl_safe = df['my_acpl'].fillna(0)
-        df['roll_5_acpl_mean'] = grp['my_acpl'].transform(lambda x: acpl_safe.rolling(5).mean())
-        df['roll_5_time_per_move'] = grp['my_avg_secs_per_move'].transform(lambda x: x.rolling(5).mean())
-        df[['roll_5_acpl_mean', 'roll_5_time_per_move']] = df[['roll_5_acpl_mean', 'roll_5_time_per_move']].fillna(0)
-
-        # Time Features
-        df['prev_game_end'] = grp['last_move_at'].shift(1)
-        df['break_time'] = (df['created_at'] - df['prev_game_end']).dt.total_seconds()
-        df['break_time'] = df['break_time'].fillna(0.0).clip(lower=0)
-        df['log_break_time'] = np.log1p(df['break_time'])
-        
-        try:
-            tz = pytz.timezone(self.local_tz)
-            local_time = df['created_at'].dt.tz_convert(tz)
-        except:
-            local_time = df['created_at']
-            
-        df['time_of_day_label'] = local_time.dt.hour.apply(self._assign_time_of_day)
-        
-        tod_dummies = pd.get_dummies(df['time_of_day_label'], prefix='tod', dtype=int)
-        for tod in ['morning', 'midday', 'evening', 'night']:
-            col_name = f'tod_{tod}'
-            if col_name not in tod_dummies.columns:
-                tod_dummies[col_name] = 0
-        df = pd.concat([df, tod_dummies], axis=1)
+        # Features: shared core, training spec (same as api/train)
+        cols = lichess_columns(df, HERO_USER)
+        bounds = session_bounds(cols['created_at'], SESSION_GAP_MINUTES)
+        features = session_features(cols, bounds, self.local_tz, TRAINING)
+        session_id = np.repeat(np.arange(1, len(bounds)), np.diff(bounds))
+        df = df.assign(rating_diff=cols['rating_diff'], session_id=session_id,
+                       session_cum_pl=features['session_pl'], **features)
 
         # Target
-        df_clean = df.dropna(subset=['my_acpl', 'my_blunder_count']).copy()
-        session_max = df_clean.groupby('session_id')['session_cum_pl'].transform('max')
-        df_clean['is_max'] = (df_clean['session_cum_pl'] == session_max)
-        target_indices = df_clean[df_clean['is_max']].groupby('session_id')['games_played'].idxmin()
-        df_clean['target'] = 0
-        df_clean.loc[target_indices, 'target'] = 1
+        keep = ~(np.isnan(cols['my_acpl']) | np.isnan(cols['my_blunder_count']))
+        df_clean = df[keep].copy()
+        df_clean['target'] = stop_targets(session_id[keep], features['session_pl'][keep])
         
         print(f"Data Processed. {len(df_clean)} rows ready.")
         return df_clean
@@ -148,51 +78,14 @@ class TiltModel:
     def _enrich_json(self, games_list):
         if not games_list: return pd.DataFrame()
 
-        rows = []
-        for g in games_list:
-            rows.append({
-                'created_at': pd.to_datetime(g.get('createdAt'), unit='ms', utc=True),
-                'last_move_at': pd.to_datetime(g.get('lastMoveAt'), unit='ms', utc=True),
-                'my_acpl': float(g.get('my_acpl', 50)),
-                'my_blunder_count': float(g.get('my_blunder_count', 0)),
-                'my_avg_secs_per_move': float(g.get('my_avg_secs_per_move', 10.0)),
-                'result': float(g.get('result', 0.5)),
-                'rating_diff': float(g.get('rating_diff', 0))
-            })
-            
-        df = pd.DataFrame(rows)
-        df = df.sort_values('created_at').reset_index(drop=True)
-        
-        df['games_played'] = df.index + 1
-        df['session_pl'] = df['rating_diff'].cumsum()
-        
-        df['is_loss'] = (df['result'] == 0.0).astype(int)
-        streak_group = (df['is_loss'] == 0).cumsum()
-        df['loss_streak'] = df.groupby(streak_group).cumcount()
-        df.loc[df['is_loss'] == 0, 'loss_streak'] = 0
-        
-        df['roll_5_acpl_mean'] = df['my_acpl'].rolling(5, min_periods=1).mean().fillna(50)
-        df['roll_5_time_per_move'] = df['my_avg_secs_per_move'].rolling(5, min_periods=1).mean().fillna(10)
-        
-        first_speed = df['my_avg_secs_per_move'].iloc[0] + 0.001
-        df['speed_vs_start'] = df['my_avg_secs_per_move'] / first_speed
-        
-        df['prev_game_end'] = df['last_move_at'].shift(1)
-        df['break_time'] = (df['created_at'] - df['prev_game_end']).dt.total_seconds()
-        df['break_time'] = df['break_time'].fillna(0).clip(lower=0)
-        df['log_break_time'] = np.log1p(df['break_time'])
-        
-        try:
-            tz = pytz.timezone(self.local_tz)
-            local_time = df['created_at'].dt.tz_convert(tz)
-        except:
-            local_time = df['created_at']
-            
-        df['tod_label'] = local_time.dt.hour.apply(self._assign_time_of_day)
-        for t in ['morning', 'midday', 'evening', 'night']:
-            df[f'tod_{t}'] = (df['tod_label'] == t).astype(int)
-            
-        return df
+        # Same values as index.py (tilt_features, SERVING spec)
+        cols = read_games(games_list)
+        return pd.DataFrame({
+            'created_at': pd.to_datetime(cols['created_at'], unit='ms', utc=True),
+            'last_move_at': pd.to_datetime(cols['last_move_at'], unit='ms', utc=True),
+            'rating_diff': cols['rating_diff'],
+            **session_features(cols, [0, len(games_list)], self.local_tz),
+        })
 
     def train(self, input_path=DEFAULT_RAW_JSON, save_path=DEFAULT_MODEL):
         # --- SAFE IMPORTS (Only available in Dev) ---
@@ -225,31 +118,35 @@ class TiltModel:
         self.save(save_path)
         self._save_summary(df, best_thresh, best_pl, improvement)
 
-    def _optimize_threshold(self, df):
+    def _optimize_threshold(self, df, thresholds=None):
         if 'rating_diff' not in df.columns: return 0.5, 0, 0
-        thresholds = np.arange(0.30, 0.90, 0.02)
+        
+        thresholds = self.threshold_grid if thresholds is None else np.asarray(thresholds, dtype=float)
         baseline = df['rating_diff'].sum()
-        best_pl = -float('inf')
-        best_t = 0.5
-        for t in thresholds:
-            sim_pl = 0
-            for _, grp in df.groupby('session_id'):
-                stops = grp.index[grp['tilt_prob'] > t]
-                if not stops.empty:
-                    idx = stops[0]
-                    g_reset = grp.reset_index()
-                    local_mask = g_reset['index'] == idx
-                    if local_mask.any():
-                        stop_loc = local_mask.idxmax()
-                        played = g_reset.iloc[:stop_loc+1]
-                        sim_pl += played['rating_diff'].sum()
-                else:
-                    sim_pl += grp['rating_diff'].sum()
-            if sim_pl > best_pl:
-                best_pl = sim_pl
-                best_t = t
+        sim_pl = self._simulate_stop_pl(df, thresholds)
+        
+        # First maximum wins, same tie-break as a strict '>' sweep
+        best = int(np.argmax(sim_pl))
+        # Rounded: arange grids give 0.7400000000000004, which the bundle and API would echo
+        best_t, best_pl = float(round(thresholds[best], 6)), sim_pl[best]
         return best_t, best_pl, (best_pl - baseline)
 
+    def _simulate_stop_pl(self, df, thresholds):
+        """
+        P/L for every threshold t if each session stops AFTER its first game with
+        tilt_prob > t. A game is played under t iff all earlier games of its session
+        had prob <= t, i.e. t >= running max of the previous probs. Sorting games by
+        that running max turns P/L(t) into a prefix sum of rating_diff + searchsorted.
+        """
+        sessions = df['session_id']
+        prob = df['tilt_prob'].fillna(-np.inf)
+        prev_max = prob.groupby(sessions).cummax().groupby(sessions).shift(1).fillna(-np.inf)
+        
+        order = np.argsort(prev_max.to_numpy(), kind='stable')
+        gate = prev_max.to_numpy()[order]
+        cum_pl = np.concatenate([[0.0], np.cumsum(df['rating_diff'].to_numpy(dtype=float)[order])])
+        return cum_pl[np.searchsorted(gate, thresholds, side='right')]
+
     def _save_summary(self, df, thresh, pl, improve):
         summary_path = Path(DEFAULT_SUMMARY)
         summary_path.parent.mkdir(parents=True, exist_ok=True)
@@ -268,23 +165,39 @@ class TiltModel:
         thresh = self.config.get('threshold', 0.5)
         return {"stop_probability": float(prob), "threshold": float(thresh)}
 
-    def save(self, model_path):
-        import joblib # <--- SAFE IMPORT
+    def save(self, model_path, extra_sections=None):
+        """
+        Writes one model bundle (see model_bundle.py): XGBoost JSON booster +
+        feature order + threshold + config. `extra_sections` (e.g. {'onnx': bytes})
+        ride along; scripts/convert_to_onnx.py uses it. Returns the content hash.
+        """
         model_path = Path(model_path)
         model_path.parent.mkdir(parents=True, exist_ok=True)
-        self.model.save_model(model_path)
-        joblib.dump(self.config, model_path.parent / "tilt_config.joblib")
+        raw = self.model.get_booster().save_raw(raw_format='json')
+        meta = {k: v for k, v in self.config.items() if k not in ('features', 'threshold')}
+        return write_bundle(model_path, {SECTION_XGB_JSON: raw, **(extra_sections or {})},
+                            self.feature_cols, self.config.get('threshold', 0.5), meta)
 
     def load(self, model_path=DEFAULT_MODEL):
         import xgboost as xgb # <--- SAFE IMPORT
-        import joblib # <--- SAFE IMPORT
         
         model_path = Path(model_path)
         if not model_path.exists(): raise FileNotFoundError(f"Model not found: {model_path}")
         self.model = xgb.XGBClassifier()
+        with open(model_path, 'rb') as f:
+            bundled = is_bundle(f.read(8))
+        if bundled:
+            self.bundle = ModelBundle.open(model_path)
+            self.model.load_model(bytearray(self.bundle.section(SECTION_XGB_JSON)))
+            self.config = {**self.bundle.meta, 'features': self.bundle.features, 'threshold': self.bundle.threshold}
+            self.feature_cols = list(self.bundle.features)
+            return
+
+        # Legacy pair: XGBoost model file + pickled tilt_config.joblib sidecar
         self.model.load_model(model_path)
         config_path = model_path.parent / "tilt_config.joblib"
         if config_path.exists():
+            import joblib # <--- SAFE IMPORT
             self.config = joblib.load(config_path)
             self.feature_cols = self.config.get('features', self.feature_cols)
 
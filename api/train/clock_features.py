@@ -0,0 +1,169 @@
+# File: api/train/clock_features.py
+"""
+Per-move think time from clock data, for whole corpora at once.
+
+`my_avg_secs_per_move` (wall-clock duration / move count) mixes both players'
+time and ignores increments. Here the hero's own clock readings are diffed
+instead: think = previous own clock - clock after the move + increment.
+Clocks come from the Lichess `clocks` array (centiseconds) or from `[%clk]`
+tags in the PGN (the same tags parseClockFromPgn reads in
+lib/chess/gameProcessor.ts).
+
+Tags are located with a byte-level NumPy scan of all PGNs joined into one
+buffer rather than one regex call per game, and every later step (ply
+alignment, diffs, per-game reductions) is a flat array op, so the cost per
+game is a few string concatenations no matter how large the corpus is.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Think-time stats per game (NaN when the game has no usable hero clocks)
+CLOCK_FEATURE_COLS = ['my_think_mean', 'my_think_var', 'my_fast_move_share']
+
+# A move faster than this counts as a "fast" (pre-moved / blitzed-out) move
+FAST_MOVE_SECS = 2.0
+
+_TAG = np.frombuffer(b'[%clk ', dtype=np.uint8)
+_ZERO = np.uint8(ord('0'))
+_MAX_HOUR_DIGITS = 3
+_MAX_FRACTION_DIGITS = 3
+# Bytes read per tag: prefix + "HHH:MM:SS.fff]"
+_WINDOW = len(_TAG) + _MAX_HOUR_DIGITS + 6 + 1 + _MAX_FRACTION_DIGITS + 1
+
+
+def _parse_fixed(b, width):
+    """Tag windows whose hour field is `width` digits -> (seconds, ok)."""
+    d = lambda k: b[:, k].astype(np.int64) - ord('0')   # noqa: E731
+    is_digit = lambda k: (b[:, k] - _ZERO) <= 9          # noqa: E731 (uint8 wraps below '0')
+    ok = (b[:, width] == ord(':')) & (b[:, width + 3] == ord(':'))
+    for k in list(range(width)) + [width + 1, width + 2, width + 4, width + 5]:
+        ok &= is_digit(k)
+    hours = np.zeros(len(b), dtype=np.int64)
+    for k in range(width):
+        hours = hours * 10 + d(k)
+    secs = (hours * 3600 + (d(width + 1) * 10 + d(width + 2)) * 60 + d(width + 4) * 10 + d(width + 5)).astype(np.float64)
+
+    # Optional fraction, then the closing ']'
+    end = width + 6
+    has_frac = b[:, end] == ord('.')
+    frac, digits, scale = np.zeros(len(b)), np.zeros(len(b), dtype=np.int64), 0.1
+    for k in range(1, _MAX_FRACTION_DIGITS + 1):
+        more = has_frac & (digits == k - 1) & is_digit(end + k)
+        frac += np.where(more, d(end + k) * scale, 0.0)
+        digits += more
+        scale /= 10
+    closed = ~has_frac & (b[:, end] == ord(']'))
+    for k in range(1, _MAX_FRACTION_DIGITS + 1):
+        closed |= has_frac & (digits == k) & (b[:, end + k + 1] == ord(']'))
+    return secs + frac, ok & closed
+
+
+def parse_clock_tags(pgns):
+    """
+    `[%clk H:MM:SS]` (or `H:MM:SS.f`) tags of every PGN.
+    Returns (seconds, counts): all clock readings in seconds, in game then
+    ply order, and the number of readings per game. Malformed tags are skipped.
+    """
+    encoded = [p.encode() if isinstance(p, str) else b'' for p in pgns]
+    n = len(encoded)
+    ends = np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=n))
+    # Zero padding so every tag has a full window, even at the very end
+    buf = np.frombuffer(b''.join(encoded) + b'\0' * _WINDOW, dtype=np.uint8)
+
+    # Tag starts: every '[' followed by '%clk '
+    pos = np.flatnonzero(buf[:len(buf) - _WINDOW] == _TAG[0])
+    for k in range(1, len(_TAG)):
+        pos = pos[buf[pos + k] == _TAG[k]]
+
+    # One fixed-width window per tag; parsing is column math on it, one pass
+    # per hour-field width so every column offset is a constant
+    body = sliding_window_view(buf, _WINDOW)[pos, len(_TAG):]
+    width = np.zeros(len(pos), dtype=np.int64)
+    for k in range(_MAX_HOUR_DIGITS, 0, -1):   # first ':' wins
+        width[body[:, k] == ord(':')] = k
+
+    seconds = np.zeros(len(pos))
+    ok = np.zeros(len(pos), dtype=bool)
+    for w in range(1, _MAX_HOUR_DIGITS + 1):
+        rows = np.flatnonzero(width == w)
+        seconds[rows], ok[rows] = _parse_fixed(body[rows], w)
+
+    game = np.searchsorted(ends, pos[ok], side='right')
+    return seconds[ok], np.bincount(game, minlength=n).astype(np.int64)
+
+
+def flatten_clock_arrays(clock_lists):
+    """Lichess `clocks` arrays (centiseconds, one list per game) -> (seconds, counts)."""
+    lists = [c if isinstance(c, list) else [] for c in clock_lists]
+    counts = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+    values = np.fromiter((v for c in lists for v in c), dtype=np.float64, count=int(counts.sum()))
+    return values / 100.0, counts
+
+
+def think_time_stats(seconds, counts, hero_white, increment=None, fast_secs=FAST_MOVE_SECS):
+    """
+    Clock readings per ply (see parse_clock_tags) -> per-game hero think-time
+    mean, variance and share of moves under `fast_secs`, as a dict keyed by
+    CLOCK_FEATURE_COLS. Ply 0 is white's first move; each side's first move
+    has no previous reading and is skipped.
+    """
+    n = len(counts)
+    hero_white = np.asarray(hero_white, dtype=bool)
+    inc = np.zeros(n) if increment is None else np.nan_to_num(np.asarray(increment, dtype=float))
+
+    first = np.cumsum(counts) - counts
+    game_of = np.repeat(np.arange(n), counts)
+    ply = np.arange(len(seconds)) - first[game_of]
+
+    prev_own = np.full(len(seconds), np.nan)
+    prev_own[2:] = seconds[:-2]
+    prev_own[ply < 2] = np.nan
+    think = np.maximum(prev_own - seconds + inc[game_of], 0.0)
+
+    mine = ((ply % 2 == 0) == hero_white[game_of]) & np.isfinite(think)
+    g, t = game_of[mine], think[mine]
+    moves = np.bincount(g, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(g, t, n) / moves
+        var = np.maximum(np.bincount(g, t * t, n) / moves - mean * mean, 0.0)
+        fast = np.bincount(g, t < fast_secs, n) / moves
+    none = moves == 0
+    return {
+        'my_think_mean': np.where(none, np.nan, mean),
+        'my_think_var': np.where(none, np.nan, var),
+        'my_fast_move_share': np.where(none, np.nan, fast),
+    }
+
+
+def game_think_stats(pgns, clock_lists, hero_white, increment=None, fast_secs=FAST_MOVE_SECS):
+    """
+    Per-game stats from whichever clock source each game has: the `clocks`
+    array when present, else `[%clk]` tags in its PGN. Either list may be None.
+    """
+    n = len(hero_white)
+    clock_lists = [None] * n if clock_lists is None else list(clock_lists)
+    has_array = np.fromiter((isinstance(c, list) and len(c) > 0 for c in clock_lists), dtype=bool, count=n)
+    pgns = [None] * n if pgns is None else list(pgns)
+
+    tag_secs, tag_counts = parse_clock_tags([None if a else p for a, p in zip(has_array, pgns)])
+    if not has_array.any():
+        return think_time_stats(tag_secs, tag_counts, hero_white, increment, fast_secs)
+
+    arr_secs, arr_counts = flatten_clock_arrays(clock_lists)
+    # Merge both sources back into game order
+    game = np.concatenate([np.repeat(np.arange(n), tag_counts), np.repeat(np.arange(n), arr_counts)])
+    order = np.argsort(game, kind='stable')
+    seconds = np.concatenate([tag_secs, arr_secs])[order]
+    return think_time_stats(seconds, tag_counts + arr_counts, hero_white, increment, fast_secs)
+
+
+def think_stats_frame(df, hero_user):
+    """CLOCK_FEATURE_COLS for a json_normalize'd frame of raw games (pgn / clocks / clock_increment)."""
+    hero_white = (df['players_white_user_name'] == hero_user).to_numpy()
+    stats = game_think_stats(
+        df['pgn'].tolist() if 'pgn' in df.columns else None,
+        df['clocks'].tolist() if 'clocks' in df.columns else None,
+        hero_white,
+        df['clock_increment'].to_numpy(dtype=float) if 'clock_increment' in df.columns else None,
+    )
+    return {col: stats[col] for col in CLOCK_FEATURE_COLS}
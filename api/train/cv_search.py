@@ -0,0 +1,142 @@
+# File: api/train/cv_search.py
+"""
+Session-grouped cross-validated hyperparameter search.
+
+The parent splits the training frame once (StratifiedGroupKFold on
+session_id, so a session never straddles train/valid) and writes X, y and
+the fold indices to a scratch dir. Each pool worker loads them once
+(memory-mapped) and builds one DMatrix pair per fold in its initializer.
+Candidates then reuse those matrices instead of re-slicing per fit. Every
+fold trains with XGBoost early stopping on the validation fold.
+"""
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xgboost as xgb
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterGrid, StratifiedGroupKFold
+
+DEFAULT_PARAM_GRID = {
+    'max_depth': [2, 3, 4],
+    'learning_rate': [0.03, 0.1],
+    'min_child_weight': [1, 5],
+    'scale_pos_weight': [1, 5],
+}
+MAX_ROUNDS = 500
+EARLY_STOPPING_ROUNDS = 30
+
+# Per-worker fold cache, filled by _init_worker: [(dtrain, dvalid, valid_idx, y_valid)]
+_FOLDS = None
+_NTHREAD = 1
+
+
+def grouped_folds(y, groups, n_splits=5, seed=42):
+    """[(train_idx, valid_idx)] with every session entirely on one side."""
+    cv = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    return list(cv.split(np.zeros(len(y)), y, groups))
+
+
+def booster_params(params, nthread):
+    """XGBClassifier-style kwargs -> (native params, max rounds)."""
+    p = dict(params)
+    rounds = p.pop('n_estimators', MAX_ROUNDS)
+    p.pop('n_jobs', None)
+    seed = p.pop('random_state', None)
+    if seed is not None:
+        p['seed'] = seed
+    p['nthread'] = nthread
+    return p, rounds
+
+
+def _init_worker(data_dir, nthread):
+    global _FOLDS, _NTHREAD
+    _NTHREAD = nthread
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    folds = np.load(os.path.join(data_dir, 'folds.npy'))  # fold number per row
+    _FOLDS = []
+    for k in range(folds.max() + 1):
+        train_idx, valid_idx = np.flatnonzero(folds != k), np.flatnonzero(folds == k)
+        _FOLDS.append((
+            xgb.DMatrix(X[train_idx], label=y[train_idx], nthread=nthread),
+            xgb.DMatrix(X[valid_idx], label=y[valid_idx], nthread=nthread),
+            valid_idx,
+            np.asarray(y[valid_idx]),
+        ))
+
+
+def evaluate_candidate(params, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+    """Trains one candidate on every cached fold; runs inside a worker."""
+    t0 = time.perf_counter()
+    native, rounds = booster_params(params, _NTHREAD)
+    n_rows = sum(len(f[2]) for f in _FOLDS)
+    oof = np.full(n_rows, np.nan, dtype=np.float32)
+    aucs, best_rounds = [], []
+
+    for dtrain, dvalid, valid_idx, y_valid in _FOLDS:
+        booster = xgb.train(native, dtrain, num_boost_round=rounds, evals=[(dvalid, 'valid')],
+                            early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+        best = booster.best_iteration + 1
+        prob = booster.predict(dvalid, iteration_range=(0, best))
+        oof[valid_idx] = prob
+        best_rounds.append(best)
+        # A fold with a single class has no AUC; it still contributes OOF probs
+        aucs.append(roc_auc_score(y_valid, prob) if len(np.unique(y_valid)) > 1 else np.nan)
+
+    return {
+        'params': params,
+        'auc_mean': float(np.nanmean(aucs)),
+        'auc_std': float(np.nanstd(aucs)),
+        'fold_auc': [float(a) for a in aucs],
+        'best_rounds': best_rounds,
+        'seconds': round(time.perf_counter() - t0, 3),
+        'oof': oof,
+    }
+
+
+def run_search(X, y, groups, candidates, n_splits=5, n_workers=None,
+               early_stopping_rounds=EARLY_STOPPING_ROUNDS, seed=42):
+    """Evaluates every candidate on the same grouped folds; results sorted best AUC first."""
+    global _FOLDS
+    cpus = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers or cpus, len(candidates)))
+    nthread = max(1, cpus // n_workers)
+
+    folds = grouped_folds(y, groups, n_splits, seed)
+    fold_of_row = np.empty(len(y), dtype=np.int32)
+    for k, (_, valid_idx) in enumerate(folds):
+        fold_of_row[valid_idx] = k
+
+    with tempfile.TemporaryDirectory(prefix='tilt_cv_') as data_dir:
+        np.save(os.path.join(data_dir, 'X.npy'), np.ascontiguousarray(X, dtype=np.float32))
+        np.save(os.path.join(data_dir, 'y.npy'), np.asarray(y, dtype=np.float32))
+        np.save(os.path.join(data_dir, 'folds.npy'), fold_of_row)
+
+        print(f"🔎 [CV] {len(candidates)} candidates x {n_splits} folds on {n_workers} workers (nthread={nthread})")
+        if n_workers == 1:
+            _init_worker(data_dir, nthread)
+            try:
+                results = [evaluate_candidate(p, early_stopping_rounds) for p in candidates]
+            finally:
+                _FOLDS = None   # in-process: don't keep the fold DMatrices alive
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(data_dir, nthread)) as pool:
+                results = list(pool.map(evaluate_candidate, candidates,
+                                        [early_stopping_rounds] * len(candidates)))
+
+    return sorted(results, key=lambda r: -r['auc_mean'])
+
+
+def expand_grid(base_params, param_grid=None):
+    """
+    Base params overridden by every combination of the grid. The base
+    n_estimators is dropped: early stopping picks the rounds, up to MAX_ROUNDS
+    (a grid can still set it).
+    """
+    base = {k: v for k, v in base_params.items() if k != 'n_estimators'}
+    return [{**base, **combo} for combo in ParameterGrid(param_grid or DEFAULT_PARAM_GRID)]
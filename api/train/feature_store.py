@@ -0,0 +1,116 @@
+# File: api/train/feature_store.py
+"""
+On-disk cache of processed training frames.
+
+Each entry is a directory of uncompressed .npy files (one per column, plus
+the row index) and a meta.json, so a hit is a handful of np.load(mmap_mode='r')
+calls instead of a full ETL run. Entries are keyed by the source file's
+content hash and everything that changes the ETL output (ETL version,
+session gap, timezone, hero user, stored columns).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HASH_BLOCK = 1 << 20
+INDEX_FILE = "__index__.npy"
+META_FILE = "meta.json"
+HASH_MEMO_FILE = "source_hashes.json"
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FeatureStore:
+    """Processed-frame cache rooted at `root` (created on first write)."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    # --- Keys ---
+    def source_hash(self, path):
+        """Content hash of `path`, memoized on (size, mtime) so unchanged files are not re-read."""
+        path = Path(path).resolve()
+        st = path.stat()
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        memo_path = self.root / HASH_MEMO_FILE
+        try:
+            memo = json.loads(memo_path.read_text())
+        except (OSError, ValueError):
+            memo = {}
+
+        entry = memo.get(str(path))
+        if entry and entry.get('stamp') == stamp:
+            return entry['sha256']
+
+        digest = file_sha256(path)
+        memo[str(path)] = {'stamp': stamp, 'sha256': digest}
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = memo_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(memo))
+        os.replace(tmp, memo_path)
+        return digest
+
+    def key(self, source_path, **params):
+        """Entry key: source hash + ETL parameters (anything JSON-serializable)."""
+        spec = {'source': self.source_hash(source_path), **params}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+    # --- Read / Write ---
+    def load(self, key):
+        """Returns the cached DataFrame (columns memory-mapped) or None on a miss."""
+        entry = self.root / key
+        try:
+            meta = json.loads((entry / META_FILE).read_text())
+            index = np.load(entry / INDEX_FILE, mmap_mode='r')
+            data = {col: np.load(entry / f"{i}.npy", mmap_mode='r') for i, col in enumerate(meta['columns'])}
+        except (OSError, ValueError, KeyError) as e:
+            if entry.exists():
+                print(f"⚠️ [FeatureStore] Ignoring unreadable entry {key}: {e}")
+            return None
+        df = pd.DataFrame(data, index=pd.Index(index), copy=False)
+        df.attrs.update(meta.get('attrs', {}))
+        return df
+
+    def save(self, key, df, **meta):
+        """Writes `df` (numeric/bool columns only, plus its JSON-able attrs) atomically under `key`."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=self.root))
+        try:
+            columns = list(df.columns)
+            for i, col in enumerate(columns):
+                values = df[col].to_numpy()
+                if values.dtype == object:
+                    raise TypeError(f"Column {col!r} is not numeric; cannot store it")
+                np.save(tmp_dir / f"{i}.npy", values)
+            np.save(tmp_dir / INDEX_FILE, df.index.to_numpy())
+            (tmp_dir / META_FILE).write_text(json.dumps({
+                'columns': columns,
+                'rows': len(df),
+                'created': time.time(),
+                'attrs': df.attrs,
+                **meta,
+            }, default=str))
+
+            final = self.root / key
+            if final.exists():
+                shutil.rmtree(final)
+            os.replace(tmp_dir, final)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,211 @@
+# File: api/train/game_stream.py
+"""
+Streaming reader for raw Lichess game exports (JSON array or NDJSON).
+
+Games are parsed one at a time and reduced to the handful of fields the tilt
+ETL uses, stored in compact typed arrays (~100 bytes per game) instead of the
+full parsed export; clock data (`[%clk]` tags or the `clocks` array) is
+reduced to per-game think-time stats in batches. The result is sorted by
+createdAt and handed out in session-aligned chunks, so features can be built
+chunk by chunk.
+"""
+import json
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from api.train.clock_features import CLOCK_FEATURE_COLS, game_think_stats
+
+READ_BLOCK = 1 << 20  # chars per read
+CLOCK_BATCH_GAMES = 10_000  # games whose clock data is held before think stats are computed
+
+WINNER_CODES = {'white': 0, 'black': 1}
+WINNERS = np.array(['white', 'black', None], dtype=object)
+
+# Flattened names match pd.json_normalize(data, sep='_')
+FLOAT_FIELDS = [
+    ('createdAt', ('createdAt',)),
+    ('lastMoveAt', ('lastMoveAt',)),
+    ('players_white_analysis_acpl', ('players', 'white', 'analysis', 'acpl')),
+    ('players_black_analysis_acpl', ('players', 'black', 'analysis', 'acpl')),
+    ('players_white_analysis_blunder', ('players', 'white', 'analysis', 'blunder')),
+    ('players_black_analysis_blunder', ('players', 'black', 'analysis', 'blunder')),
+    ('players_white_ratingDiff', ('players', 'white', 'ratingDiff')),
+    ('players_black_ratingDiff', ('players', 'black', 'ratingDiff')),
+    ('clock_increment', ('clock', 'increment')),
+]
+
+# Everything _engineer_features reads (json_normalize names + precomputed per-game columns)
+RAW_COLS = ([name for name, _ in FLOAT_FIELDS] + ['players_white_user_name', 'winner', 'move_count']
+            + CLOCK_FEATURE_COLS)
+
+
+def _iter_json_array(f):
+    decoder = json.JSONDecoder()
+    buf, pos = f.read(READ_BLOCK), 0
+    pos = len(buf) - len(buf.lstrip())
+    if buf[pos:pos + 1] != '[':
+        raise ValueError("Expected a JSON array of games")
+    pos += 1
+
+    while True:
+        # Skip separators, refilling the buffer as needed
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf):
+                break
+            more = f.read(READ_BLOCK)
+            if not more:
+                raise ValueError("Unterminated JSON array")
+            buf, pos = more, 0
+
+        if buf[pos] == ']':
+            return
+        if buf[pos] != '{':
+            raise ValueError(f"Expected a game object, got {buf[pos]!r}")
+
+        try:
+            game, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Object runs past the buffer: pull in more and retry
+            more = f.read(READ_BLOCK)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+
+        yield game
+        pos = end
+        if pos > READ_BLOCK:
+            buf, pos = buf[pos:], 0
+
+
+def _iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_raw_games(path):
+    """Yields game dicts from a JSON array or NDJSON export without loading the file."""
+    with open(path, 'r') as f:
+        head = f.read(READ_BLOCK)
+        first = head.lstrip()[:1]
+        f.seek(0)
+        if first == '[':
+            yield from _iter_json_array(f)
+        elif first == '{':
+            yield from _iter_ndjson(f)
+        elif first:
+            raise ValueError(f"{path}: not a JSON array or NDJSON export")
+
+
+def _dig(game, keys):
+    for k in keys:
+        if not isinstance(game, dict):
+            return None
+        game = game.get(k)
+    return game
+
+
+class FlatGames:
+    """
+    Only the fields the ETL uses, in compact arrays (one entry per game).
+    Think-time stats only with clock_features (the ETL skips them otherwise).
+    """
+
+    def __init__(self, hero_user, clock_features=True):
+        self.hero_user = hero_user
+        self.clock_features = clock_features
+        self.floats = {name: array('d') for name, _ in FLOAT_FIELDS}
+        self.hero_white = array('b')
+        self.winner = array('b')
+        self.move_count = array('l')
+        self.think = {col: array('d') for col in CLOCK_FEATURE_COLS}
+        # Clock data of the games not yet reduced to think stats (bounded batch)
+        self._pending_clocks = []
+
+    def __len__(self):
+        return len(self.hero_white)
+
+    def append(self, game):
+        for name, keys in FLOAT_FIELDS:
+            v = _dig(game, keys)
+            self.floats[name].append(np.nan if v is None else float(v))
+        self.hero_white.append(_dig(game, ('players', 'white', 'user', 'name')) == self.hero_user)
+        self.winner.append(WINNER_CODES.get(game.get('winner'), 2))
+        # Same as len(moves.split(" ")) // 2
+        self.move_count.append(((game.get('moves') or "").count(" ") + 1) // 2)
+        if not self.clock_features:
+            return
+        self._pending_clocks.append((game.get('pgn'), game.get('clocks')))
+        if len(self._pending_clocks) >= CLOCK_BATCH_GAMES:
+            self._flush_clocks()
+
+    def _flush_clocks(self):
+        n = len(self._pending_clocks)
+        if not n:
+            return
+        pgns, clocks = zip(*self._pending_clocks)
+        lo = len(self) - n
+        stats = game_think_stats(pgns, clocks, np.frombuffer(self.hero_white, dtype=np.int8)[lo:].astype(bool),
+                                 np.frombuffer(self.floats['clock_increment'], dtype=np.float64)[lo:])
+        for col in CLOCK_FEATURE_COLS:
+            self.think[col].extend(stats[col])
+        self._pending_clocks = []
+
+    def to_arrays(self):
+        self._flush_clocks()
+        cols = {name: np.frombuffer(a, dtype=np.float64) for name, a in self.floats.items()}
+        cols['hero_white'] = np.frombuffer(self.hero_white, dtype=np.int8).astype(bool)
+        cols['winner'] = np.frombuffer(self.winner, dtype=np.int8)
+        cols['move_count'] = np.frombuffer(self.move_count, dtype=self.move_count.typecode)
+        if self.clock_features:
+            for col in CLOCK_FEATURE_COLS:
+                cols[col] = np.frombuffer(self.think[col], dtype=np.float64)
+        return cols
+
+
+def read_flat_games(path, hero_user, clock_features=True):
+    """Streams the export once; returns compact column arrays sorted by createdAt."""
+    flat = FlatGames(hero_user, clock_features)
+    for game in iter_raw_games(path):
+        flat.append(game)
+    cols = flat.to_arrays()
+    order = np.argsort(cols['createdAt'], kind='stable')
+    return {k: v[order] for k, v in cols.items()}
+
+
+def session_chunks(created_at_ms, gap_minutes, chunk_size):
+    """
+    Splits sorted start times into [start, end) row ranges of ~chunk_size rows
+    that never cut a session in two (new session = gap > gap_minutes).
+    """
+    n = len(created_at_ms)
+    if n == 0:
+        return []
+    gaps = np.diff(created_at_ms)
+    starts = np.concatenate([[0], np.flatnonzero(~(gaps <= gap_minutes * 60_000)) + 1])
+    bounds = [0]
+    for target in range(chunk_size, n, chunk_size):
+        i = np.searchsorted(starts, max(target, bounds[-1] + 1))
+        if i == len(starts):
+            break
+        bounds.append(int(starts[i]))
+    bounds.append(n)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def frame_from_arrays(cols, start, end, hero_user):
+    """Rows [start, end) as a DataFrame with the json_normalize column names."""
+    df = pd.DataFrame({name: cols[name][start:end] for name, _ in FLOAT_FIELDS})
+    df['players_white_user_name'] = np.where(cols['hero_white'][start:end], hero_user, '')
+    df['winner'] = WINNERS[cols['winner'][start:end]]
+    df['move_count'] = cols['move_count'][start:end]
+    for col in CLOCK_FEATURE_COLS:
+        if col in cols:
+            df[col] = cols[col][start:end]
+    return df
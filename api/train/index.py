@@ -2,13 +2,113 @@ from http.server import BaseHTTPRequestHandler
 import json
 import sys
 import os
+import threading
+import time
+import uuid
+from urllib.parse import urlparse, parse_qs
 
 # Add the current directory to Python's path so it finds the SDK
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
-from api.train.train_model_sdk import TiltModel
+from api.train.job_store import HEARTBEAT_SECS, JobStore, QUEUED, RUNNING, DONE
+from api.train.scheduler import TrainingScheduler
+
+MIN_GAMES = 10
+
+# One scheduler + job store per process; the pool itself starts on the first job
+scheduler = TrainingScheduler(
+    max_workers=int(os.environ['TRAIN_WORKERS']) if os.environ.get('TRAIN_WORKERS') else None,
+    n_jobs=int(os.environ['TRAIN_N_JOBS']) if os.environ.get('TRAIN_N_JOBS') else None,
+)
+jobs = JobStore()
+
+# job_id -> scheduler future, only for jobs submitted by this process
+_live = {}
+_heartbeat_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+def _heartbeat_loop():
+    # Keeps this process's unfinished jobs from being reported as lost
+    while True:
+        time.sleep(HEARTBEAT_SECS)
+        for job_id, fut in list(_live.items()):
+            try:
+                jobs.heartbeat(job_id, running=fut.running())
+            except Exception as e:
+                print(f"⚠️ [Train] Heartbeat for job {job_id} failed: {e}")
+
+
+def _start_heartbeat():
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name='train-heartbeat', daemon=True)
+            _heartbeat_thread.start()
+
+
+def _on_job_done(job_id, fut):
+    _live.pop(job_id, None)
+    try:
+        result = fut.result()
+    except Exception as e:
+        print(f"❌ [Train] Job {job_id} failed: {e}")
+        jobs.fail(job_id, e)
+        return
+    fields = {k: result[k] for k in ('games_used', 'rows', 'threshold', 'pl_improvement_est', 'train_seconds')}
+    jobs.finish(job_id, result['model_b64'], **fields)
+    print(f"✅ [Train] Job {job_id} done in {result['train_seconds']}s")
+
+
+def submit_job(user_id, games):
+    _start_heartbeat()
+    record = jobs.create(user_id, games_submitted=len(games))
+    fut = scheduler.submit(user_id, games)
+    _live[record['job_id']] = fut
+    fut.add_done_callback(lambda f, job_id=record['job_id']: _on_job_done(job_id, f))
+    return record
+
+
+def job_status(job_id, include_model=False):
+    record = jobs.get(job_id)
+    if record is None:
+        return None
+    fut = _live.get(job_id)
+    if record['status'] == QUEUED and fut is not None and fut.running():
+        record['status'] = RUNNING
+    # Submitted by a process that has since died (crash, restart, killed instance)
+    reason = jobs.lost_reason(record) if fut is None else None
+    if reason:
+        print(f"❌ [Train] Job {job_id} lost: {reason}")
+        record = jobs.fail(job_id, f"lost worker: {reason}")
+    if include_model and record['status'] == DONE:
+        record['model_b64'] = jobs.artifact(job_id)
+    return record
+
 
 class handler(BaseHTTPRequestHandler):
+    def _send_json(self, status, obj):
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(obj).encode('utf-8'))
+
+    def do_GET(self):
+        # ?job_id=<id>[&model=1] -> status (+ base64 model once done)
+        # no job_id              -> scheduler stats (queue depth, users/min)
+        query = parse_qs(urlparse(self.path).query)
+        job_id = query.get('job_id', [None])[0]
+        if job_id is None:
+            self._send_json(200, scheduler.stats())
+            return
+
+        include_model = query.get('model', ['0'])[0] not in ('0', 'false', '')
+        record = job_status(job_id, include_model=include_model)
+        if record is None:
+            self._send_json(404, {"error": f"Unknown job {job_id}"})
+        else:
+            self._send_json(200, record)
+
     def do_POST(self):
         content_len = int(self.headers.get('content-length', 0))
         body = self.rfile.read(content_len)
@@ -16,37 +116,21 @@ class handler(BaseHTTPRequestHandler):
         try:
             payload = json.loads(body)
             games = payload.get("games", [])
-            user_id = payload.get("user_id", "default")
+            # Anonymous requests must never dedupe against each other
+            user_id = payload.get("user_id") or f"anon-{uuid.uuid4().hex}"
 
-            if len(games) < 10:
-                self.send_response(400)
-                self.end_headers()
-                self.wfile.write(b'{"error": "Need at least 10 games to train"}')
+            if len(games) < MIN_GAMES:
+                self._send_json(400, {"error": f"Need at least {MIN_GAMES} games to train"})
                 return
 
-            # 1. Initialize & Train
-            print(f"Training personal model for {user_id} on {len(games)} games...")
-            tilt_ai = TiltModel(user_id=user_id)
-            tilt_ai.train(games)
-
-            # 2. Serialize to Base64
-            model_b64 = tilt_ai.to_base64()
-            
-            # 3. Return the "Brain"
-            response = {
-                "success": True,
-                "model_b64": model_b64,
-                "games_used": len(games)
-            }
-
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode('utf-8'))
+            # Returns immediately; poll GET ?job_id=... for the result
+            record = submit_job(user_id, games)
+            print(f"Queued job {record['job_id']} for {user_id} on {len(games)} games")
+            self._send_json(202, {
+                "job_id": record['job_id'],
+                "status": record['status'],
+                "status_url": f"/api/train?job_id={record['job_id']}",
+            })
             
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            error_msg = {"error": str(e)}
-            self.wfile.write(json.dumps(error_msg).encode('utf-8'))
\ No newline at end of file
+            self._send_json(500, {"error": str(e)})
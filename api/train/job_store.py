@@ -0,0 +1,130 @@
+# File: api/train/job_store.py
+"""
+File-backed store for asynchronous training jobs (no outside services).
+
+Per job: <root>/<job_id>.json holds the status record, and once the job is
+done <root>/<job_id>.model holds the base64 artifact. Every write goes to a
+temp file first and is then renamed, so pollers never see a partial record.
+
+Records name the process that owns the job (host, pid, process id), and the
+owner refreshes 'heartbeat' while the job is queued or running. If the
+process dies, lost_reason() says so: its pid is gone (same host) or the
+heartbeat is older than LOST_AFTER_SECS.
+"""
+import json
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+DEFAULT_JOB_DIR = Path(os.environ.get('TRAIN_JOB_DIR', Path(tempfile.gettempdir()) / "tilt_train_jobs"))
+# Owners touch live jobs this often; a job without a heartbeat for LOST_AFTER_SECS is lost
+HEARTBEAT_SECS = float(os.environ.get('TRAIN_JOB_HEARTBEAT_SECS', 15))
+LOST_AFTER_SECS = float(os.environ.get('TRAIN_JOB_LOST_SECS', 120))
+
+# This process, as job owner (a pid alone is reused, e.g. after a container restart)
+HOST = socket.gethostname()
+PROCESS_ID = uuid.uuid4().hex
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    def __init__(self, root=DEFAULT_JOB_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Heartbeats and lifecycle writes come from different threads
+        self._lock = threading.Lock()
+
+    def _path(self, job_id, suffix):
+        # Job ids come from query strings: never let them escape the store
+        if not JOB_ID_RE.match(job_id or ''):
+            raise KeyError(job_id)
+        return self.root / f"{job_id}{suffix}"
+
+    def _write(self, path, text):
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    # --- Records ---
+    def create(self, user_id, **fields):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        record = {'job_id': job_id, 'user_id': user_id, 'status': QUEUED, 'created': now, 'heartbeat': now,
+                  'host': HOST, 'pid': os.getpid(), 'process_id': PROCESS_ID, **fields}
+        self._write(self._path(job_id, '.json'), json.dumps(record))
+        return record
+
+    def get(self, job_id):
+        """Status record, or None for an unknown id."""
+        try:
+            return json.loads(self._path(job_id, '.json').read_text())
+        except (KeyError, FileNotFoundError):
+            return None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            record = self.get(job_id)
+            if record is None:
+                raise KeyError(job_id)
+            record.update(fields)
+            self._write(self._path(job_id, '.json'), json.dumps(record))
+            return record
+
+    def heartbeat(self, job_id, running=False):
+        """Owner's keep-alive (+ running/started_at once it starts). No-op once the job finished."""
+        with self._lock:
+            record = self.get(job_id)
+            if record is None or record['status'] not in (QUEUED, RUNNING):
+                return record
+            now = time.time()
+            record['heartbeat'] = now
+            if running and record['status'] == QUEUED:
+                record.update(status=RUNNING, started_at=now)
+            self._write(self._path(job_id, '.json'), json.dumps(record))
+            return record
+
+    def lost_reason(self, record, now=None):
+        """Why an unfinished job's owner is gone, or None while it may be alive (always for this process)."""
+        if record['status'] not in (QUEUED, RUNNING) or record.get('process_id') == PROCESS_ID:
+            return None
+        pid = record.get('pid')
+        if pid is not None and record.get('host') == HOST and (pid == os.getpid() or not _pid_running(pid)):
+            return f"worker process {pid} is no longer running"
+        age = (time.time() if now is None else now) - record.get('heartbeat', record['created'])
+        if age > LOST_AFTER_SECS:
+            return f"no heartbeat for {age:.0f}s (limit {LOST_AFTER_SECS:.0f}s)"
+        return None
+
+    # --- Lifecycle ---
+    def finish(self, job_id, model_b64, **fields):
+        # Artifact first: a 'done' record always has its model on disk
+        self._write(self._path(job_id, '.model'), model_b64)
+        return self.update(job_id, status=DONE, finished=time.time(), **fields)
+
+    def fail(self, job_id, error):
+        return self.update(job_id, status=FAILED, finished=time.time(), error=str(error))
+
+    def artifact(self, job_id):
+        """Base64 model of a finished job, or None."""
+        try:
+            return self._path(job_id, '.model').read_text()
+        except (KeyError, FileNotFoundError):
+            return None
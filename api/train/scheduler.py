@@ -0,0 +1,180 @@
+# File: api/train/scheduler.py
+"""
+Training scheduler for personal models.
+
+Requests are queued per user: while a user's request is still waiting, a newer
+one for the same user replaces its games (callers of the old one get the new
+result). Queued users are dispatched to a bounded process pool, at most one
+training per user at a time. Each worker pins XGBoost's n_jobs (and the
+OpenMP/BLAS thread env) so that N concurrent trainings share the cores
+instead of oversubscribing them.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing as mp
+
+THROUGHPUT_WINDOW_SEC = 300
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+# Set in each worker by _init_worker
+_WORKER_N_JOBS = None
+
+
+def _init_worker(n_jobs):
+    global _WORKER_N_JOBS
+    _WORKER_N_JOBS = n_jobs
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_jobs)
+
+
+def train_user(user_id, games, n_jobs=None):
+    """Trains one personal model; runs inside a pool worker (or inline)."""
+    from api.train.train_model_sdk import TiltModel
+
+    t0 = time.perf_counter()
+    model = TiltModel()
+    model.params['n_jobs'] = n_jobs or _WORKER_N_JOBS or model.params['n_jobs']
+    stats = model.train_games(games)
+    return {
+        'user_id': user_id,
+        'model_b64': model.to_base64(),
+        'games_used': len(games),
+        'train_seconds': round(time.perf_counter() - t0, 3),
+        **stats,
+    }
+
+
+class _Request:
+    __slots__ = ('games', 'waiters', 'submitted')
+
+    def __init__(self, games):
+        self.games = games
+        self.waiters = []
+        self.submitted = time.time()
+
+
+class TrainingScheduler:
+    """Bounded process pool + per-user dedupe queue. submit() returns a Future."""
+
+    def __init__(self, max_workers=None, n_jobs=None):
+        cpus = os.cpu_count() or 1
+        self.max_workers = max_workers or max(1, min(4, cpus))
+        self.n_jobs = n_jobs or max(1, cpus // self.max_workers)
+
+        self._lock = threading.RLock()  # done-callbacks may fire inside _pump
+        self._pending = OrderedDict()   # user_id -> _Request, FIFO by first submit
+        self._running = {}              # user_id -> list of waiter Futures
+        self._pool = None
+        self._started = time.time()
+        self._done_at = deque()
+        self.counters = {'submitted': 0, 'superseded': 0, 'trained': 0, 'failed': 0}
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: the server is threaded, and OpenMP runtimes are not fork-safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=mp.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.n_jobs,),
+            )
+            print(f"🏭 [Scheduler] Pool started: {self.max_workers} workers x n_jobs={self.n_jobs}")
+        return self._pool
+
+    def submit(self, user_id, games):
+        waiter = Future()
+        with self._lock:
+            self.counters['submitted'] += 1
+            req = self._pending.get(user_id)
+            if req is not None:
+                # Newer games win; everyone waiting gets the newer model
+                req.games = games
+                self.counters['superseded'] += 1
+                print(f"🔁 [Scheduler] Superseded queued request for {user_id}")
+            else:
+                req = self._pending[user_id] = _Request(games)
+            req.waiters.append(waiter)
+            self._pump()
+        return waiter
+
+    def _pump(self):
+        # Caller holds the lock
+        for user_id in list(self._pending):
+            if len(self._running) >= self.max_workers:
+                break
+            if user_id in self._running:
+                continue   # Runs after the in-flight training of the same user
+            req = self._pending.pop(user_id)
+            # Waiters report running() from here on; cancelled ones are dropped
+            self._running[user_id] = [w for w in req.waiters if w.set_running_or_notify_cancel()]
+            try:
+                try:
+                    pool = self._get_pool()
+                    fut = pool.submit(train_user, user_id, req.games, self.n_jobs)
+                except BrokenProcessPool:
+                    # Broke while idle: nothing ran yet, so one retry on a fresh pool
+                    self._reset_pool()
+                    pool = self._get_pool()
+                    fut = pool.submit(train_user, user_id, req.games, self.n_jobs)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._reset_pool()
+                self.counters['failed'] += 1
+                print(f"❌ [Scheduler] Could not dispatch {user_id}: {e!r}")
+                for w in self._running.pop(user_id):
+                    w.set_exception(e)
+                continue
+            fut.add_done_callback(lambda f, uid=user_id, p=pool: self._on_done(uid, f, p))
+
+    def _reset_pool(self):
+        # A dead worker (OOM-kill, segfault) breaks the whole pool; the next submit rebuilds it
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+            print("⚠️ [Scheduler] Worker pool broken, restarting")
+
+    def _on_done(self, user_id, fut, pool):
+        with self._lock:
+            waiters = self._running.pop(user_id)
+            error = fut.exception()
+            if error is None:
+                self.counters['trained'] += 1
+                self._done_at.append(time.time())
+            else:
+                self.counters['failed'] += 1
+                if isinstance(error, BrokenProcessPool) and self._pool is pool:
+                    self._reset_pool()
+
+        for w in waiters:
+            if error is None:
+                w.set_result(fut.result())
+            else:
+                w.set_exception(error)
+
+        with self._lock:
+            self._pump()
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            while self._done_at and self._done_at[0] < now - THROUGHPUT_WINDOW_SEC:
+                self._done_at.popleft()
+            window = min(THROUGHPUT_WINDOW_SEC, now - self._started)
+            return {
+                **self.counters,
+                'queued': len(self._pending),
+                'running': len(self._running),
+                'max_workers': self.max_workers,
+                'n_jobs_per_worker': self.n_jobs,
+                'users_per_minute': round(len(self._done_at) * 60.0 / max(window, 1e-9), 2),
+                'users_per_minute_lifetime': round(self.counters['trained'] * 60.0 / max(now - self._started, 1e-9), 2),
+            }
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
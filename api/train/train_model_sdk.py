@@ -2,40 +2,85 @@
 import pandas as pd
 import numpy as np
 import xgboost as xgb
-import joblib
 import json
 import os
-import pytz
+import time
 from pathlib import Path
-from sklearn.model_selection import StratifiedGroupKFold
-from sklearn.metrics import roc_auc_score
+
+from api.py_tilt.model_bundle import SECTION_XGB_JSON, ModelBundle, build_bundle, is_bundle, write_bundle
+# Shared feature core (training + serving); also the session gap and timezone
+from api.py_tilt.tilt_features import (FEATURE_COLS, LOCAL_TZ, ROLL_WINDOW, SESSION_GAP_MINUTES, TRAINING,
+                                       lichess_columns, read_games, session_bounds, session_features, stop_targets)
+from api.train.clock_features import CLOCK_FEATURE_COLS, think_stats_frame
+from api.train.cv_search import EARLY_STOPPING_ROUNDS, expand_grid, run_search
+from api.train.feature_store import FeatureStore
+from api.train.game_stream import RAW_COLS, frame_from_arrays, read_flat_games, session_chunks
 
 # --- DEFAULT PATHS ---
 BASE_DIR = Path(__file__).resolve().parents[2]
 DEFAULT_RAW_JSON = BASE_DIR / "data/eval_formatted/julio_amigo_dos_games_full_wiht_eval.json"
-DEFAULT_MODEL = BASE_DIR / "assets/tilt_model.json"
-DEFAULT_CONFIG = BASE_DIR / "assets/tilt_config.joblib"
+DEFAULT_MODEL = BASE_DIR / "assets/tilt_model.bundle"
 DEFAULT_SUMMARY = BASE_DIR / "output_analysis/tilt_detector/training_summary.txt"
+DEFAULT_FEATURE_STORE = Path(os.environ.get('TILT_FEATURE_STORE', BASE_DIR / "cache/feature_store"))
 
 # Constants for Feature Engineering
 HERO_USER = "julio_amigo_dos"
-SESSION_GAP_MINUTES = 30
-LOCAL_TZ = 'Europe/Warsaw'
+STREAM_CHUNK_GAMES = 50_000
+
+# Bump whenever _engineer_features output changes (invalidates the feature store)
+ETL_VERSION = 4
+
+# ETL carry at the start of a history (see _engineer_features)
+EMPTY_CARRY = {'rows': 0, 'sessions': 0, 'acpl_tail': [], 'streak_count': None}
+
+
+class UpdatePolicy:
+    """
+    When TiltModel.update() may append rounds and when it must rebuild instead.
+    A rebuild is forced once the appended rounds or the rows added since the
+    last full fit grow too large, or when the new rows drift away from the
+    training distribution (max standardized mean difference over features).
+    """
+    def __init__(self, rounds_per_update=10, max_rounds_added=100, max_delta_fraction=0.5,
+                 max_drift_smd=0.75, min_drift_rows=30):
+        self.rounds_per_update = rounds_per_update
+        self.max_rounds_added = max_rounds_added
+        self.max_delta_fraction = max_delta_fraction
+        self.max_drift_smd = max_drift_smd
+        self.min_drift_rows = min_drift_rows
+
+    def rebuild_reasons(self, state, delta, n_new, feature_cols):
+        """`delta` = re-engineered rows (open session + new), `n_new` = new games."""
+        reasons = []
+        if state['rounds_added'] + self.rounds_per_update > self.max_rounds_added:
+            reasons.append(f"rounds_added {state['rounds_added']} + {self.rounds_per_update} > {self.max_rounds_added}")
+        added = state['games_since_rebuild'] + n_new
+        if added > self.max_delta_fraction * max(state['rows_at_rebuild'], 1):
+            reasons.append(f"games since rebuild {added} > {self.max_delta_fraction:.0%} of {state['rows_at_rebuild']}")
+        if len(delta) >= self.min_drift_rows:
+            mean, std = np.array(state['ref_mean']), np.array(state['ref_std'])
+            smd = np.abs(np.nanmean(delta[feature_cols].to_numpy(float), axis=0) - mean) / np.maximum(std, 1e-9)
+            worst = int(np.nanargmax(smd))
+            if smd[worst] > self.max_drift_smd:
+                reasons.append(f"drift on {feature_cols[worst]} (SMD {smd[worst]:.2f} > {self.max_drift_smd})")
+        return reasons
 
 class TiltModel:
-    def __init__(self, local_tz=LOCAL_TZ):
+    def __init__(self, local_tz=LOCAL_TZ, clock_features=False):
         self.local_tz = local_tz
         self.model = None
         self.config = {}
+        # Raw rows + ETL carry of the last (possibly still open) session, for update()
+        self.update_tail = None
         
         # Features used by the model
-        self.feature_cols = [
-            'my_acpl', 'my_blunder_count', 'my_avg_secs_per_move', 'result',
-            'games_played', 'speed_vs_start', 'session_pl', 'loss_streak',
-            'roll_5_acpl_mean', 'roll_5_time_per_move',
-            'log_break_time',
-            'tod_morning', 'tod_midday', 'tod_evening', 'tod_night'
-        ]
+        self.feature_cols = list(FEATURE_COLS)
+        # Opt-in: per-move think time from clock tags (py_tilt does not serve these yet)
+        if clock_features:
+            self.feature_cols += CLOCK_FEATURE_COLS
+        
+        # Stop-threshold grid for _optimize_threshold (any resolution, e.g. 0.001 steps)
+        self.threshold_grid = np.arange(0.30, 0.90, 0.02)
         
         # Stabilized Hyperparameters
         self.params = {
@@ -56,11 +101,10 @@ class TiltModel:
     # ------------------------------------------------------------------
     # 1. DATA PREPARATION (Raw JSON -> Training DF)
     # ------------------------------------------------------------------
-    def _assign_time_of_day(self, hour):
-        if 5 <= hour < 9: return 'morning'
-        elif 9 <= hour < 18: return 'midday'
-        elif 18 <= hour < 23: return 'evening'
-        else: return 'night'
+    @property
+    def train_cols(self):
+        """Columns train() reads: features, label, CV groups and P/L for the threshold sweep."""
+        return self.feature_cols + ['target', 'session_id', 'rating_diff']
 
     def process_raw_data(self, json_path):
         """
@@ -78,182 +122,173 @@ class TiltModel:
         df = pd.json_normalize(data, sep='_')
         print(f"Loaded {len(df)} raw games.")
 
-        # --- A. Basic Extraction ---
-        # 1. User Color & Ratings
-        df['user_color'] = np.where(df['players_white_user_name'] == HERO_USER, 'white', 'black')
-        
-        # 2. ACPL / Blunders
-        df['my_acpl'] = np.where(df['user_color'] == 'white', 
-                                 df.get('players_white_analysis_acpl', np.nan), 
-                                 df.get('players_black_analysis_acpl', np.nan))
-        df['my_blunder_count'] = np.where(df['user_color'] == 'white', 
-                                          df.get('players_white_analysis_blunder', np.nan), 
-                                          df.get('players_black_analysis_blunder', np.nan))
-        
-        # 3. P/L (Rating Diff)
-        w_diff = df.get('players_white_ratingDiff', 0).fillna(0)
-        b_diff = df.get('players_black_ratingDiff', 0).fillna(0)
-        df['rating_diff'] = np.where(df['user_color'] == 'white', w_diff, b_diff)
-        
-        # 4. Result
-        conditions = [ df['winner'] == df['user_color'], df['winner'].isna() ]
-        choices = [1.0, 0.5]
-        df['result'] = np.select(conditions, choices, default=0.0)
-        
-        # 5. Time Calculation
-        df['created_at'] = pd.to_datetime(df['createdAt'], unit='ms', utc=True)
-        df['last_move_at'] = pd.to_datetime(df['lastMoveAt'], unit='ms', utc=True)
-        df['game_duration_sec'] = (df['last_move_at'] - df['created_at']).dt.total_seconds()
-        
-        # Count moves
-        df['moves_list'] = df['moves'].fillna("").apply(lambda x: x.split(" "))
-        df['move_count'] = df['moves_list'].apply(lambda x: len(x) // 2)
-        df['my_avg_secs_per_move'] = df['game_duration_sec'] / df['move_count'].replace(0, 1)
-
-        # --- B. Session & Advanced Features ---
-        df = df.sort_values('created_at').reset_index(drop=True)
-        
-        # 1. Session ID
-        df['time_diff'] = df['created_at'].diff()
-        df['is_new_session'] = (df['time_diff'] > pd.Timedelta(minutes=SESSION_GAP_MINUTES)) | (df['time_diff'].isna())
-        df['session_id'] = df['is_new_session'].cumsum()
-        
-        grp = df.groupby('session_id')
-        
-        # 2. Games Played & Session P/L
-        df['games_played'] = grp.cumcount() + 1
-        df['session_pl'] = grp['rating_diff'].cumsum()
-        df['session_cum_pl'] = df['session_pl']
-        
-        # 3. Speed vs Start
-        first_speed = grp['my_avg_secs_per_move'].transform('first')
-        df['speed_vs_start'] = df['my_avg_secs_per_move'] / (first_speed + 0.001)
-        
-        # 4. Loss Streak
-        df['is_loss'] = (df['result'] == 0.0).astype(int)
-        streak_group = (df['is_loss'] == 0).cumsum()
-        df['loss_streak'] = df.groupby(streak_group).cumcount()
-        df.loc[df['is_loss'] == 0, 'loss_streak'] = 0
-        
-        # 5. Rolling Features
-        acpl_safe = df['my_acpl'].fillna(0)
-        df['roll_5_acpl_mean'] = grp['my_acpl'].transform(lambda x: acpl_safe.rolling(5).mean())
-        df['roll_5_time_per_move'] = grp['my_avg_secs_per_move'].transform(lambda x: x.rolling(5).mean())
-        df[['roll_5_acpl_mean', 'roll_5_time_per_move']] = df[['roll_5_acpl_mean', 'roll_5_time_per_move']].fillna(0)
-
-        # --- C. Time Features ---
-        # 1. Break Time (Log)
-        df['prev_game_end'] = grp['last_move_at'].shift(1)
-        df['break_time'] = (df['created_at'] - df['prev_game_end']).dt.total_seconds()
-        df['break_time'] = df['break_time'].fillna(0.0).clip(lower=0)
-        df['log_break_time'] = np.log1p(df['break_time'])
-        
-        # 2. Time of Day (One-Hot)
-        try:
-            tz = pytz.timezone(self.local_tz)
-            local_time = df['created_at'].dt.tz_convert(tz)
-        except:
-            local_time = df['created_at']
-            
-        df['time_of_day_label'] = local_time.dt.hour.apply(self._assign_time_of_day)
+        df_clean, _ = self._engineer_features(df)
         
-        tod_dummies = pd.get_dummies(df['time_of_day_label'], prefix='tod', dtype=int)
-        for tod in ['morning', 'midday', 'evening', 'night']:
-            col_name = f'tod_{tod}'
-            if col_name not in tod_dummies.columns:
-                tod_dummies[col_name] = 0
-        df = pd.concat([df, tod_dummies], axis=1)
+        print(f"Data Processed. {len(df_clean)} rows ready for training.")
+        return df_clean
 
-        # --- D. Cleaning & Target ---
-        # Drop missing analysis
-        df_clean = df.dropna(subset=['my_acpl', 'my_blunder_count']).copy()
-        
-        # Calculate Target (Ideal Stop)
-        session_max = df_clean.groupby('session_id')['session_cum_pl'].transform('max')
-        df_clean['is_max'] = (df_clean['session_cum_pl'] == session_max)
-        
-        target_indices = df_clean[df_clean['is_max']].groupby('session_id')['games_played'].idxmin()
-        
-        df_clean['target'] = 0
-        df_clean.loc[target_indices, 'target'] = 1
-        
+    def iter_processed_chunks(self, raw_path, chunk_size=STREAM_CHUNK_GAMES):
+        """
+        Bounded-memory ETL for big exports (JSON array or NDJSON).
+        Streams the file once into compact columns, then yields processed
+        DataFrames of ~chunk_size games, cut on session boundaries. Loss streaks,
+        the global acpl window, session ids and row labels carry across chunks,
+        so pd.concat(chunks) equals process_raw_data(raw_path).
+        """
+        if not os.path.exists(raw_path):
+            raise FileNotFoundError(f"{raw_path} not found.")
+        
+        cols = read_flat_games(raw_path, HERO_USER, clock_features=self._uses_clock_features())
+        print(f"Streamed {len(cols['createdAt'])} raw games.")
+        
+        carry = None
+        ranges = session_chunks(cols['createdAt'], SESSION_GAP_MINUTES, chunk_size)
+        for i, (start, end) in enumerate(ranges):
+            frame = frame_from_arrays(cols, start, end, HERO_USER)
+            if i < len(ranges) - 1:
+                chunk, carry = self._engineer_features(frame, carry)
+            else:
+                # Last chunk also leaves the open session behind for update()
+                chunk, carry, self.update_tail = self._engineer_with_tail(frame, carry)
+            yield chunk
+
+    def process_raw_data_streaming(self, raw_path, chunk_size=STREAM_CHUNK_GAMES, columns=None):
+        """
+        Same rows/values as process_raw_data, without ever holding the parsed export.
+        `columns` keeps only those columns per chunk (train() passes train_cols).
+        """
+        print(f"--- Streaming Raw Data from {raw_path} ---")
+        chunks = [chunk if columns is None else chunk[columns]
+                  for chunk in self.iter_processed_chunks(raw_path, chunk_size)]
+        df_clean = pd.concat(chunks) if chunks else pd.DataFrame(columns=columns or self.feature_cols + ['target'])
+        df_clean.attrs['update_tail'] = self.update_tail
         print(f"Data Processed. {len(df_clean)} rows ready for training.")
         return df_clean
 
+    def _engineer_with_tail(self, flat, carry=None):
+        """
+        _engineer_features over a session-aligned frame, split before its last
+        session. Returns (df_clean, carry, tail): `tail` holds the raw rows of
+        that still-open session and the carry at its start, so update() can
+        re-engineer it together with new games.
+        """
+        flat = self._add_game_columns(flat)
+        flat = flat.sort_values('createdAt', kind='stable').reset_index(drop=True)
+        last_start = int(session_bounds(flat['createdAt'].to_numpy(dtype=float))[-2]) if len(flat) else 0
+        
+        parts = []
+        if last_start > 0:
+            head, carry = self._engineer_features(flat.iloc[:last_start].copy(), carry)
+            parts.append(head)
+        raw = flat.iloc[last_start:][[c for c in RAW_COLS if c in flat.columns]]
+        tail = {'carry': carry or EMPTY_CARRY, 'raw': {c: raw[c].tolist() for c in raw.columns}}
+        last, carry = self._engineer_features(raw.copy(), carry)
+        parts.append(last)
+        return pd.concat(parts), carry, tail
+
+    def _uses_clock_features(self):
+        return bool(set(CLOCK_FEATURE_COLS) & set(self.feature_cols))
+
+    def _add_game_columns(self, df):
+        """
+        Per-game columns derived from raw fields, unless precomputed: move count,
+        and think-time stats when the model uses them (PGN parsing is costly).
+        """
+        if 'move_count' not in df.columns:
+            # Tokens = spaces + 1 (same as len(moves.split(" "))), without building lists
+            df = df.assign(move_count=(df['moves'].fillna("").str.count(" ") + 1) // 2)
+        if self._uses_clock_features() and not set(CLOCK_FEATURE_COLS) <= set(df.columns):
+            df = df.assign(**think_stats_frame(df, HERO_USER))
+        return df
+
+    def _engineer_features(self, df, carry=None):
+        """
+        Flattened games (json_normalize column names) -> features + target.
+        `carry` continues from the previous chunk of a sorted stream that was
+        cut on a session boundary; returns (df_clean, carry for the next chunk).
+        The features come from the shared core (tilt_features, TRAINING spec).
+        """
+        carry = carry or EMPTY_CARRY
+
+        # --- A. Per-game columns ---
+        # Move count + clock think-time stats (the streaming reader computes them while parsing)
+        df = self._add_game_columns(df)
+        df = df.sort_values('createdAt', kind='stable').reset_index(drop=True)
+        df.index += carry['rows']
+        cols = lichess_columns(df, HERO_USER)
+
+        # --- B. Sessions & Features ---
+        bounds = session_bounds(cols['created_at'], SESSION_GAP_MINUTES)
+        features = session_features(cols, bounds, self.local_tz, TRAINING,
+                                    acpl_tail=carry['acpl_tail'], streak_carry=carry['streak_count'])
+        session_id = np.repeat(np.arange(1, len(bounds)), np.diff(bounds)) + carry['sessions']
+        df = df.assign(
+            created_at=pd.to_datetime(df['createdAt'], unit='ms', utc=True),
+            last_move_at=pd.to_datetime(df['lastMoveAt'], unit='ms', utc=True),
+            rating_diff=cols['rating_diff'],
+            session_id=session_id,
+            session_cum_pl=features['session_pl'],
+            **features,
+        )
+
+        # --- C. Cleaning & Target ---
+        # Drop missing analysis, then label each session's ideal stop
+        keep = ~(np.isnan(cols['my_acpl']) | np.isnan(cols['my_blunder_count']))
+        df_clean = df[keep].copy()
+        df_clean['target'] = stop_targets(session_id[keep], features['session_pl'][keep])
+
+        acpl_safe = np.where(np.isnan(cols['my_acpl']), 0.0, cols['my_acpl'])
+        next_carry = {
+            'rows': carry['rows'] + len(df),
+            'sessions': int(session_id[-1]) if len(df) else carry['sessions'],
+            'acpl_tail': (list(carry['acpl_tail']) + acpl_safe.tolist())[-(ROLL_WINDOW - 1):],
+            'streak_count': int(features['loss_streak'][-1]) if len(df) else carry['streak_count'],
+        }
+        return df_clean, next_carry
+
     # ------------------------------------------------------------------
     # 2. INFERENCE HELPERS (Raw List -> DataFrame)
     # ------------------------------------------------------------------
     def _enrich_json(self, games_list):
         """
         Lightweight version of process_raw_data for real-time inference.
-        Assumes input is list of dicts with basic fields.
+        Assumes input is list of dicts with basic fields; same values as
+        /api/py_tilt (tilt_features, SERVING spec).
         """
         if not games_list: return pd.DataFrame()
 
-        rows = []
-        for g in games_list:
-            created_at = pd.to_datetime(g.get('createdAt'), unit='ms', utc=True)
-            last_move = pd.to_datetime(g.get('lastMoveAt'), unit='ms', utc=True)
-            
-            rows.append({
-                'created_at': created_at,
-                'last_move_at': last_move,
-                'my_acpl': g.get('my_acpl', 50),
-                'my_blunder_count': g.get('my_blunder_count', 0),
-                'my_avg_secs_per_move': g.get('my_avg_secs_per_move', 5.0),
-                'result': g.get('result', 0.5),
-                'rating_diff': g.get('rating_diff', 0)
-            })
-            
-        df = pd.DataFrame(rows)
-        df = df.sort_values('created_at').reset_index(drop=True)
-        
-        # Session Context (Inference assumes single session context)
-        df['games_played'] = df.index + 1
-        df['session_pl'] = df['rating_diff'].cumsum()
-        
-        # Streak
-        df['is_loss'] = (df['result'] == 0.0).astype(int)
-        streak_group = (df['is_loss'] == 0).cumsum()
-        df['loss_streak'] = df.groupby(streak_group).cumcount()
-        df.loc[df['is_loss'] == 0, 'loss_streak'] = 0
-        
-        # Rolling
-        df['roll_5_acpl_mean'] = df['my_acpl'].rolling(5, min_periods=1).mean().fillna(50)
-        df['roll_5_time_per_move'] = df['my_avg_secs_per_move'].rolling(5, min_periods=1).mean().fillna(5)
-        
-        first_speed = df['my_avg_secs_per_move'].iloc[0] + 0.001
-        df['speed_vs_start'] = df['my_avg_secs_per_move'] / first_speed
-        
-        # Time
-        df['prev_game_end'] = df['last_move_at'].shift(1)
-        df['break_time'] = (df['created_at'] - df['prev_game_end']).dt.total_seconds()
-        df['break_time'] = df['break_time'].fillna(0).clip(lower=0)
-        df['log_break_time'] = np.log1p(df['break_time'])
-        
-        try:
-            tz = pytz.timezone(self.local_tz)
-            local_time = df['created_at'].dt.tz_convert(tz)
-        except:
-            local_time = df['created_at']
-            
-        df['tod_label'] = local_time.dt.hour.apply(self._assign_time_of_day)
-        for t in ['morning', 'midday', 'evening', 'night']:
-            df[f'tod_{t}'] = (df['tod_label'] == t).astype(int)
-            
-        return df
+        cols = read_games(games_list)
+        return pd.DataFrame({
+            'created_at': pd.to_datetime(cols['created_at'], unit='ms', utc=True),
+            'last_move_at': pd.to_datetime(cols['last_move_at'], unit='ms', utc=True),
+            'rating_diff': cols['rating_diff'],
+            **session_features(cols, [0, len(games_list)], self.local_tz),
+        })
 
     # ------------------------------------------------------------------
     # 3. TRAINING & OPTIMIZATION
     # ------------------------------------------------------------------
-    def train(self, input_path=DEFAULT_RAW_JSON, save_path=DEFAULT_MODEL):
+    def load_training_frame(self, input_path, use_cache=True, store_dir=DEFAULT_FEATURE_STORE):
         """
-        End-to-End: Preprocess -> Train -> Optimize -> Save
+        Raw export or pre-processed CSV -> train_cols frame.
+        Cached per (file content, ETL_VERSION, session gap, TZ, hero, columns).
         """
-        # A. Preprocess
+        is_raw = str(input_path).endswith(('.json', '.ndjson', '.jsonl'))
+        store = FeatureStore(store_dir) if use_cache else None
+        if store is not None:
+            key = store.key(input_path, etl_version=ETL_VERSION, kind='raw' if is_raw else 'csv',
+                            session_gap_minutes=SESSION_GAP_MINUTES, local_tz=self.local_tz,
+                            hero_user=HERO_USER, columns=self.train_cols)
+            df = store.load(key)
+            if df is not None:
+                print(f"⚡ Feature store hit ({key[:12]}): {len(df)} rows from {input_path}")
+                self.update_tail = df.attrs.get('update_tail')
+                return df
+        
         # Check file extension to decide mode
-        if str(input_path).endswith('.json'):
-            df = self.process_raw_data(input_path)
+        # Raw exports (JSON array / NDJSON) are streamed to keep memory bounded
+        if is_raw:
+            df = self.process_raw_data_streaming(input_path, columns=self.train_cols)
         else:
             print(f"Loading pre-processed CSV from {input_path}")
             df = pd.read_csv(input_path)
@@ -262,10 +297,61 @@ class TiltModel:
         missing = [c for c in self.feature_cols if c not in df.columns]
         if missing:
             raise ValueError(f"Missing features: {missing}")
-            
+        df = df[[c for c in self.train_cols if c in df.columns]]
+        # CSV inputs have no raw rows to continue from: update() needs a raw export
+        df.attrs['update_tail'] = self.update_tail if is_raw else None
+        self.update_tail = df.attrs['update_tail']
+        
+        if store is not None:
+            store.save(key, df, source=str(input_path), etl_version=ETL_VERSION)
+            print(f"💾 Feature store saved ({key[:12]}): {len(df)} rows")
+        return df
+
+    def train(self, input_path=DEFAULT_RAW_JSON, save_path=DEFAULT_MODEL, use_cache=True,
+              search=False, param_grid=None):
+        """
+        End-to-End: Preprocess -> (Search) -> Train -> Optimize -> Save
+        With search=True the params come from grouped CV and the saved threshold
+        is the out-of-fold one instead of the in-sample one.
+        """
+        # A. Preprocess (served from the feature store when the input is unchanged)
+        df = self.load_training_frame(input_path, use_cache=use_cache)
+        
+        cv = None
+        if search:
+            cv = self.search(df, param_grid=param_grid)
+            self.params = cv['best_params']
+        
+        # B + C. Train & Optimize
+        best_thresh, best_pl, improvement = self.fit_frame(df)
+        if cv is not None:
+            best_thresh, best_pl, improvement = cv['oof_threshold'], cv['oof_pl'], cv['oof_improvement']
+            self.config.update(threshold=best_thresh, pl_improvement_est=improvement,
+                               cv={k: v for k, v in cv.items() if k != 'candidates'})
+        
+        # D. Save
+        self.save(save_path)
+        self._save_summary(df, best_thresh, best_pl, improvement)
+        
+        print(f"✅ Training Complete.")
+        print(f"   Best Threshold: {best_thresh:.2f}")
+        print(f"   Est. Gain: {improvement:+.0f}")
+
+    def train_games(self, games_list):
+        """
+        In-memory variant for personal models: raw Lichess game dicts -> fitted model.
+        Nothing is written to disk; returns the same stats train() prints.
+        """
+        df, _, self.update_tail = self._engineer_with_tail(pd.json_normalize(games_list, sep='_'))
+        if df.empty:
+            raise ValueError("No analysed games to train on")
+        best_thresh, best_pl, improvement = self.fit_frame(df)
+        return {'rows': len(df), 'threshold': float(best_thresh), 'pl_improvement_est': float(improvement)}
+
+    def fit_frame(self, df):
+        """Fits the booster on a processed frame and picks the stop threshold."""
         X = df[self.feature_cols]
         y = df['target']
-        groups = df['session_id']
         
         print(f"Training on {len(df)} games...")
         
@@ -278,52 +364,175 @@ class TiltModel:
         df['tilt_prob'] = self.model.predict_proba(X)[:, 1]
         best_thresh, best_pl, improvement = self._optimize_threshold(df)
         
-        # D. Save
         self.config = {
             'features': self.feature_cols,
             'params': self.params,
             'threshold': best_thresh,
-            'pl_improvement_est': improvement
+            'pl_improvement_est': improvement,
+            'update_state': self._new_update_state(df),
         }
-        self.save(save_path)
-        self._save_summary(df, best_thresh, best_pl, improvement)
+        return best_thresh, best_pl, improvement
+
+    def _new_update_state(self, df):
+        """What update() needs after a full fit (None if there is no raw tail to continue)."""
+        if self.update_tail is None or 'rating_diff' not in df.columns:
+            return None
+        # Sessions before the open one are final: keep their P/L-per-threshold curve
+        closed = df[df['session_id'] <= self.update_tail['carry']['sessions']]
+        X = df[self.feature_cols].to_numpy(float)
+        return {
+            'tail': self.update_tail,
+            'thresholds': self.threshold_grid.tolist(),
+            'pl_curve_closed': self._simulate_stop_pl(closed, self.threshold_grid).tolist(),
+            'baseline_closed': float(closed['rating_diff'].sum()),
+            'ref_mean': np.nanmean(X, axis=0).tolist(),
+            'ref_std': np.nanstd(X, axis=0).tolist(),
+            'rows_at_rebuild': len(df),
+            'games_since_rebuild': 0,
+            'rounds_added': 0,
+        }
+
+    def update(self, new_games, policy=None, rebuild_source=None):
+        """
+        Warm-start update with games played since the last fit/update.
+        Only the open session + new sessions are re-engineered; `rounds_per_update`
+        boosting rounds are appended on those rows, and the threshold is re-picked
+        from the cached curve of closed sessions + the affected ones. When the
+        policy asks for a rebuild, refits from `rebuild_source` (raw export path or
+        games list) if given; otherwise leaves the model untouched and says so.
+        """
+        if self.model is None: raise ValueError("Model not loaded.")
+        state = self.config.get('update_state')
+        if state is None:
+            raise ValueError("Model has no update state; fit it with train() on a raw export or train_games()")
+        policy = policy or UpdatePolicy()
+        t0 = time.perf_counter()
+        
+        # A. Re-engineer the open session together with the new games
+        tail = state['tail']
+        new_flat = pd.json_normalize(new_games, sep='_') if len(new_games) else pd.DataFrame(columns=['createdAt'])
+        last_seen = max(tail['raw']['createdAt'], default=-np.inf)
+        fresh = new_flat[new_flat['createdAt'].astype(float) > last_seen]
+        if fresh.empty:
+            return {'mode': 'noop', 'new_games': 0, 'seconds': round(time.perf_counter() - t0, 4)}
+        fresh = self._add_game_columns(fresh)
+        flat = pd.concat([pd.DataFrame(tail['raw']), fresh[[c for c in RAW_COLS if c in fresh.columns]]],
+                         ignore_index=True)
+        affected, _, new_tail = self._engineer_with_tail(flat, tail['carry'])
+        
+        # B. Policy: append rounds or rebuild
+        reasons = policy.rebuild_reasons(state, affected, len(fresh), self.feature_cols)
+        if reasons:
+            print(f"🔄 Update needs a full rebuild: {'; '.join(reasons)}")
+            if rebuild_source is None:
+                return {'mode': 'rebuild_required', 'reasons': reasons, 'new_games': len(fresh),
+                        'seconds': round(time.perf_counter() - t0, 4)}
+            if isinstance(rebuild_source, (str, Path)):
+                self.fit_frame(self.load_training_frame(rebuild_source))
+            else:
+                self.train_games(rebuild_source)
+            return {'mode': 'rebuild', 'reasons': reasons, 'new_games': len(fresh),
+                    'threshold': float(self.config['threshold']), 'seconds': round(time.perf_counter() - t0, 4)}
+        
+        X, y = affected[self.feature_cols], affected['target']
+        rounds = 0
+        if y.nunique() > 1:
+            booster = self.model.get_booster()
+            self.model.set_params(n_estimators=policy.rounds_per_update)
+            self.model.fit(X, y, xgb_model=booster)
+            rounds = policy.rounds_per_update
+        
+        # C. Threshold: cached closed-session curve + affected sessions re-simulated
+        thresholds = np.asarray(state['thresholds'])
+        affected['tilt_prob'] = self.model.predict_proba(X)[:, 1]
+        sim_pl = np.asarray(state['pl_curve_closed']) + self._simulate_stop_pl(affected, thresholds)
+        baseline = state['baseline_closed'] + affected['rating_diff'].sum()
+        best = int(np.argmax(sim_pl))
+        
+        # D. Roll state forward: sessions before the new open one are now closed
+        closed = affected[affected['session_id'] <= new_tail['carry']['sessions']]
+        state.update(
+            tail=new_tail,
+            pl_curve_closed=(np.asarray(state['pl_curve_closed']) + self._simulate_stop_pl(closed, thresholds)).tolist(),
+            baseline_closed=state['baseline_closed'] + float(closed['rating_diff'].sum()),
+            games_since_rebuild=state['games_since_rebuild'] + len(fresh),
+            rounds_added=state['rounds_added'] + rounds,
+        )
+        self.update_tail = new_tail
+        self.config.update(threshold=float(thresholds[best]), pl_improvement_est=float(sim_pl[best] - baseline))
+        
+        return {'mode': 'incremental', 'new_games': len(fresh), 'rows': len(affected), 'rounds_added': rounds,
+                'threshold': self.config['threshold'], 'seconds': round(time.perf_counter() - t0, 4)}
+
+    def search(self, data=DEFAULT_RAW_JSON, param_grid=None, n_splits=5, n_workers=None,
+               early_stopping_rounds=EARLY_STOPPING_ROUNDS, use_cache=True):
+        """
+        Grouped-CV hyperparameter search (see cv_search). `data` is an input path
+        or an already processed frame. Returns the best params (n_estimators set
+        from early stopping) plus the out-of-fold threshold / P/L of that candidate.
+        """
+        df = data if isinstance(data, pd.DataFrame) else self.load_training_frame(data, use_cache=use_cache)
+        candidates = expand_grid(self.params, param_grid)
         
-        print(f"✅ Training Complete.")
-        print(f"   Best Threshold: {best_thresh:.2f}")
-        print(f"   Est. Gain: {improvement:+.0f}")
+        results = run_search(df[self.feature_cols].to_numpy(), df['target'].to_numpy(), df['session_id'].to_numpy(),
+                             candidates, n_splits=n_splits, n_workers=n_workers,
+                             early_stopping_rounds=early_stopping_rounds)
+        best = results[0]
+        
+        # Threshold picked on out-of-fold probabilities, not on the training fit
+        oof_df = df[[c for c in ('session_id', 'rating_diff') if c in df.columns]].copy()
+        oof_df['tilt_prob'] = best['oof']
+        oof_thresh, oof_pl, oof_improvement = self._optimize_threshold(oof_df)
+        
+        best_params = {**best['params'], 'n_estimators': int(np.median(best['best_rounds']))}
+        print(f"🏆 CV AUC {best['auc_mean']:.4f} ± {best['auc_std']:.4f} | "
+              f"OOF threshold {oof_thresh:.2f} (gain {oof_improvement:+.0f})")
+        print(f"   Best params: { {k: best_params[k] for k in sorted(set(best_params) - {'objective', 'eval_metric'})} }")
+        
+        return {
+            'best_params': best_params,
+            'cv_auc': best['auc_mean'],
+            'cv_auc_std': best['auc_std'],
+            'n_splits': n_splits,
+            'oof_threshold': float(oof_thresh),
+            'oof_pl': float(oof_pl),
+            'oof_improvement': float(oof_improvement),
+            'candidates': [{k: r[k] for k in ('params', 'auc_mean', 'auc_std', 'best_rounds', 'seconds')} for r in results],
+        }
 
-    def _optimize_threshold(self, df):
+    def _optimize_threshold(self, df, thresholds=None):
+        """
+        Picks the stop threshold that maximizes simulated P/L. The whole grid is
+        evaluated in one pass (see _simulate_stop_pl), so a fine grid costs the same.
+        """
         if 'rating_diff' not in df.columns: return 0.5, 0, 0
         
-        thresholds = np.arange(0.30, 0.90, 0.02)
+        thresholds = self.threshold_grid if thresholds is None else np.asarray(thresholds, dtype=float)
         baseline = df['rating_diff'].sum()
-        best_pl = -float('inf')
-        best_t = 0.5
-        
-        for t in thresholds:
-            sim_pl = 0
-            for _, grp in df.groupby('session_id'):
-                stops = grp.index[grp['tilt_prob'] > t]
-                if not stops.empty:
-                    # Stop AFTER this game
-                    idx = stops[0]
-                    g_reset = grp.reset_index()
-                    # Find local index of the global index 'idx'
-                    # Safe approach: boolean mask
-                    local_mask = g_reset['index'] == idx
-                    if local_mask.any():
-                        stop_loc = local_mask.idxmax()
-                        played = g_reset.iloc[:stop_loc+1]
-                        sim_pl += played['rating_diff'].sum()
-                else:
-                    sim_pl += grp['rating_diff'].sum()
-            
-            if sim_pl > best_pl:
-                best_pl = sim_pl
-                best_t = t
-                
+        sim_pl = self._simulate_stop_pl(df, thresholds)
+        
+        # First maximum wins, same tie-break as a strict '>' sweep
+        best = int(np.argmax(sim_pl))
+        # Rounded: arange grids give 0.7400000000000004, which the bundle and API would echo
+        best_t, best_pl = float(round(thresholds[best], 6)), sim_pl[best]
         return best_t, best_pl, (best_pl - baseline)
 
+    def _simulate_stop_pl(self, df, thresholds):
+        """
+        P/L for every threshold t if each session stops AFTER its first game with
+        tilt_prob > t. A game is played under t iff all earlier games of its session
+        had prob <= t, i.e. t >= running max of the previous probs. Sorting games by
+        that running max turns P/L(t) into a prefix sum of rating_diff + searchsorted.
+        """
+        sessions = df['session_id']
+        prob = df['tilt_prob'].fillna(-np.inf)
+        prev_max = prob.groupby(sessions).cummax().groupby(sessions).shift(1).fillna(-np.inf)
+        
+        order = np.argsort(prev_max.to_numpy(), kind='stable')
+        gate = prev_max.to_numpy()[order]
+        cum_pl = np.concatenate([[0.0], np.cumsum(df['rating_diff'].to_numpy(dtype=float)[order])])
+        return cum_pl[np.searchsorted(gate, thresholds, side='right')]
+
     def _save_summary(self, df, thresh, pl, improve):
         summary_path = Path(DEFAULT_SUMMARY)
         summary_path.parent.mkdir(parents=True, exist_ok=True)
@@ -362,21 +571,44 @@ class TiltModel:
     # ------------------------------------------------------------------
     # 5. PERSISTENCE
     # ------------------------------------------------------------------
+    def _bundle_args(self, meta_keys=None):
+        raw = self.model.get_booster().save_raw(raw_format='json')
+        meta = {k: v for k, v in self.config.items()
+                if k not in ('features', 'threshold') and (meta_keys is None or k in meta_keys)}
+        return {SECTION_XGB_JSON: raw}, self.feature_cols, self.config.get('threshold', 0.5), meta
+
     def save(self, model_path):
+        """One model bundle (api/py_tilt/model_bundle.py): booster + features + threshold + config."""
         model_path = Path(model_path)
         model_path.parent.mkdir(parents=True, exist_ok=True)
-        self.model.save_model(model_path)
-        joblib.dump(self.config, model_path.parent / "tilt_config.joblib")
+        return write_bundle(model_path, *self._bundle_args())
+
+    def to_base64(self):
+        """Model bundle as base64: the `personal_model` payload py_tilt decodes (threshold included)."""
+        import base64
+        if self.model is None: raise ValueError("Model not trained.")
+        # update_state stays server-side: payloads travel with every request
+        data = build_bundle(*self._bundle_args(meta_keys=('pl_improvement_est',)))
+        return base64.b64encode(data).decode('ascii')
 
     def load(self, model_path=DEFAULT_MODEL):
         model_path = Path(model_path)
         if not model_path.exists(): raise FileNotFoundError(f"Model not found: {model_path}")
         self.model = xgb.XGBClassifier()
-        self.model.load_model(model_path)
-        config_path = model_path.parent / "tilt_config.joblib"
-        if config_path.exists():
-            self.config = joblib.load(config_path)
-            self.feature_cols = self.config.get('features', self.feature_cols)
+        with open(model_path, 'rb') as f:
+            bundled = is_bundle(f.read(8))
+        if bundled:
+            bundle = ModelBundle.open(model_path)
+            self.model.load_model(bytearray(bundle.section(SECTION_XGB_JSON)))
+            self.config = {**bundle.meta, 'features': bundle.features, 'threshold': bundle.threshold}
+        else:
+            # Legacy pair: XGBoost model file + pickled tilt_config.joblib sidecar
+            self.model.load_model(model_path)
+            config_path = model_path.parent / "tilt_config.joblib"
+            if config_path.exists():
+                import joblib
+                self.config = joblib.load(config_path)
+        self.feature_cols = self.config.get('features', self.feature_cols)
 
 if __name__ == "__main__":
     # Example: Run pipeline on Raw JSON directly
@@ -3,6 +3,25 @@ import cookie from "cookie";
 import jwt from "jsonwebtoken";
 import { db } from "@/lib/firebaseAdmin";
 
+// Game fields read by api/py_tilt (tilt_features.INPUT_FIELDS)
+const TILT_INPUT_FIELDS = [
+  "createdAt", "lastMoveAt", "my_acpl", "my_blunder_count",
+  "my_avg_secs_per_move", "result", "rating_diff",
+];
+// Context window for window mode (tilt_features.WINDOW_GAMES), and the most
+// new games an incremental call may carry
+const TILT_WINDOW = 30;
+
+// Incremental mode: one small object per game. Absent fields are left out
+// (not null) so SessionState.update applies its defaults.
+function tiltInputs(game: Record<string, any>) {
+  const inputs: Record<string, number> = {};
+  for (const field of TILT_INPUT_FIELDS) {
+    if (game[field] != null) inputs[field] = game[field];
+  }
+  return inputs;
+}
+
 type SessionPayload = {
   lichessId: string;
   lichessUsername: string;
@@ -20,25 +39,13 @@ export default async function handler(req: NextApiRequest, res: NextApiResponse)
     const session = jwt.verify(token, sessionSecret) as SessionPayload;
     const { lichessUsername } = session;
 
-    console.log(`[/api/py_tilt] Reading recent games from Firestore for ${lichessUsername}...`);
-
-    // 1. NEW: Fetch Context Window from Firestore (Local Cache) instead of Lichess
-    // We only need the last 20-50 games for prediction
-    const gamesSnap = await db.collection("users").doc(lichessUsername).collection("games")
-      .orderBy("createdAt", "desc")
-      .limit(30) 
-      .get();
-
-    if (gamesSnap.empty) {
-      return res.status(200).json({ tilt_score: 0, note: "No games synced yet" });
-    }
-
-    // Reverse to chronological order (Oldest -> Newest) for the model
-    const recentGames = gamesSnap.docs.map(d => d.data()).reverse();
+    const userRef = db.collection("users").doc(lichessUsername);
+    const gamesRef = userRef.collection("games");
 
-    // 2. Check if user has a Personal Model trained
-    const userDoc = await db.collection("users").doc(lichessUsername).get();
+    // 1. Check if user has a Personal Model trained, and a saved session state
+    const userDoc = await userRef.get();
     const personalModel = userDoc.data()?.personalModel || null;
+    const tiltState = userDoc.data()?.tiltState || null;
 
     if (personalModel) {
       console.log("[/api/py_tilt] Using Personal Neural Model 🧠");
@@ -46,6 +53,59 @@ export default async function handler(req: NextApiRequest, res: NextApiResponse)
       console.log("[/api/py_tilt] Using Global Model 🌐");
     }
 
+    // 2. Build the request body.
+    // Incremental mode: send the saved state (the inputs of the last TILT_WINDOW
+    // games) plus only the games played since; the score is the one window mode
+    // would give. Otherwise fall back to the full context window from Firestore
+    // (Local Cache): when there is no state yet (or one saved before states
+    // carried their games), when a game in the saved window was still waiting
+    // for analysis (my_acpl etc. may have been written since, and only the window
+    // re-reads it), and when TILT_WINDOW+ games are new.
+    let requestBody: Record<string, any> | null = null;
+
+    if (tiltState?.games && tiltState.settled && tiltState.last_created_at) {
+      const newSnap = await gamesRef
+        .where("createdAt", ">", tiltState.last_created_at)
+        .orderBy("createdAt", "asc")
+        .limit(TILT_WINDOW)
+        .get();
+
+      if (!newSnap.empty && newSnap.size < TILT_WINDOW) {
+        console.log(`[/api/py_tilt] Incremental update with ${newSnap.size} new game(s) for ${lichessUsername}`);
+        requestBody = {
+          state: tiltState,
+          new_games: newSnap.docs.map(d => tiltInputs(d.data())),
+          personal_model: personalModel
+        };
+      }
+    }
+
+    if (!requestBody) {
+      console.log(`[/api/py_tilt] Reading recent games from Firestore for ${lichessUsername}...`);
+
+      // We only need the last 20-50 games for prediction
+      const gamesSnap = await gamesRef
+        .orderBy("createdAt", "desc")
+        .limit(TILT_WINDOW)
+        .get();
+
+      if (gamesSnap.empty) {
+        return res.status(200).json({ tilt_score: 0, note: "No games synced yet" });
+      }
+
+      // Reverse to chronological order (Oldest -> Newest) for the model.
+      // Only the fields the features read, one array each (api/py_tilt/columnar.py)
+      const recentGames = gamesSnap.docs.map(d => d.data()).reverse();
+      const columns: Record<string, (number | null)[]> = {};
+      for (const field of TILT_INPUT_FIELDS) {
+        columns[field] = recentGames.map(g => g[field] ?? null);
+      }
+      requestBody = {
+        columns,
+        personal_model: personalModel
+      };
+    }
+
     // 3. Call Python Microservice
     // NOTE: In local dev, this requires 'vercel dev'. 'npm run dev' cannot route to python.
     const appUrl = process.env.NEXT_PUBLIC_APP_URL || "http://localhost:3000";
@@ -54,10 +114,7 @@ export default async function handler(req: NextApiRequest, res: NextApiResponse)
     const pythonRes = await fetch(pythonUrl, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ 
-        games: recentGames,
-        personal_model: personalModel 
-      }),
+      body: JSON.stringify(requestBody),
     });
 
     if (!pythonRes.ok) {
@@ -72,17 +129,18 @@ export default async function handler(req: NextApiRequest, res: NextApiResponse)
     console.log(`[/api/py_tilt] Prediction: ${score}`);
 
     // 4. Save Result
-    await db.collection("users").doc(lichessUsername).collection("tiltResults").add({
+    await userRef.collection("tiltResults").add({
       tiltScore: score,
       createdAt: new Date().toISOString(), // ISO for charts
       reason: prediction.reason || "Analysis",
       metrics: prediction.metrics || {}
     });
 
-    // 5. Update Profile Cache
-    await db.collection("users").doc(lichessUsername).set({
+    // 5. Update Profile Cache (+ session state for the next incremental call)
+    await userRef.set({
       lastTiltScore: score,
-      lastTiltAt: new Date()
+      lastTiltAt: new Date(),
+      ...(prediction.state ? { tiltState: prediction.state } : {})
     }, { merge: true });
 
     return res.status(200).json({ 
@@ -0,0 +1,109 @@
+# scripts/bench_clock_features.py
+# Parity + throughput check for the corpus-wide clock parser (api/train/clock_features.py).
+#   python scripts/bench_clock_features.py                      # 200k games
+#   python scripts/bench_clock_features.py --games 1000000
+# 1. Think-time stats vs. a per-game regex reference (parseClockFromPgn's tag
+#    regex, diffed per side) on the first --ref-games games.
+# 2. Throughput over the whole corpus in the streaming reader's batch size.
+# 3. ETL parity: process_raw_data vs. process_raw_data_streaming on pgn and
+#    `clocks`-array exports.
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from synthetic_games import HERO_USER, GameGenerator
+from api.train.clock_features import CLOCK_FEATURE_COLS, FAST_MOVE_SECS, game_think_stats
+from api.train.game_stream import CLOCK_BATCH_GAMES
+
+CLK_RE = re.compile(r'\[%clk (\d+):(\d+):(\d+(?:\.\d+)?)\]')
+
+
+def reference_stats(game):
+    """One game at a time: regex the tags, diff the hero's own consecutive clocks."""
+    clocks = [int(h) * 3600 + int(m) * 60 + float(s) for h, m, s in CLK_RE.findall(game.get('pgn') or '')]
+    hero_white = game['players'].get('white', {}).get('user', {}).get('name') == HERO_USER
+    inc = game.get('clock', {}).get('increment', 0)
+    think = [max(clocks[k - 2] - clocks[k] + inc, 0.0)
+             for k in range(2, len(clocks)) if (k % 2 == 0) == hero_white]
+    if not think:
+        return [np.nan] * 3
+    think = np.array(think)
+    return [think.mean(), think.var(), (think < FAST_MOVE_SECS).mean()]
+
+
+def batch_stats(games):
+    hero_white = np.array([g['players'].get('white', {}).get('user', {}).get('name') == HERO_USER for g in games])
+    inc = np.array([g.get('clock', {}).get('increment', np.nan) for g in games], dtype=float)
+    return game_think_stats([g.get('pgn') for g in games], [g.get('clocks') for g in games], hero_white, inc)
+
+
+def check_reference(games):
+    t0 = time.perf_counter()
+    ref = np.array([reference_stats(g) for g in games])
+    t_ref = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    stats = batch_stats(games)
+    t_vec = time.perf_counter() - t0
+    ok = all(np.allclose(stats[col], ref[:, i], equal_nan=True) for i, col in enumerate(CLOCK_FEATURE_COLS))
+    print(f"Reference ({len(games)} games): per-game regex {t_ref:.3f}s | vectorized {t_vec:.3f}s "
+          f"({t_ref / t_vec:.1f}x) | parity {'✅' if ok else '❌'}")
+    return ok
+
+
+def check_etl(n_games, clocks):
+    from api.train.train_model_sdk import TiltModel
+
+    games = [g for b in GameGenerator(seed=3, clocks=clocks).iter_blocks(n_games) for g in b]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'games.json')
+        with open(path, 'w') as f:
+            json.dump(games, f)
+        model = TiltModel(clock_features=True)
+        full = model.process_raw_data(path)
+        streamed = model.process_raw_data_streaming(path, chunk_size=max(n_games // 7, 1))
+    ok = all(np.allclose(full[c].to_numpy(float), streamed[c].to_numpy(float), equal_nan=True)
+             for c in CLOCK_FEATURE_COLS + model.feature_cols)
+    coverage = full['my_think_mean'].notna().mean()
+    print(f"ETL parity ({clocks}, {n_games} games): {'✅' if ok else '❌'} | "
+          f"mean think {full['my_think_mean'].mean():.2f}s, clock coverage {coverage:.0%}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clock parser parity + throughput")
+    parser.add_argument('--games', type=int, default=200_000)
+    parser.add_argument('--ref-games', type=int, default=20_000)
+    args = parser.parse_args()
+
+    ok = True
+    gen = GameGenerator(seed=1, clocks='pgn')
+    parsed, seconds, tags = 0, 0.0, 0
+    for block in gen.iter_blocks(args.games, block=CLOCK_BATCH_GAMES):
+        if parsed < args.ref_games:
+            ok &= check_reference(block[:args.ref_games - parsed])
+        t0 = time.perf_counter()
+        batch_stats(block)
+        seconds += time.perf_counter() - t0
+        parsed += len(block)
+        tags += sum(g['pgn'].count('[%clk ') for g in block)
+
+    print(f"Throughput: {parsed} games / {tags} tags in {seconds:.2f}s -> "
+          f"{parsed / seconds:,.0f} games/s, {tags / seconds / 1e6:.1f}M tags/s "
+          f"(~{1e6 / (parsed / seconds):.0f}s per million games)")
+
+    for clocks in ('pgn', 'array'):
+        ok &= check_etl(5_000, clocks)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
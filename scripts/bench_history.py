@@ -0,0 +1,118 @@
+# scripts/bench_history.py
+# Whole-history backfill (index.score_history, {"history": ...} requests)
+# against one window-mode call per game.
+#   python scripts/bench_history.py [--games 3000] [--chunk 500]
+# 1. Sessions: session_bounds() cuts where training does (pandas rule).
+# 2. Parity: every game's backfill score equals window mode over its session
+#    so far (preprocess_and_predict on the session prefix).
+# 3. Time: one history request per body format (documents, columns JSON,
+#    binary columns) vs. the per-window loop.
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../api/py_tilt'))
+sys.path.append(os.path.dirname(__file__))
+os.environ['PREDICTION_CACHE_ENTRIES'] = '0'
+os.environ.setdefault('TILT_TIMING_LOGS', '0')
+
+from bench_request_format import Request, firestore_windows, to_columns
+
+import columnar
+import index
+from tilt_features import SESSION_GAP_MINUTES, read_games, session_bounds
+
+
+class ChunkedRequest(Request):
+    protocol_version = request_version = 'HTTP/1.1'
+
+
+def post_history(body, content_type, chunk_size, chunked=False):
+    """Handler response -> list of NDJSON objects (de-chunked if needed)."""
+    index.HISTORY_CHUNK_GAMES = chunk_size
+    r = (ChunkedRequest if chunked else Request)(body, content_type)
+    r._handle_post(index.NULL_TIMER)
+    raw = r.wfile.getvalue()
+    if chunked:
+        stream, body = io.BytesIO(raw), b''
+        while True:
+            size = int(stream.readline(), 16)
+            if size == 0:
+                break
+            body += stream.read(size)
+            stream.read(2)
+        raw = body
+    return [json.loads(line) for line in raw.splitlines()]
+
+
+def training_sessions(created):
+    s = pd.to_datetime(pd.Series(created), unit='ms', utc=True)
+    is_new = (s.diff() > pd.Timedelta(minutes=SESSION_GAP_MINUTES)) | s.diff().isna()
+    return (is_new.cumsum() - 1).to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History backfill vs per-window scoring")
+    parser.add_argument('--games', type=int, default=3000)
+    parser.add_argument('--chunk', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    games = [g for w in firestore_windows(-(-args.games // 30)) for g in w][:args.games]
+    games.sort(key=lambda g: g['createdAt'])
+    cols = read_games(games)
+    bounds = session_bounds(cols['created_at'])
+
+    # --- Sessions ---
+    session = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    ok_sessions = np.array_equal(session, training_sessions(cols['created_at']))
+    print(f"--- 🔍 {len(games)} games, {len(bounds) - 1} sessions; training segmentation: "
+          f"{'✅' if ok_sessions else '❌'} ---")
+
+    formats = {
+        'documents (JSON)': (json.dumps({'history': games}).encode(), 'application/json'),
+        'columns (JSON)': (json.dumps({'history': {'columns': to_columns(games)}}).encode(), 'application/json'),
+        'columns (binary)': (columnar.encode({f: np.array(v, dtype=float) for f, v in to_columns(games).items()},
+                                             {'history': True}), columnar.MEDIA_TYPE),
+    }
+
+    # --- Parity (and the per-window baseline) ---
+    lines = post_history(*formats['documents (JSON)'], args.chunk)
+    summary = lines.pop()
+    scores = np.array([s for line in lines for s in line['tilt_score']])
+    t0 = time.perf_counter()
+    expected = np.array([index.preprocess_and_predict(games[bounds[np.searchsorted(bounds, i, 'right') - 1]:i + 1])
+                         for i in range(len(games))])
+    per_window = time.perf_counter() - t0
+    ok_scores = len(scores) == summary['games'] == len(games) and np.allclose(scores, expected, atol=1e-6)
+    chunked = post_history(*formats['documents (JSON)'], args.chunk, chunked=True)
+    ok_chunked = chunked[:-1] == lines and chunked[-1] == summary
+    ok_formats = all(post_history(*f, args.chunk) == lines + [summary] for f in formats.values())
+    print(f"--- 🔍 Scores vs window mode per game: {'✅' if ok_scores else '❌'}, "
+          f"chunked transfer: {'✅' if ok_chunked else '❌'} ({len(lines)} chunks), "
+          f"body formats: {'✅' if ok_formats else '❌'} ---")
+
+    # --- Time ---
+    print(f"\n--- ⏱️  {len(games)} games (best of {args.repeat}) ---")
+    print(f"{'one window call per game':>26} | {'':>9} | {per_window * 1e3:8.1f} ms")
+    for name, (body, content_type) in formats.items():
+        best = float('inf')
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            post_history(body, content_type, args.chunk)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{'history, ' + name:>26} | {len(body) / 1024:7.0f}KB | {best * 1e3:8.1f} ms  "
+              f"({per_window / best:.0f}x)")
+
+    if not (ok_sessions and ok_scores and ok_chunked and ok_formats):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# scripts/bench_incremental_update.py
+# Full retrain vs. TiltModel.update() for a small batch of new games, across
+# history sizes. Update time should track the delta, not the history.
+#   python scripts/bench_incremental_update.py [--sizes 2000 10000 50000] [--delta 12]
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from api.train.train_model_sdk import TiltModel
+from bench_process_raw_data import make_raw_games
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental update vs full retrain")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2_000, 10_000, 50_000])
+    parser.add_argument('--delta', type=int, default=12, help='New games per update')
+    args = parser.parse_args()
+
+    print(f"{'history':>8} | {'full retrain':>12} | {'update':>8} | {'speedup':>7} | {'threshold':>9} | mode")
+    for n in args.sizes:
+        # Exports are newest-first; train on all but the last `delta` games
+        games = make_raw_games(n + args.delta)[::-1]
+        history, new = games[:n], games[n:]
+
+        model = TiltModel()
+        model.params['n_jobs'] = 1
+        model.train_games(history)
+
+        t0 = time.perf_counter()
+        TiltModel().train_games(games)
+        t_full = time.perf_counter() - t0
+
+        result = model.update(new)
+        print(f"{n:>8} | {t_full:11.3f}s | {result['seconds']:7.3f}s | {t_full / result['seconds']:6.1f}x | "
+              f"{result.get('threshold', float('nan')):9.2f} | {result['mode']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# scripts/bench_microbatch.py
+# Latency vs. throughput of the micro-batcher (api/py_tilt/micro_batch.py)
+# against one model call per request, with N concurrent requester threads.
+#   python scripts/bench_microbatch.py [--backend onnx] [--threads 1 8 32] [--waits 0 200 1000]
+# Each thread scores --calls single-row requests back to back (what server.py
+# worker threads do per window request). Reports requests/s, p50/p99 latency
+# and mean rows per model call, and checks every result against direct scoring.
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../api/py_tilt'))
+sys.path.append(os.path.dirname(__file__))
+os.environ.setdefault('TILT_EAGER_INIT', '0')
+os.environ.setdefault('TILT_TIMING_LOGS', '0')
+
+from bench_tree_backend import random_features
+
+import index
+from micro_batch import MicroBatcher
+
+
+def drive(score, rows, n_threads, calls):
+    """n_threads x calls requests; returns (requests/s, latencies, results by row index)."""
+    latencies = [[] for _ in range(n_threads)]
+    results = {}
+    barrier = threading.Barrier(n_threads + 1)
+
+    def worker(t):
+        barrier.wait()
+        lat = latencies[t]
+        for c in range(calls):
+            i = (t * calls + c) % len(rows)
+            t0 = time.perf_counter()
+            out = score(rows[i])
+            lat.append(time.perf_counter() - t0)
+            results[i] = out[0]
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    for th in threads:
+        th.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t0
+    return n_threads * calls / elapsed, np.concatenate([np.array(x) for x in latencies]), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching latency vs throughput")
+    parser.add_argument('--backend', choices=index.BACKENDS, default='onnx')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--waits', type=float, nargs='+', default=[0, 200, 1000], help="max wait (µs)")
+    parser.add_argument('--max-rows', type=int, default=64)
+    parser.add_argument('--calls', type=int, default=400, help="Requests per thread")
+    args = parser.parse_args()
+
+    index.warm(args.backend)
+    X = np.nan_to_num(random_features(2048))
+    rows = [X[i:i + 1] for i in range(len(X))]
+    expected = np.asarray(index.run_shared_model(X, args.backend))
+
+    def direct(x):
+        return index.run_shared_model(x, args.backend)
+
+    print(f"--- 📦 backend {args.backend}, max {args.max_rows} rows, {args.calls} requests/thread, "
+          f"{os.cpu_count()} CPU(s) ---")
+    print(f"{'threads':>7} | {'mode':>14} | {'req/s':>9} | {'p50':>9} | {'p99':>9} | {'rows/call':>9}")
+    ok = True
+    for n_threads in args.threads:
+        modes = [('direct', direct, None)]
+        for wait in args.waits:
+            batcher = MicroBatcher(direct, max_rows=args.max_rows, max_wait_us=wait, name=args.backend)
+            modes.append((f'batch {wait:g}µs', batcher.submit, batcher))
+        for name, score, batcher in modes:
+            drive(score, rows, n_threads, 20)   # warm-up
+            if batcher is not None:
+                batcher.batches = batcher.requests = 0
+            rps, lat, results = drive(score, rows, n_threads, args.calls)
+            fill = batcher.requests / max(batcher.batches, 1) if batcher is not None else 1.0
+            ok &= all(np.allclose(v, expected[i], atol=1e-6) for i, v in results.items())
+            print(f"{n_threads:>7} | {name:>14} | {rps:9.0f} | {np.percentile(lat, 50) * 1e6:7.0f}µs | "
+                  f"{np.percentile(lat, 99) * 1e6:7.0f}µs | {fill:9.1f}")
+
+    if not ok:
+        print("❌ Batched results differ from direct scoring")
+        sys.exit(1)
+    print("✅ Batched results match direct scoring")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# scripts/bench_ort_profile.py
+# Default InferenceSession vs. the tuned profile (api/py_tilt/ort_profile.py),
+# both on the ONNX graph in model.bundle.
+#   python scripts/bench_ort_profile.py [--repeat 7] [--calls 2000]
+# 1. Session creation: default options / profile with online optimization /
+#    profile on the pre-optimized graph.
+# 2. Per-call latency at request-sized batches: the old handler call
+#    (session.run(None, {get_inputs()[0].name: X})[1]) vs. OrtRunner with the
+#    profile as shipped and with IOBinding switched on.
+# 3. Parity: every runner returns the default session's probabilities.
+# When the bundle's pre-optimized graph came from another onnxruntime version,
+# it is re-optimized in memory so step 1 still measures that path.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../api/py_tilt'))
+sys.path.append(os.path.dirname(__file__))
+
+from bench_tree_backend import MODEL_BUNDLE, best_of, random_features
+from model_bundle import SECTION_ONNX, SECTION_ONNX_OPTIMIZED, ModelBundle
+from ort_profile import InferenceProfile, OrtRunner, optimize_graph
+
+BATCHES = (1, 30, 256)
+ATOL = 1e-6
+
+
+def per_call(fns, calls, repeat):
+    """Best per-call time of each fn; runs are interleaved so drift hits all alike."""
+    best = [float('inf')] * len(fns)
+    for _ in range(repeat):
+        for i, fn in enumerate(fns):
+            t0 = time.perf_counter()
+            for _ in range(calls):
+                fn()
+            best[i] = min(best[i], (time.perf_counter() - t0) / calls)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime profile: session creation + per-call latency")
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    import onnxruntime as ort
+
+    bundle = ModelBundle.open(MODEL_BUNDLE)
+    graph = bytes(bundle.section(SECTION_ONNX))
+    info = bundle.meta.get('ort_optimized') or {}
+    if SECTION_ONNX_OPTIMIZED in bundle and info.get('ort_version') == ort.__version__:
+        optimized, source = bytes(bundle.section(SECTION_ONNX_OPTIMIZED)), 'bundle'
+    else:
+        optimized, info = optimize_graph(graph)
+        source = f"re-optimized here (bundle has {bundle.meta.get('ort_optimized', {}).get('ort_version', 'none')})"
+    profile = InferenceProfile()
+
+    print(f"--- ⚙️  onnxruntime {ort.__version__}, {os.cpu_count()} CPU(s), profile {profile.as_dict()} ---")
+    print(f"Pre-optimized graph: {source}, level {info['level']}")
+
+    # --- Session creation ---
+    creation = {
+        'default InferenceSession': lambda: ort.InferenceSession(graph),
+        'profile, online optimization': lambda: OrtRunner(graph, profile),
+        'profile, pre-optimized graph': lambda: OrtRunner(optimized, profile, preoptimized=True),
+    }
+    print(f"\n--- ❄️  Session creation (best of {args.repeat}) ---")
+    base = None
+    for name, fn in creation.items():
+        fn()   # first construction pays one-off runtime init
+        t = best_of(fn, args.repeat)
+        base = base or t
+        print(f"{name:<30}: {t * 1000:7.2f} ms  ({(1 - t / base) * 100:+5.1f}% saved)")
+
+    # --- Per-call latency ---
+    session = ort.InferenceSession(graph)
+    runners = {
+        'default run(None, ...)': lambda X: session.run(None, {session.get_inputs()[0].name: X})[1],
+        'runner (profile)': OrtRunner(optimized, profile, preoptimized=True).run,
+        'runner + IOBinding': OrtRunner(optimized, InferenceProfile(io_binding=True), preoptimized=True).run,
+    }
+    X_all = random_features(max(BATCHES))
+    X_all = np.nan_to_num(X_all)   # ORT vs. ORT: NaN handling is not what is being compared
+
+    print(f"\n--- ⏱️  Per call (best of {args.repeat} x {args.calls} calls) ---")
+    print(f"{'batch':>7} | " + " | ".join(f"{name:>24}" for name in runners))
+    ok = True
+    for n in BATCHES:
+        X = np.ascontiguousarray(X_all[:n])
+        expected = runners['default run(None, ...)'](X)
+        ok &= all(np.allclose(run(X), expected, atol=ATOL) for run in runners.values())
+        times = per_call([lambda run=run: run(X) for run in runners.values()],
+                         max(args.calls // n, 50), args.repeat)
+        cells = [f"{t * 1e6:9.1f}µs ({(1 - t / times[0]) * 100:+5.1f}%)" for t in times]
+        print(f"{n:>7} | " + " | ".join(f"{c:>24}" for c in cells))
+
+    if not ok:
+        print("\n❌ Parity check failed")
+        sys.exit(1)
+    print("\n✅ Parity OK (every runner matches the default session)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# scripts/bench_process_raw_data.py
+# Parity + scaling benchmark for TiltModel.process_raw_data (training ETL).
+#   python scripts/bench_process_raw_data.py                   # 1k .. 100k games
+#   python scripts/bench_process_raw_data.py --max 1000000     # up to 1M games
+# Parity is checked against the pre-vectorization implementation (kept below
+# as the reference) on sizes up to --legacy-max, since it is quadratic.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pytz
+
+# Fix path to import the SDK as a package (api.train.train_model_sdk)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from api.train.train_model_sdk import TiltModel, HERO_USER, SESSION_GAP_MINUTES
+
+FEATURES_AND_TARGET = TiltModel().feature_cols + ['session_id', 'rating_diff', 'target']
+
+
+def make_raw_games(n_games, seed=42):
+    """Lichess-export-shaped games for HERO_USER with realistic sessions and gaps."""
+    rng = np.random.default_rng(seed)
+    # 2-15 min between games, ~1 in 6 followed by a long break (new session)
+    gaps = rng.integers(2 * 60_000, 15 * 60_000, n_games)
+    gaps[rng.random(n_games) < 1 / 6] += rng.integers(SESSION_GAP_MINUTES * 60_000, 3 * 86_400_000)
+    created = 1_672_531_200_000 + np.cumsum(gaps)
+    duration = rng.integers(60_000, 900_000, n_games)
+    plies = rng.integers(0, 120, n_games)
+    hero_white = rng.random(n_games) < 0.5
+    winner = rng.choice(['white', 'black', None], n_games, p=[0.47, 0.47, 0.06])
+    acpl = rng.gamma(2.0, 25.0, n_games).round()
+    blunders = rng.poisson(1.0, n_games)
+    analysed = rng.random(n_games) < 0.9
+    rating_diff = rng.integers(-9, 10, n_games)
+
+    games = []
+    for i in range(n_games):
+        hero = {"user": {"name": HERO_USER}, "ratingDiff": int(rating_diff[i])}
+        villain = {"user": {"name": "villain"}, "ratingDiff": int(-rating_diff[i])}
+        if analysed[i]:
+            hero["analysis"] = {"acpl": int(acpl[i]), "blunder": int(blunders[i])}
+            villain["analysis"] = {"acpl": int(acpl[-i]), "blunder": int(blunders[-i])}
+        game = {
+            "createdAt": int(created[i]),
+            "lastMoveAt": int(created[i] + duration[i]),
+            "players": {"white": hero, "black": villain} if hero_white[i] else {"white": villain, "black": hero},
+            "moves": " ".join(["e4"] * int(plies[i])),
+        }
+        if winner[i] is not None:
+            game["winner"] = winner[i]
+        games.append(game)
+    # Exports are newest-first
+    return games[::-1]
+
+
+def legacy_time_of_day(hour):
+    """TiltModel._assign_time_of_day as it was (local hour -> bucket)."""
+    if 5 <= hour < 9: return 'morning'
+    elif 9 <= hour < 18: return 'midday'
+    elif 18 <= hour < 23: return 'evening'
+    else: return 'night'
+
+
+def legacy_process_raw_data(model, json_path):
+    """process_raw_data as it was before vectorization (reference for parity)."""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    df = pd.json_normalize(data, sep='_')
+    df['user_color'] = np.where(df['players_white_user_name'] == HERO_USER, 'white', 'black')
+    df['my_acpl'] = np.where(df['user_color'] == 'white',
+                             df.get('players_white_analysis_acpl', np.nan),
+                             df.get('players_black_analysis_acpl', np.nan))
+    df['my_blunder_count'] = np.where(df['user_color'] == 'white',
+                                      df.get('players_white_analysis_blunder', np.nan),
+                                      df.get('players_black_analysis_blunder', np.nan))
+    w_diff = df.get('players_white_ratingDiff', 0).fillna(0)
+    b_diff = df.get('players_black_ratingDiff', 0).fillna(0)
+    df['rating_diff'] = np.where(df['user_color'] == 'white', w_diff, b_diff)
+    conditions = [df['winner'] == df['user_color'], df['winner'].isna()]
+    df['result'] = np.select(conditions, [1.0, 0.5], default=0.0)
+    df['created_at'] = pd.to_datetime(df['createdAt'], unit='ms', utc=True)
+    df['last_move_at'] = pd.to_datetime(df['lastMoveAt'], unit='ms', utc=True)
+    df['game_duration_sec'] = (df['last_move_at'] - df['created_at']).dt.total_seconds()
+    df['moves_list'] = df['moves'].fillna("").apply(lambda x: x.split(" "))
+    df['move_count'] = df['moves_list'].apply(lambda x: len(x) // 2)
+    df['my_avg_secs_per_move'] = df['game_duration_sec'] / df['move_count'].replace(0, 1)
+    df = df.sort_values('created_at').reset_index(drop=True)
+    df['time_diff'] = df['created_at'].diff()
+    df['is_new_session'] = (df['time_diff'] > pd.Timedelta(minutes=SESSION_GAP_MINUTES)) | (df['time_diff'].isna())
+    df['session_id'] = df['is_new_session'].cumsum()
+    grp = df.groupby('session_id')
+    df['games_played'] = grp.cumcount() + 1
+    df['session_pl'] = grp['rating_diff'].cumsum()
+    df['session_cum_pl'] = df['session_pl']
+    first_speed = grp['my_avg_secs_per_move'].transform('first')
+    df['speed_vs_start'] = df['my_avg_secs_per_move'] / (first_speed + 0.001)
+    df['is_loss'] = (df['result'] == 0.0).astype(int)
+    streak_group = (df['is_loss'] == 0).cumsum()
+    df['loss_streak'] = df.groupby(streak_group).cumcount()
+    df.loc[df['is_loss'] == 0, 'loss_streak'] = 0
+    acpl_safe = df['my_acpl'].fillna(0)
+    df['roll_5_acpl_mean'] = grp['my_acpl'].transform(lambda x: acpl_safe.rolling(5).mean())
+    df['roll_5_time_per_move'] = grp['my_avg_secs_per_move'].transform(lambda x: x.rolling(5).mean())
+    df[['roll_5_acpl_mean', 'roll_5_time_per_move']] = df[['roll_5_acpl_mean', 'roll_5_time_per_move']].fillna(0)
+    df['prev_game_end'] = grp['last_move_at'].shift(1)
+    df['break_time'] = (df['created_at'] - df['prev_game_end']).dt.total_seconds()
+    df['break_time'] = df['break_time'].fillna(0.0).clip(lower=0)
+    df['log_break_time'] = np.log1p(df['break_time'])
+    try:
+        local_time = df['created_at'].dt.tz_convert(pytz.timezone(model.local_tz))
+    except Exception:
+        local_time = df['created_at']
+    df['time_of_day_label'] = local_time.dt.hour.apply(legacy_time_of_day)
+    tod_dummies = pd.get_dummies(df['time_of_day_label'], prefix='tod', dtype=int)
+    for tod in ['morning', 'midday', 'evening', 'night']:
+        if f'tod_{tod}' not in tod_dummies.columns:
+            tod_dummies[f'tod_{tod}'] = 0
+    df = pd.concat([df, tod_dummies], axis=1)
+    df_clean = df.dropna(subset=['my_acpl', 'my_blunder_count']).copy()
+    session_max = df_clean.groupby('session_id')['session_cum_pl'].transform('max')
+    df_clean['is_max'] = (df_clean['session_cum_pl'] == session_max)
+    target_indices = df_clean[df_clean['is_max']].groupby('session_id')['games_played'].idxmin()
+    df_clean['target'] = 0
+    df_clean.loc[target_indices, 'target'] = 1
+    return df_clean
+
+
+def write_games(n_games, tmp_dir):
+    path = os.path.join(tmp_dir, f"games_{n_games}.json")
+    with open(path, 'w') as f:
+        json.dump(make_raw_games(n_games), f)
+    return path
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="process_raw_data parity + scaling benchmark")
+    parser.add_argument('--max', type=int, default=100_000, help='Largest corpus size')
+    parser.add_argument('--legacy-max', type=int, default=20_000, help='Largest size run through the legacy ETL')
+    args = parser.parse_args()
+
+    sizes = [n for n in (1_000, 10_000, 20_000, 100_000, 300_000, 1_000_000) if n <= args.max]
+    model = TiltModel()
+    ok = True
+
+    print(f"{'games':>9} | {'vectorized':>10} | {'legacy':>10} | {'games/s':>10} | parity")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in sizes:
+            path = write_games(n, tmp_dir)
+            new_df, t_new = timed(model.process_raw_data, path)
+
+            legacy_col, parity = "-", "-"
+            if n <= args.legacy_max:
+                old_df, t_old = timed(legacy_process_raw_data, model, path)
+                legacy_col = f"{t_old:9.2f}s"
+                same_rows = new_df.index.equals(old_df.index)
+                same_values = same_rows and all(
+                    np.allclose(new_df[c].to_numpy(float), old_df[c].to_numpy(float), rtol=1e-12, atol=1e-9, equal_nan=True)
+                    for c in FEATURES_AND_TARGET
+                )
+                parity = "✅" if same_values else "❌"
+                ok &= same_values
+
+            print(f"{n:>9} | {t_new:9.2f}s | {legacy_col:>10} | {n / t_new:>10.0f} | {parity}")
+            os.remove(path)
+
+    if not ok:
+        print("❌ Vectorized ETL diverges from the legacy implementation")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
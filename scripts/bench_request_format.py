@@ -0,0 +1,104 @@
+# scripts/bench_request_format.py
+# Request formats for /api/py_tilt (api/py_tilt/columnar.py): whole game
+# documents (JSON) vs. columnar JSON vs. binary columns.
+#   python scripts/bench_request_format.py [--windows 200] [--repeat 5]
+# 1. Parity: all three return the same score and seeded state per window.
+# 2. Body size and handler time per request (do_POST without a socket,
+#    prediction cache off).
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../api/py_tilt'))
+sys.path.append(os.path.dirname(__file__))
+os.environ['PREDICTION_CACHE_ENTRIES'] = '0'
+os.environ.setdefault('TILT_TIMING_LOGS', '0')
+
+from synthetic_games import generate_user_games
+
+import columnar
+import index
+from tilt_features import INPUT_FIELDS
+
+WINDOW = 30
+
+
+class Request(index.handler):
+    # Drives do_POST without a socket
+    def __init__(self, body, content_type='application/json'):
+        self.rfile, self.wfile = io.BytesIO(body), io.BytesIO()
+        self.headers = {'content-length': str(len(body)), 'content-type': content_type}
+    def send_response(self, code): pass
+    def send_header(self, *args): pass
+    def end_headers(self): pass
+    def log_message(self, *args): pass
+
+
+def firestore_windows(n_windows, seed=5):
+    """Game documents as tilt.ts sends them: Lichess fields + the processed my_* fields."""
+    rng = np.random.default_rng(seed)
+    games = generate_user_games(n_windows * WINDOW, seed=seed, newest_first=False)
+    for g in games:
+        g.update(my_acpl=int(rng.integers(5, 120)), my_blunder_count=int(rng.integers(0, 5)),
+                 my_avg_secs_per_move=round(float(rng.uniform(1, 40)), 2),
+                 result=float(rng.choice([0.0, 0.5, 1.0])), rating_diff=int(rng.integers(-12, 12)))
+        if rng.random() < 0.05:
+            del g['my_acpl']   # not analysed yet: default
+    return [games[i * WINDOW:(i + 1) * WINDOW] for i in range(n_windows)]
+
+
+def to_columns(games):
+    return {f: [g.get(f) for g in games] for f in INPUT_FIELDS}
+
+
+def post(body, content_type):
+    r = Request(body, content_type)
+    r.do_POST()
+    return r.wfile.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request format size + latency")
+    parser.add_argument('--windows', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    windows = firestore_windows(args.windows)
+    formats = {
+        'documents (JSON)': ('application/json', [json.dumps({'games': w}).encode() for w in windows]),
+        'columns (JSON)': ('application/json', [json.dumps({'columns': to_columns(w)}).encode() for w in windows]),
+        'columns (binary)': (columnar.MEDIA_TYPE,
+                             [columnar.encode({f: np.array(v, dtype=float) for f, v in to_columns(w).items()})
+                              for w in windows]),
+    }
+
+    # --- Parity ---
+    responses = {name: [json.loads(post(b, ct)) for b in bodies] for name, (ct, bodies) in formats.items()}
+    reference = responses['documents (JSON)']
+    ok = all(r == reference for r in responses.values())
+    print(f"--- 🔍 Parity ({args.windows} windows of {WINDOW} games): {'✅' if ok else '❌'} ---")
+
+    # --- Size + latency ---
+    print(f"\n--- ⏱️  Per request (best of {args.repeat}) ---")
+    print(f"{'format':>18} | {'body':>9} | {'handler':>9}")
+    for name, (ct, bodies) in formats.items():
+        best = float('inf')
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            for b in bodies:
+                post(b, ct)
+            best = min(best, time.perf_counter() - t0)
+        size = sum(len(b) for b in bodies) / len(bodies)
+        print(f"{name:>18} | {size / 1024:7.1f}KB | {best / len(bodies) * 1e6:7.0f}µs")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# scripts/bench_server.py
+# Throughput of the pre-forked server (api/py_tilt/server.py) vs. worker count,
+# over keep-alive connections, plus how much model memory the workers share.
+#   python scripts/bench_server.py [--workers 1 2 4] [--clients 8] [--requests 300]
+# For each worker count: start the server, time until it answers, then every
+# client process sends --requests window requests on one connection. The
+# prediction cache is off so every request is scored. Per worker, RSS vs. PSS
+# (/proc/<pid>/smaps_rollup) shows the pages still shared with the master.
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from synthetic_games import generate_user_games
+
+SERVER = os.path.join(os.path.dirname(__file__), '../api/py_tilt/server.py')
+WINDOW = 30
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('OPTIONS', '/')
+            conn.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def client(args):
+    port, bodies, n = args
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    for i in range(n):
+        conn.request('POST', '/api/py_tilt', bodies[i % len(bodies)], {'Content-Type': 'application/json'})
+        res = conn.getresponse()
+        res.read()
+        if res.status != 200:
+            return i
+    return n
+
+
+def memory_kb(pid):
+    out = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss'):
+                    out[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return out
+
+
+def worker_pids(master_pid):
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def run(n_workers, clients, requests, bodies):
+    port = free_port()
+    env = dict(os.environ, PREDICTION_CACHE_ENTRIES='0', TILT_TIMING_LOGS='0')
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, SERVER, '--host', '127.0.0.1', '--port', str(port),
+                             '--workers', str(n_workers)], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_ready(port):
+            raise RuntimeError("server did not come up")
+        t_ready = time.perf_counter() - t0
+
+        with multiprocessing.Pool(clients) as pool:
+            pool.map(client, [(port, bodies, 5)] * clients)   # warm connections + workers
+            t0 = time.perf_counter()
+            done = sum(pool.map(client, [(port, bodies, requests)] * clients))
+            elapsed = time.perf_counter() - t0
+
+        mem = [memory_kb(pid) for pid in worker_pids(proc.pid)]
+        rss = sum(m.get('Rss', 0) for m in mem) / max(len(mem), 1) / 1024
+        pss = sum(m.get('Pss', 0) for m in mem) / max(len(mem), 1) / 1024
+        print(f"{n_workers:>7} | {t_ready:7.2f}s | {done / elapsed:9.0f} req/s | "
+              f"{elapsed / done * 1000 * clients:7.2f}ms | {rss:6.1f}MB | {pss:6.1f}MB")
+        return done == clients * requests
+    finally:
+        proc.terminate()
+        proc.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-forked server throughput")
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=300, help="Requests per client")
+    args = parser.parse_args()
+
+    games = generate_user_games(WINDOW * 20, seed=11, newest_first=False)
+    bodies = [json.dumps({'games': games[i:i + WINDOW]}) for i in range(0, len(games), WINDOW)]
+
+    print(f"--- 🌐 {args.clients} keep-alive clients x {args.requests} requests, {os.cpu_count()} CPU(s) ---")
+    print(f"{'workers':>7} | {'ready':>8} | {'throughput':>15} | {'latency':>9} | {'RSS/wk':>8} | {'PSS/wk':>8}")
+    ok = all([run(n, args.clients, args.requests, bodies) for n in args.workers])
+    if not ok:
+        print("❌ Some requests failed")
+        sys.exit(1)
+    print("✅ All requests answered")
+
+
+if __name__ == "__main__":
+    main()
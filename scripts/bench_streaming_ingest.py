@@ -0,0 +1,112 @@
+# scripts/bench_streaming_ingest.py
+# Parity + peak-memory check for the streaming training ETL.
+#   python scripts/bench_streaming_ingest.py                  # 10k .. 100k games
+#   python scripts/bench_streaming_ingest.py --max 1000000
+# Each ETL runs in a fresh subprocess so peak RSS (VmHWM) is per run; the
+# streaming side keeps only train_cols, as TiltModel.train() does.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from bench_process_raw_data import make_raw_games, FEATURES_AND_TARGET
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Runs one ETL in a child process, pickles the result, prints peak RSS in KiB.
+# VmHWM resets on exec; ru_maxrss would inherit the parent's peak.
+CHILD = """
+import resource, sys, time
+sys.path.append({root!r})
+from api.train.train_model_sdk import TiltModel
+model = TiltModel()
+t0 = time.perf_counter()
+if {mode!r} == 'stream':
+    df = model.process_raw_data_streaming({path!r}, {chunk}, columns=model.train_cols)
+else:
+    df = model.process_raw_data({path!r})
+elapsed = time.perf_counter() - t0
+df.to_pickle({out!r})
+try:
+    with open('/proc/self/status') as f:
+        peak = next(int(l.split()[1]) for l in f if l.startswith('VmHWM'))
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print('RESULT', elapsed, peak)
+"""
+
+
+def write_export(n_games, path, ndjson):
+    games = make_raw_games(n_games)
+    with open(path, 'w') as f:
+        if ndjson:
+            for g in games:
+                f.write(json.dumps(g) + "\n")
+        else:
+            json.dump(games, f)
+
+
+def run_etl(mode, path, out, chunk):
+    code = CHILD.format(root=ROOT, mode=mode, path=path, out=out, chunk=chunk)
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode} ETL failed:\n{proc.stderr[-2000:]}")
+    line = next(l for l in proc.stdout.splitlines() if l.startswith('RESULT'))
+    _, elapsed, maxrss = line.split()
+    return float(elapsed), int(maxrss) / 1024.0
+
+
+def same_frames(a, b):
+    return a.index.equals(b.index) and all(
+        np.allclose(a[c].to_numpy(float), b[c].to_numpy(float), rtol=1e-12, atol=1e-9, equal_nan=True)
+        for c in FEATURES_AND_TARGET
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming ETL parity + peak RSS benchmark")
+    parser.add_argument('--max', type=int, default=100_000, help='Largest corpus size')
+    parser.add_argument('--chunk', type=int, default=20_000, help='Games per streamed chunk')
+    args = parser.parse_args()
+
+    sizes = [n for n in (10_000, 30_000, 100_000, 300_000, 1_000_000) if n <= args.max]
+    ok = True
+
+    print(f"{'games':>9} | {'format':>6} | {'file MB':>8} | {'in-memory':>17} | {'streaming':>17} | parity")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in sizes:
+            for fmt in ('json', 'ndjson'):
+                path = os.path.join(tmp_dir, f"games_{n}.{fmt}")
+                write_export(n, path, ndjson=(fmt == 'ndjson'))
+                size_mb = os.path.getsize(path) / 1e6
+
+                ref_out, new_out = os.path.join(tmp_dir, 'ref.pkl'), os.path.join(tmp_dir, 'new.pkl')
+                # The in-memory ETL only understands JSON arrays
+                if fmt == 'json':
+                    t_ref, rss_ref = run_etl('memory', path, ref_out, args.chunk)
+                    ref_col = f"{t_ref:6.2f}s {rss_ref:6.0f}MB"
+                else:
+                    ref_col = "-"
+                t_new, rss_new = run_etl('stream', path, new_out, args.chunk)
+
+                parity = same_frames(pd.read_pickle(new_out), pd.read_pickle(ref_out))
+                ok &= parity
+                print(f"{n:>9} | {fmt:>6} | {size_mb:8.1f} | {ref_col:>17} | "
+                      f"{t_new:6.2f}s {rss_new:6.0f}MB | {'✅' if parity else '❌'}")
+                os.remove(path)
+
+    if not ok:
+        print("❌ Streaming ETL diverges from process_raw_data")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
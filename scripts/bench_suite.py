@@ -0,0 +1,292 @@
+# scripts/bench_suite.py
+# Benchmark suite for the tilt pipeline on a seeded synthetic corpus
+# (scripts/synthetic_games.py). Each case runs in a fresh interpreter and
+# reports time (median/best of --repeat), throughput and peak RSS of the
+# timed section; results can be saved as a JSON baseline and compared.
+#   python scripts/bench_suite.py                                  # quick scale, print only
+#   python scripts/bench_suite.py --save-baseline bench.json
+#   python scripts/bench_suite.py --compare bench.json [--time-tol 0.25 --mem-tol 0.25]
+#   python scripts/bench_suite.py --scale full --cases etl_streaming train
+# Exit code 1 when --compare finds a regression.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+PY_TILT_DIR = os.path.join(ROOT, 'api/py_tilt')
+
+SCALES = {
+    # corpus games, windows for the per-request cases
+    'quick': {'games': 20_000, 'windows': 200},
+    'full': {'games': 200_000, 'windows': 2_000},
+    'huge': {'games': 2_000_000, 'windows': 5_000},
+}
+WINDOW = 30   # games per /api/py_tilt request (see pages/api/tilt.ts)
+SEED = 7
+
+
+# --- Corpus (built once per run, shared by every case) ---
+def build_corpus(out_dir, n_games, n_windows):
+    from synthetic_games import GameGenerator, generate_user_games
+
+    # JSON array export, streamed block by block
+    path = os.path.join(out_dir, 'games.json')
+    with open(path, 'w') as f:
+        f.write('[')
+        sep = ''
+        for block in GameGenerator(seed=SEED, clocks='array').iter_blocks(n_games):
+            for g in block:
+                f.write(sep)
+                f.write(json.dumps(g, separators=(',', ':')))
+                sep = ','
+        f.write(']')
+    with open(os.path.join(out_dir, 'corpus.json'), 'w') as f:
+        json.dump({'games': n_games, 'windows': n_windows, 'seed': SEED}, f)
+
+    # Request-sized windows: consecutive games, oldest first
+    games = generate_user_games(n_windows * WINDOW, seed=SEED + 1, newest_first=False)
+    with open(os.path.join(out_dir, 'windows.json'), 'w') as f:
+        json.dump([games[i * WINDOW:(i + 1) * WINDOW] for i in range(n_windows)], f)
+    return path
+
+
+# --- Peak RSS of the timed section (Linux: VmHWM, reset via clear_refs) ---
+def _status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(l.split()[1]) for l in f if l.startswith(field))
+    except (OSError, StopIteration):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _reset_peak():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+# --- Cases: setup(corpus_dir) -> (op, items per op, unit) ---
+def _train_sdk():
+    sys.path.insert(0, ROOT)
+    import api.train.train_model_sdk as sdk
+    return sdk
+
+def _corpus_games(corpus_dir):
+    with open(os.path.join(corpus_dir, 'corpus.json')) as f:
+        return json.load(f)['games']
+
+def _windows(corpus_dir):
+    with open(os.path.join(corpus_dir, 'windows.json')) as f:
+        return json.load(f)
+
+def _processed_frame(corpus_dir):
+    sdk = _train_sdk()
+    model = sdk.TiltModel()
+    df = model.process_raw_data_streaming(os.path.join(corpus_dir, 'games.json'), columns=model.train_cols)
+    return sdk, model, df
+
+
+def case_etl_process_raw_data(corpus_dir):
+    model = _train_sdk().TiltModel()
+    path = os.path.join(corpus_dir, 'games.json')
+    return (lambda: model.process_raw_data(path)), _corpus_games(corpus_dir), 'games'
+
+
+def case_etl_streaming(corpus_dir):
+    model = _train_sdk().TiltModel()
+    path = os.path.join(corpus_dir, 'games.json')
+    return (lambda: model.process_raw_data_streaming(path, columns=model.train_cols)), _corpus_games(corpus_dir), 'games'
+
+
+def case_enrich_json(corpus_dir):
+    sys.path.insert(0, PY_TILT_DIR)
+    from tilt_model_sdk import TiltModel
+    model, windows = TiltModel(), _windows(corpus_dir)
+    return (lambda: [model._enrich_json(w) for w in windows]), len(windows), 'windows'
+
+
+def case_optimize_threshold(corpus_dir):
+    import numpy as np
+    _, model, df = _processed_frame(corpus_dir)
+    df['tilt_prob'] = np.random.default_rng(SEED).random(len(df))
+    return (lambda: model._optimize_threshold(df)), len(df), 'rows'
+
+
+def case_train(corpus_dir):
+    _, model, df = _processed_frame(corpus_dir)
+    return (lambda: model.fit_frame(df.copy())), len(df), 'rows'
+
+
+def case_onnx_inference(corpus_dir):
+    os.environ['TILT_BACKEND'] = 'onnx'
+    sys.path.insert(0, PY_TILT_DIR)
+    import index
+    from tilt_features import build_features
+    X = [build_features(w) for w in _windows(corpus_dir)]
+    return (lambda: [index.run_model(x) for x in X]), len(X), 'windows'
+
+
+def _handler_requests(corpus_dir, cache_entries):
+    import io
+    os.environ['PREDICTION_CACHE_ENTRIES'] = str(cache_entries)
+    os.environ.pop('PREDICTION_CACHE_DIR', None)
+    sys.path.insert(0, PY_TILT_DIR)
+    import index
+
+    class Request(index.handler):
+        # Drives do_POST without a socket
+        def __init__(self, body):
+            self.rfile, self.wfile = io.BytesIO(body), io.BytesIO()
+            self.headers = {'content-length': str(len(body))}
+        def send_response(self, code): pass
+        def send_header(self, *args): pass
+        def end_headers(self): pass
+        def log_message(self, *args): pass
+
+    bodies = [json.dumps({'games': w}).encode() for w in _windows(corpus_dir)]
+    return Request, bodies
+
+
+def case_handler_do_POST(corpus_dir):
+    # Every repeat re-scores: the prediction cache is off
+    Request, bodies = _handler_requests(corpus_dir, 0)
+    return (lambda: [Request(b).do_POST() for b in bodies]), len(bodies), 'requests'
+
+
+def case_handler_cached(corpus_dir):
+    # Unchanged windows: primed once, then every request is a cache hit
+    Request, bodies = _handler_requests(corpus_dir, 1_000_000)
+    for b in bodies:
+        Request(b).do_POST()
+    return (lambda: [Request(b).do_POST() for b in bodies]), len(bodies), 'requests'
+
+
+CASES = {name[len('case_'):]: fn for name, fn in globals().items() if name.startswith('case_')}
+
+
+def run_child(case, corpus_dir, repeat):
+    """Runs inside the child interpreter; prints one JSON result line."""
+    import contextlib
+    with contextlib.redirect_stdout(sys.stderr):   # keep SDK prints off the result channel
+        op, items, unit = CASES[case](corpus_dir)
+        op()   # warm-up (imports, lazy init, caches)
+        times = []
+        rss_before = _status_kb('VmRSS')
+        _reset_peak()
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            op()
+            times.append(time.perf_counter() - t0)
+        peak = _status_kb('VmHWM')
+    times.sort()
+    median = times[len(times) // 2]
+    print(json.dumps({
+        'seconds': median,
+        'best': times[0],
+        'items': items,
+        'unit': unit,
+        'throughput': items / median,
+        'peak_mb': peak / 1024.0,
+        'peak_delta_mb': max(peak - rss_before, 0) / 1024.0,
+    }))
+
+
+def run_case(case, corpus_dir, repeat):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', case,
+                           '--corpus', corpus_dir, '--repeat', str(repeat)],
+                          capture_output=True, text=True, cwd=HERE)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, time_tol, mem_tol):
+    """Regression messages vs. a saved baseline (cases missing on either side are skipped)."""
+    issues = []
+    for case, r in results.items():
+        b = baseline.get('cases', {}).get(case)
+        if not b or 'error' in r or 'error' in b:
+            continue
+        if r['seconds'] > b['seconds'] * (1 + time_tol):
+            issues.append(f"{case}: {r['seconds']:.4f}s vs {b['seconds']:.4f}s (+{r['seconds'] / b['seconds'] - 1:.0%})")
+        # Small absolute slack: peak deltas of a few MB are noise
+        if r['peak_delta_mb'] > b['peak_delta_mb'] * (1 + mem_tol) + 8:
+            issues.append(f"{case}: peak +{r['peak_delta_mb']:.0f} MB vs +{b['peak_delta_mb']:.0f} MB")
+    return issues
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tilt pipeline benchmark suite")
+    parser.add_argument('--scale', choices=SCALES, default='quick')
+    parser.add_argument('--games', type=int, help='Override the corpus size')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--time-tol', type=float, default=0.25)
+    parser.add_argument('--mem-tol', type=float, default=0.25)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--corpus', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.corpus, args.repeat)
+        return
+
+    scale = dict(SCALES[args.scale])
+    if args.games:
+        scale['games'] = args.games
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='tilt_bench_') as corpus_dir:
+        t0 = time.perf_counter()
+        build_corpus(corpus_dir, scale['games'], scale['windows'])
+        print(f"--- 🧪 Corpus: {scale['games']} games + {scale['windows']} x {WINDOW}-game windows "
+              f"(seed {SEED}, {time.perf_counter() - t0:.1f}s) ---")
+        print(f"{'case':<22} | {'median':>9} | {'best':>9} | {'throughput':>18} | {'peak Δ':>8} | {'peak':>8}")
+        for case in args.cases:
+            r = results[case] = run_case(case, corpus_dir, args.repeat)
+            if 'error' in r:
+                print(f"{case:<22} | ❌ {r['error']}")
+                continue
+            print(f"{case:<22} | {r['seconds']:8.4f}s | {r['best']:8.4f}s | "
+                  f"{r['throughput']:>10.0f} {r['unit'] + '/s':<7} | {r['peak_delta_mb']:6.0f}MB | {r['peak_mb']:6.0f}MB")
+
+    report = {
+        'meta': {
+            'scale': args.scale, 'games': scale['games'], 'windows': scale['windows'], 'seed': SEED,
+            'repeat': args.repeat, 'python': platform.python_version(), 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'cases': results,
+    }
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('games') != scale['games']:
+            print(f"⚠️ Baseline corpus is {baseline['meta'].get('games')} games, this run {scale['games']}")
+        issues = compare(results, baseline, args.time_tol, args.mem_tol)
+        if issues:
+            print("\n❌ Regressions vs baseline:")
+            for issue in issues:
+                print(f"   {issue}")
+            sys.exit(1)
+        print("\n✅ No regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# scripts/bench_train_scheduler.py
+# Throughput of the personal-model TrainingScheduler vs. training users one by one.
+#   python scripts/bench_train_scheduler.py [--users 16] [--games 300] [--workers 1 2 4]
+# Every other user also sends a second (newer) request while the first is
+# still queued, which the scheduler should fold into one training.
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from api.train.scheduler import TrainingScheduler, train_user
+from bench_process_raw_data import make_raw_games
+
+
+def run_sequential(batches):
+    t0 = time.perf_counter()
+    for user_id, games in batches:
+        train_user(user_id, games)
+    return time.perf_counter() - t0
+
+
+def run_scheduler(batches, workers):
+    scheduler = TrainingScheduler(max_workers=workers)
+    # Warm the pool so worker spawn/import cost is reported separately
+    t0 = time.perf_counter()
+    scheduler.submit('__warmup__', batches[0][1]).result()
+    warmup = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    waiters = [scheduler.submit(user_id, games) for user_id, games in batches]
+    # Newer requests for every other user
+    waiters += [scheduler.submit(user_id, games) for user_id, games in batches[::2]]
+    results = [w.result() for w in waiters]
+    elapsed = time.perf_counter() - t0
+
+    stats = scheduler.stats()
+    scheduler.shutdown()
+    assert all(r['model_b64'] for r in results)
+    return elapsed, warmup, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training scheduler throughput benchmark")
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--games', type=int, default=300, help='Games per user')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    batches = [(f"user_{i}", make_raw_games(args.games, seed=i)) for i in range(args.users)]
+    print(f"--- {args.users} users x {args.games} games, {os.cpu_count()} CPUs ---")
+
+    t_seq = run_sequential(batches)
+    print(f"sequential        : {t_seq:6.2f}s  {args.users * 60 / t_seq:8.1f} users/min")
+
+    for workers in args.workers:
+        elapsed, warmup, stats = run_scheduler(batches, workers)
+        print(f"pool workers={workers:<3}: {elapsed:6.2f}s  {args.users * 60 / elapsed:8.1f} users/min "
+              f"(n_jobs={stats['n_jobs_per_worker']}, trained={stats['trained'] - 1}, "
+              f"superseded={stats['superseded']}, warm-up {warmup:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
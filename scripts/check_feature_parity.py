@@ -0,0 +1,301 @@
+# scripts/check_feature_parity.py
+# Golden-file parity suite for the shared feature core (api/py_tilt/tilt_features.py).
+# Every path that builds features must reproduce scripts/golden/features.json:
+#   serving   build_features, build_features_grouped, read_columns + featurize,
+#             SessionState.update replay, both SDKs' _enrich_json
+#   incremental  SessionState over a long history vs the sliding window
+#   sessions  featurize over session_bounds() (history backfill)
+#   training  TiltModel.process_raw_data, process_raw_data_streaming (small
+#             chunks), the py_tilt SDK's process_raw_data
+#   python scripts/check_feature_parity.py                   # check
+#   python scripts/check_feature_parity.py --baseline bc2e5c8  # pin outputs from the pre-rewrite code
+#   python scripts/check_feature_parity.py --update          # re-pin outputs after an intended change
+# --baseline exports that revision (git archive) and computes the outputs with
+# its own code in a subprocess (baseline_outputs: the SDKs' pandas feature
+# code). The golden file records where its outputs came from ('pinned_from').
+# Inputs are frozen in the golden file; --update only rewrites outputs (and
+# creates the inputs on first run). Bump ETL_VERSION when training outputs move.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..'))
+sys.path.append(os.path.join(HERE, '../api/py_tilt'))
+sys.path.append(HERE)
+
+GOLDEN = os.path.join(HERE, 'golden/features.json')
+RTOL, ATOL = 1e-12, 1e-9
+
+import tilt_features as tf
+from tilt_features import FEATURE_COLS
+
+
+# --- Inputs (created once, then frozen in the golden file) ---
+def make_inputs(seed=11):
+    from synthetic_games import generate_user_games
+    from bench_process_raw_data import make_raw_games
+
+    rng = np.random.default_rng(seed)
+    games = generate_user_games(150, seed=seed, newest_first=False)
+    for g in games:
+        g.update(my_acpl=int(rng.integers(5, 120)), my_blunder_count=int(rng.integers(0, 5)),
+                 my_avg_secs_per_move=round(float(rng.uniform(1, 40)), 2),
+                 result=float(rng.choice([0.0, 0.0, 0.5, 1.0])), rating_diff=int(rng.integers(-12, 12)))
+
+    windows = [games[0:30], games[30:60], games[60:90], games[90:91], games[91:120], games[120:150]]
+    windows[1] = [windows[1][i] for i in rng.permutation(30)]          # any order
+    for g in windows[2][::3]:
+        del g['my_acpl'], g['my_avg_secs_per_move']                    # defaults
+    for g in windows[4][10:]:
+        g['createdAt'] += 2 * 3600_000                                 # two sessions in one window
+        g['lastMoveAt'] += 2 * 3600_000
+    for a, b in zip(windows[5][0:10:2], windows[5][1:10:2]):
+        b['createdAt'] = a['createdAt']                                # ties
+
+    export = make_raw_games(240, seed=seed)
+    for g in export[5:200:40]:
+        del g['lastMoveAt']                                            # no speed
+    return {'windows': windows, 'export': export}
+
+
+# --- Paths ---
+def serving_paths(windows):
+    """{path: [matrix per window]} for every serving-side builder."""
+    from api.train.train_model_sdk import TiltModel as TrainModel
+    from tilt_model_sdk import TiltModel as ServingModel
+
+    out = {'build_features': [tf.build_features(w) for w in windows]}
+
+    X, offsets, _ = tf.build_features_grouped(windows)
+    out['build_features_grouped'] = [X[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+
+    columns = [{f: np.array([g.get(f, np.nan) for g in w], dtype=float) for f in tf.INPUT_FIELDS} for w in windows]
+    out['read_columns'] = [tf.featurize(cols, [0, len(cols['created_at'])]) for cols in map(tf.read_columns, columns)]
+
+    def replay(w):
+        # Through to_dict / from_dict, like consecutive incremental requests
+        state, rows = tf.SessionState(), []
+        for g in sorted(w, key=lambda g: g['createdAt']):
+            state = tf.SessionState.from_dict(state.to_dict())
+            rows.append(state.update(g))
+        return np.array(rows)
+    out['SessionState.update'] = [replay(w) for w in windows]
+
+    for name, model in (('tilt_model_sdk._enrich_json', ServingModel()),
+                        ('train_model_sdk._enrich_json', TrainModel())):
+        # float32, like every matrix the models see
+        out[name] = [model._enrich_json(w)[FEATURE_COLS].to_numpy(np.float32) for w in windows]
+    return out
+
+
+def sliding_window_check(windows):
+    """
+    All golden games as one history, fed to a state one at a time: every row
+    must equal build_features() on the last WINDOW_GAMES games ending there
+    (the window request the incremental one replaces). Returns mismatching rows.
+    """
+    games = sorted((g for w in windows for g in w), key=lambda g: g['createdAt'])
+    state = tf.SessionState.from_games(games[:10])
+    bad = []
+    for i in range(10, len(games)):
+        row = state.update(games[i])
+        window = games[max(0, i + 1 - tf.WINDOW_GAMES):i + 1]
+        if not same(row, tf.build_features(window)[-1]):
+            bad.append(i)
+    seeded = tf.SessionState.from_columns(
+        {f: np.array([g.get(f, np.nan) for g in games], dtype=float) for f in tf.INPUT_FIELDS})
+    if seeded.to_dict() != state.to_dict():
+        bad.append('from_columns')
+    return bad
+
+
+def sessions_path(windows):
+    cols = tf.read_games([g for w in windows for g in w])
+    return tf.featurize(cols, tf.session_bounds(cols['created_at']))
+
+
+TRAINING_COLS = FEATURE_COLS + ['session_id', 'rating_diff', 'target']
+
+def training_paths(export):
+    """{path: frame} for every training-side ETL."""
+    from api.train.train_model_sdk import TiltModel as TrainModel
+    from tilt_model_sdk import TiltModel as ServingModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.json')
+        with open(path, 'w') as f:
+            json.dump(export, f)
+        return {
+            'train_model_sdk.process_raw_data': TrainModel().process_raw_data(path),
+            'train_model_sdk.process_raw_data_streaming': TrainModel().process_raw_data_streaming(path, chunk_size=40),
+            'tilt_model_sdk.process_raw_data': ServingModel().process_raw_data(path),
+        }
+
+
+def frame_to_golden(df):
+    return {'index': df.index.tolist(), 'columns': {c: df[c].to_numpy(float).tolist() for c in TRAINING_COLS}}
+
+
+def baseline_outputs(windows, export):
+    """
+    Golden outputs using only APIs the baseline revision (bc2e5c8) already has,
+    so they come from the feature code before any rewrite: the py_tilt SDK's
+    TiltModel._enrich_json (what window mode ran) per window and per session,
+    and the training TiltModel.process_raw_data. Runs against the exported tree
+    (see --baseline).
+    """
+    import pandas as pd
+    from api.train.train_model_sdk import TiltModel as TrainModel
+    from tilt_model_sdk import SESSION_GAP_MINUTES, TiltModel as ServingModel
+
+    model = ServingModel()
+
+    def enrich(games):
+        return model._enrich_json(games)[FEATURE_COLS].to_numpy(np.float32)
+
+    serving = [enrich(w).tolist() for w in windows]
+
+    # History: window mode over each session, cut with training's pandas rule
+    games = sorted((g for w in windows for g in w), key=lambda g: g['createdAt'])
+    created = pd.Series(pd.to_datetime([g['createdAt'] for g in games], unit='ms', utc=True))
+    gap = created.diff()
+    session = ((gap > pd.Timedelta(minutes=SESSION_GAP_MINUTES)) | gap.isna()).cumsum().to_numpy()
+    sessions = np.concatenate([enrich([g for g, s in zip(games, session) if s == k]) for k in np.unique(session)])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.json')
+        with open(path, 'w') as f:
+            json.dump(export, f)
+        training = TrainModel().process_raw_data(path)
+    return {'serving': serving, 'sessions': sessions.tolist(), 'training': frame_to_golden(training)}
+
+
+def outputs_from_revision(rev, inputs):
+    """Exports `rev` and runs baseline_outputs() with its code in a subprocess."""
+    root = os.path.join(HERE, '..')
+    sha = subprocess.check_output(['git', '-C', root, 'rev-parse', '--short', rev], text=True).strip()
+    with tempfile.TemporaryDirectory(prefix='tilt_baseline_') as tree:
+        archive = subprocess.run(['git', '-C', root, 'archive', sha, 'api'], check=True, capture_output=True)
+        subprocess.run(['tar', '-x', '-C', tree], input=archive.stdout, check=True)
+        io_path = os.path.join(tree, 'io.json')
+        with open(io_path, 'w') as f:
+            json.dump(inputs, f)
+        # The exported tree comes first on sys.path, ahead of this checkout
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join([tree, os.path.join(tree, 'api/py_tilt')])}
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--emit-baseline', io_path],
+                       check=True, env=env, cwd=tree, stdout=sys.stderr)
+        with open(io_path) as f:
+            return json.load(f), sha
+
+
+# --- Comparison ---
+def same(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return a.shape == b.shape and np.allclose(a, b, rtol=RTOL, atol=ATOL, equal_nan=True)
+
+
+def diff_note(a, b, names):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    if a.shape != b.shape:
+        return f"shape {a.shape} vs {b.shape}"
+    bad = ~np.isclose(a, b, rtol=RTOL, atol=ATOL, equal_nan=True)
+    cols = sorted({names[j] for j in np.nonzero(bad)[-1]}) if a.ndim > 1 else []
+    return f"{int(bad.sum())} values differ {cols}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden-file parity for every feature path")
+    parser.add_argument('--update', action='store_true', help="Re-pin outputs from the current code")
+    parser.add_argument('--baseline', metavar='REV', help="Re-pin outputs from the code at git revision REV")
+    parser.add_argument('--emit-baseline', metavar='PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.emit_baseline:
+        # Subprocess of --baseline: inputs in, outputs of this (old) tree out
+        with open(args.emit_baseline) as f:
+            inputs = json.load(f)
+        outputs = baseline_outputs(inputs['windows'], inputs['export'])
+        with open(args.emit_baseline, 'w') as f:
+            json.dump(outputs, f)
+        return
+
+    golden = None
+    if os.path.exists(GOLDEN):
+        with open(GOLDEN) as f:
+            golden = json.load(f)
+    inputs = golden['inputs'] if golden else make_inputs()
+    windows, export = inputs['windows'], inputs['export']
+
+    serving = serving_paths(windows)
+    sessions = sessions_path(windows)
+    training = training_paths(export)
+
+    if args.baseline or args.update or golden is None:
+        if args.baseline:
+            outputs, sha = outputs_from_revision(args.baseline, inputs)
+            pinned_from = f"{sha} (--baseline)"
+        else:
+            outputs = {
+                'serving': [m.tolist() for m in serving['build_features']],
+                'sessions': sessions.tolist(),
+                'training': frame_to_golden(training['train_model_sdk.process_raw_data']),
+            }
+            pinned_from = "working tree (--update)"
+        os.makedirs(os.path.dirname(GOLDEN), exist_ok=True)
+        with open(GOLDEN, 'w') as f:
+            json.dump({'features': FEATURE_COLS, 'pinned_from': pinned_from, 'inputs': inputs, 'outputs': outputs},
+                      f, separators=(',', ':'))
+        print(f"📌 Pinned {len(windows)} windows, {len(sessions)} session rows, "
+              f"{len(outputs['training']['index'])} training rows from {pinned_from} -> {os.path.relpath(GOLDEN)}")
+        golden = None
+
+    expected = golden['outputs'] if golden else outputs
+    failures = []
+    if golden and golden['features'] != FEATURE_COLS:
+        failures.append(f"feature order: golden {golden['features']} vs FEATURE_COLS {FEATURE_COLS}")
+
+    print(f"--- 🔍 serving: {len(windows)} windows ---")
+    for name, mats in serving.items():
+        bad = [i for i, (m, g) in enumerate(zip(mats, expected['serving'])) if not same(m, g)]
+        print(f"   {'✅' if not bad else '❌'} {name}")
+        for i in bad:
+            failures.append(f"serving/{name} window {i}: {diff_note(mats[i], expected['serving'][i], FEATURE_COLS)}")
+
+    print(f"--- 🔍 incremental: {sum(map(len, windows))} games through one SessionState ---")
+    bad = sliding_window_check(windows)
+    print(f"   {'✅' if not bad else '❌'} update() vs the last {tf.WINDOW_GAMES} games' window")
+    if bad:
+        failures.append(f"incremental: rows {bad} differ from build_features on their window")
+
+    print("--- 🔍 sessions ---")
+    ok = same(sessions, expected['sessions'])
+    print(f"   {'✅' if ok else '❌'} featurize + session_bounds")
+    if not ok:
+        failures.append(f"sessions: {diff_note(sessions, expected['sessions'], FEATURE_COLS)}")
+
+    print(f"--- 🔍 training: {len(export)} raw games ---")
+    want = expected['training']
+    for name, df in training.items():
+        got = frame_to_golden(df)
+        notes = [] if got['index'] == want['index'] else ["row index differs"]
+        notes += [f"{c}: {diff_note(got['columns'][c], want['columns'][c], [c])}"
+                  for c in TRAINING_COLS if not same(got['columns'][c], want['columns'][c])]
+        print(f"   {'✅' if not notes else '❌'} {name}")
+        failures += [f"training/{name} {n}" for n in notes]
+
+    if failures:
+        print("\n❌ Feature parity broken:")
+        for f in failures:
+            print(f"   {f}")
+        sys.exit(1)
+    print("\n✅ Every feature path matches the golden file")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# scripts/check_import_budget.py
+# Cold-start guard for the py_tilt function, based on `python -X importtime`.
+# Imports api/py_tilt/index.py (which warms the model) in a fresh interpreter
+# per backend, reports where the time went and fails if the budget regresses.
+#   python scripts/check_import_budget.py [--repeat 3] [--budget-ms 400]
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+PY_TILT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../api/py_tilt')
+
+# Whole `import index` (module import + warm-up), best of --repeat runs
+BUDGET_MS = {
+    'onnx': 400,
+    'trees': 250,
+}
+
+# Must never be pulled in on the serving path
+FORBIDDEN = {
+    'onnx': ['pandas', 'xgboost', 'sklearn', 'joblib', 'scipy'],
+    'trees': ['pandas', 'xgboost', 'sklearn', 'joblib', 'scipy', 'onnxruntime'],
+}
+
+
+def run_importtime(backend):
+    """Returns (total_ms, {root_package: self_ms}) for one cold `import index`."""
+    env = dict(os.environ, TILT_BACKEND=backend, TILT_EAGER_INIT='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index'],
+        cwd=PY_TILT_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"`import index` failed for {backend}:\n{proc.stderr[-2000:]}")
+
+    total_us = None
+    per_package = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        per_package[name.split('.')[0]] += int(self_us)
+        if name == 'index':
+            total_us = int(cumulative_us)
+    return total_us / 1000.0, {k: v / 1000.0 for k, v in per_package.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget check for api/py_tilt")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='Override the per-backend budget')
+    parser.add_argument('--top', type=int, default=8)
+    args = parser.parse_args()
+
+    failures = []
+    for backend, budget in BUDGET_MS.items():
+        budget = args.budget_ms or budget
+        runs = [run_importtime(backend) for _ in range(args.repeat)]
+        total, packages = min(runs, key=lambda r: r[0])
+
+        print(f"--- ⏱️  backend={backend}: import index = {total:.1f} ms (budget {budget:.0f} ms) ---")
+        for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"   {name:<24} {ms:8.1f} ms")
+
+        if total > budget:
+            failures.append(f"{backend}: {total:.1f} ms > {budget:.0f} ms")
+        leaked = [m for m in FORBIDDEN[backend] if m in packages]
+        if leaked:
+            failures.append(f"{backend}: forbidden imports on serving path: {leaked}")
+
+    if failures:
+        print("\n❌ Import budget exceeded:")
+        for f in failures:
+            print(f"   {f}")
+        sys.exit(1)
+    print("\n✅ Import budget OK")
+
+
+if __name__ == "__main__":
+    main()
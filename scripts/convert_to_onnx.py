@@ -1,4 +1,11 @@
 # scripts/convert_to_onnx.py
+# Trained SDK model -> api/py_tilt/model.bundle (ONNX graph + its ORT-optimized
+# copy + XGBoost JSON + feature order + threshold, see api/py_tilt/model_bundle.py).
+# Run it with the onnxruntime version the API ships (api/py_tilt/requirements.txt):
+# the optimized graph is only loaded by the version that produced it.
+#   python scripts/convert_to_onnx.py [--model PATH] [--out PATH]
+# --model is a bundle or a legacy model.json (+ tilt_config.joblib sidecar).
+import argparse
 import sys
 import os
 import json
@@ -10,14 +17,33 @@ from onnxmltools.convert.common.data_types import FloatTensorType
 
 # Fix paths to find your SDK
 sys.path.append(os.path.join(os.path.dirname(__file__), '../api/py_tilt'))
-from tilt_model_sdk import TiltModel
+from model_bundle import SECTION_ONNX, SECTION_ONNX_OPTIMIZED, ModelBundle
+from ort_profile import optimize_graph
+from tilt_model_sdk import DEFAULT_MODEL, TiltModel
 
-def convert():
+def restore_base_score(onnx_model, xgb_model):
+    """
+    onnxmltools ignores base_score when XGBoost >= 2 stores it as "[4.5E-1]",
+    which shifts every probability. Put it back as the ensemble's base value
+    (margin space), so ONNX matches model.json / tree_ensemble.py.
+    """
+    from onnx import helper
+
+    config = json.loads(xgb_model.get_booster().save_config())
+    base_score = float(str(config['learner']['learner_model_param']['base_score']).strip('[]'))
+    margin = float(np.log(base_score / (1.0 - base_score)))
+
+    for node in onnx_model.graph.node:
+        if node.op_type != 'TreeEnsembleClassifier':
+            continue
+        if any(a.name == 'base_values' for a in node.attribute):
+            continue
+        node.attribute.append(helper.make_attribute('base_values', [margin]))
+        print(f"--- 🩹 Restored base_score {base_score:.4f} (margin {margin:+.4f}) ---")
+
+def convert(model_path=DEFAULT_MODEL, output_path=DEFAULT_MODEL):
     print("--- 🔄 Loading XGBoost Model ---")
     tilt_ai = TiltModel()
-    # Ensure this path points to your model.json or model.joblib
-    model_path = os.path.join(os.path.dirname(__file__), '../api/py_tilt/model.json')
-    
     if not os.path.exists(model_path):
         print(f"❌ Model not found at {model_path}")
         return
@@ -28,6 +54,7 @@ def convert():
     # --- CRITICAL FIX: STRIP FEATURE NAMES ---
     # The converter crashes if it sees string names like "games_played".
     # We force it to use indices (f0, f1, f2) by clearing the names.
+    # (save() below re-exports the booster with names from feature_cols.)
     print("--- ✂️  Stripping feature names for ONNX compatibility ---")
     xgb_model.get_booster().feature_names = None
     
@@ -39,13 +66,27 @@ def convert():
     initial_types = [('float_input', FloatTensorType([None, n_features]))]
     
     print("--- 📦 Converting to ONNX ---")
-    onnx_model = convert_xgboost(xgb_model, initial_types=initial_types)
+    # Fixed graph name (the default is a random uuid) keeps the bundle hash reproducible
+    onnx_model = convert_xgboost(xgb_model, initial_types=initial_types, name='tilt_model')
+    restore_base_score(onnx_model, xgb_model)
+    xgb_model.get_booster().feature_names = list(tilt_ai.feature_cols)
     
-    output_path = os.path.join(os.path.dirname(__file__), '../api/py_tilt/model.onnx')
-    with open(output_path, "wb") as f:
-        f.write(onnx_model.SerializeToString())
-        
-    print(f"✅ Success! Saved to {output_path}")
+    # --- OFFLINE GRAPH OPTIMIZATION ---
+    # Done once here instead of in every cold start (see api/py_tilt/ort_profile.py)
+    onnx_bytes = onnx_model.SerializeToString()
+    optimized, info = optimize_graph(onnx_bytes)
+    tilt_ai.config['ort_optimized'] = info
+    print(f"--- ⚡ Pre-optimized graph ({info['level']}, onnxruntime {info['ort_version']}): "
+          f"{len(onnx_bytes)} -> {len(optimized)} bytes ---")
+
+    content_hash = tilt_ai.save(output_path, {SECTION_ONNX: onnx_bytes, SECTION_ONNX_OPTIMIZED: optimized})
+    bundle = ModelBundle.open(output_path)
+    print(f"✅ Success! Saved to {output_path} ({os.path.getsize(output_path)} bytes, "
+          f"sections {bundle.sections}, threshold {bundle.threshold:.2f}, hash {content_hash[:12]})")
 
 if __name__ == "__main__":
-    convert()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the py_tilt model bundle")
+    parser.add_argument('--model', default=str(DEFAULT_MODEL), help="Bundle or legacy model.json")
+    parser.add_argument('--out', default=str(DEFAULT_MODEL))
+    args = parser.parse_args()
+    convert(args.model, args.out)
@@ -0,0 +1,219 @@
+# scripts/synthetic_games.py
+# Seeded, scalable generator of Lichess-export-shaped games (grown out of the
+# 100-game mock in regenerate_model.py). Sessions, tilt episodes (ACPL up,
+# faster moves, more losses after an onset game), per-ply clocks and
+# rating diffs are all drawn from one RNG, so a (seed, user) pair always
+# yields the same corpus.
+#   python scripts/synthetic_games.py out_dir --games 1000000 --users 50 [--clocks pgn|array|none]
+# Writes one NDJSON export per user (streamed in blocks, bounded memory) + manifest.json.
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+HERO_USER = "julio_amigo_dos"   # The training ETL keys on this name
+START_MS = 1_672_531_200_000
+BLOCK_GAMES = 20_000
+
+SAN = np.array(['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6', 'Ba4', 'Nf6', 'O-O', 'Be7', 'd4', 'exd4', 'Qxd4', 'c5'])
+TIME_CONTROLS = [(180, 2), (300, 0), (300, 3), (600, 0)]
+
+
+def _clock_text(s):
+    return f"{s // 3600}:{s // 60 % 60:02d}:{s % 60:02d}"
+
+
+# "1. ", "1... ", "2. ", ... per ply index
+PLY_PREFIX = [f"{p // 2 + 1}. " if p % 2 == 0 else f"{p // 2 + 1}... " for p in range(512)]
+
+
+class GameGenerator:
+    """
+    Games for one user, oldest first, produced block by block.
+    Knobs: mean_session_games, tilt_rate (share of sessions that tilt),
+    analysed_rate (games with acpl/blunders), clocks ('pgn' = [%clk] tags in a
+    pgn field, 'array' = Lichess `clocks` centiseconds, None).
+    """
+
+    def __init__(self, seed=0, user=HERO_USER, mean_session_games=6, tilt_rate=0.35,
+                 analysed_rate=0.9, clocks='pgn', start_ms=START_MS):
+        self.rng = np.random.default_rng(seed)
+        self.user = user
+        self.mean_session_games = mean_session_games
+        self.tilt_rate = tilt_rate
+        self.analysed_rate = analysed_rate
+        self.clocks = clocks
+        self.now = start_ms
+        self.games_left_in_session = 0
+        self.tilt_onset = None
+        self.session_game = 0
+
+    def _session_flags(self, n):
+        """Per game: starts a session?, tilted? (session state carries across blocks)."""
+        rng = self.rng
+        # At most n new sessions in a block: pre-draw their parameters
+        lengths = 1 + rng.geometric(1.0 / self.mean_session_games, n)
+        tilt_u, onset_u = rng.random(n), rng.random(n)
+        starts, tilted = np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+        k = 0
+        for i in range(n):
+            if self.games_left_in_session == 0:
+                starts[i] = True
+                self.games_left_in_session = int(lengths[k])
+                self.tilt_onset = int(onset_u[k] * lengths[k]) if tilt_u[k] < self.tilt_rate else None
+                self.session_game = 0
+                k += 1
+            tilted[i] = self.tilt_onset is not None and self.session_game >= self.tilt_onset
+            self.games_left_in_session -= 1
+            self.session_game += 1
+        return starts, tilted
+
+    def block(self, n):
+        """Next n games (oldest first) as a list of dicts."""
+        rng = self.rng
+        starts, tilted = self._session_flags(n)
+
+        # Tilt: worse play, faster moves, more losses
+        u = rng.random((n, 4))
+        p_win = np.where(tilted, 0.33, 0.5)
+        outcome = np.where(u[:, 0] < p_win, 0, np.where(u[:, 0] > 0.95, 2, 1))   # 0 win, 1 loss, 2 draw
+        acpl = np.round(rng.gamma(2.0, 22.0, n) * np.where(tilted, 2.0, 1.0)).astype(int)
+        blunders = rng.poisson(np.where(tilted, 2.2, 0.7))
+        opp_acpl = np.round(rng.gamma(2.0, 25.0, n)).astype(int)
+        opp_blunders, inacc, opp_inacc = rng.poisson(0.8, n), rng.poisson(2, n), rng.poisson(2, n)
+        gain = rng.integers(4, 10, n)
+        draw_diff = rng.integers(-2, 3, n)
+        diff = np.select([outcome == 0, outcome == 1], [gain, -gain], draw_diff)
+        hero_white = rng.random(n) < 0.5
+        tc = rng.integers(0, len(TIME_CONTROLS), n)
+        initial = np.array([t[0] for t in TIME_CONTROLS])[tc]
+        inc = np.array([t[1] for t in TIME_CONTROLS])[tc]
+
+        # Per-ply think times and remaining clocks, all games of the block at once
+        plies = rng.integers(16, 140, n)
+        first = np.concatenate([[0], np.cumsum(plies)[:-1]])
+        game_of = np.repeat(np.arange(n), plies)
+        ply = np.arange(plies.sum()) - first[game_of]
+        hero_ply = (ply % 2 == 0) == hero_white[game_of]
+        mean_think = np.where(hero_ply, np.where(tilted, 1.5, 4.0)[game_of], 3.5)
+        spent = np.minimum(rng.gamma(1.5, mean_think / 1.5), initial[game_of] / 4)
+        # Running total per (game, side): cumsum over plies ordered by side within game
+        order = np.lexsort((ply, ply % 2, game_of))
+        cs = np.cumsum(spent[order])
+        side_first = np.concatenate([[True], (game_of[order][1:] != game_of[order][:-1]) | (ply[order][1:] % 2 != ply[order][:-1] % 2)])
+        group_base = np.maximum.accumulate(np.where(side_first, np.arange(len(cs)), 0))
+        used = np.empty_like(cs)
+        used[order] = cs - (cs[group_base] - spent[order][group_base])
+        clocks = np.maximum(initial[game_of] - used + inc[game_of] * (ply // 2 + 1), 0)
+        duration_ms = (np.add.reduceat(spent, first) * 1000).astype(np.int64) + 2_000
+        sans = SAN[rng.integers(0, len(SAN), len(ply))]
+
+        # Timeline: session gaps before session starts, idle time between games
+        gap = np.where(starts, rng.integers(45 * 60_000, 3 * 86_400_000, n), 0)
+        idle = rng.integers(5_000, 300_000, n)
+        step = gap + np.concatenate([[0], (duration_ms + idle)[:-1]])
+        created = self.now + np.cumsum(step)
+        self.now = int(created[-1] + duration_ms[-1] + idle[-1])
+        opp_ids = (u[:, 1] * 1e6).astype(int)
+        analysed = u[:, 2] < self.analysed_rate
+
+        games = []
+        for i in range(n):
+            lo, hi = first[i], first[i] + plies[i]
+            hero_color, opp_color = ('white', 'black') if hero_white[i] else ('black', 'white')
+            d = int(diff[i])
+            hero = {"user": {"name": self.user}, "rating": 1500, "ratingDiff": d}
+            villain = {"user": {"name": f"opp_{opp_ids[i]}"}, "rating": 1500, "ratingDiff": -d}
+            if analysed[i]:
+                hero["analysis"] = {"acpl": int(acpl[i]), "blunder": int(blunders[i]), "inaccuracy": int(inacc[i])}
+                villain["analysis"] = {"acpl": int(opp_acpl[i]), "blunder": int(opp_blunders[i]), "inaccuracy": int(opp_inacc[i])}
+
+            c = int(created[i])
+            game = {
+                "id": f"{self.user[:4]}{c:x}",
+                "rated": True,
+                "speed": "blitz" if initial[i] < 480 else "rapid",
+                "createdAt": c,
+                "lastMoveAt": c + int(duration_ms[i]),
+                "status": "draw" if outcome[i] == 2 else "resign",
+                "players": {hero_color: hero, opp_color: villain},
+                "moves": " ".join(sans[lo:hi]),
+                "clock": {"initial": int(initial[i]), "increment": int(inc[i]), "totalTime": int(initial[i] + 40 * inc[i])},
+            }
+            if outcome[i] != 2:
+                game["winner"] = hero_color if outcome[i] == 0 else opp_color
+            if self.clocks == 'array':
+                game["clocks"] = (clocks[lo:hi] * 100).astype(int).tolist()
+            elif self.clocks == 'pgn':
+                secs = clocks[lo:hi].astype(int).tolist()
+                game["pgn"] = " ".join(f"{PLY_PREFIX[p]}{m} {{ [%clk {_clock_text(t)}] }}"
+                                       for p, (m, t) in enumerate(zip(sans[lo:hi].tolist(), secs)))
+            games.append(game)
+        return games
+
+    def iter_blocks(self, n_games, block=BLOCK_GAMES):
+        done = 0
+        while done < n_games:
+            k = min(block, n_games - done)
+            yield self.block(k)
+            done += k
+
+
+def generate_user_games(n_games, seed=0, newest_first=True, **kwargs):
+    """In-memory corpus for one user; Lichess exports are newest first."""
+    games = [g for b in GameGenerator(seed=seed, **kwargs).iter_blocks(n_games) for g in b]
+    return games[::-1] if newest_first else games
+
+
+def user_seed(seed, user_index):
+    return seed * 1_000_003 + user_index
+
+
+def write_corpus(out_dir, n_games, n_users=1, seed=0, **kwargs):
+    """
+    NDJSON export per user (oldest first; the ETL sorts), games split evenly.
+    Every user plays as HERO_USER since that is who the ETL scores; users differ
+    by seed. Returns the manifest (also written to out_dir/manifest.json).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    per_user = np.full(n_users, n_games // n_users)
+    per_user[:n_games % n_users] += 1
+
+    users = []
+    for u, n in enumerate(per_user):
+        path = os.path.join(out_dir, f"user_{u:05d}.ndjson")
+        gen = GameGenerator(seed=user_seed(seed, u), **kwargs)
+        with open(path, 'w') as f:
+            for block in gen.iter_blocks(int(n)):
+                f.write("\n".join(json.dumps(g, separators=(',', ':')) for g in block))
+                f.write("\n")
+        users.append({'user_id': f"user_{u:05d}", 'path': path, 'games': int(n), 'bytes': os.path.getsize(path)})
+
+    manifest = {'seed': seed, 'games': int(n_games), 'users': users, 'params': kwargs}
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic Lichess corpus builder")
+    parser.add_argument('out_dir')
+    parser.add_argument('--games', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--clocks', choices=['pgn', 'array', 'none'], default='pgn')
+    parser.add_argument('--tilt-rate', type=float, default=0.35)
+    parser.add_argument('--session-games', type=float, default=6)
+    args = parser.parse_args()
+
+    manifest = write_corpus(args.out_dir, args.games, args.users, args.seed,
+                            clocks=None if args.clocks == 'none' else args.clocks,
+                            tilt_rate=args.tilt_rate, mean_session_games=args.session_games)
+    total_mb = sum(u['bytes'] for u in manifest['users']) / 1e6
+    print(f"✅ {args.games} games for {args.users} users -> {args.out_dir} ({total_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())